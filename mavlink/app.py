@@ -223,7 +223,7 @@ class Mavlink:
     def run_loop(self):     
         logging.info("Started run_loop() thread for Mav Link services.") # 
         while self.running:
-            logging.info(f"Polling MAVLink...... v1.0.0") 
+            logging.debug(f"Polling MAVLink...... v1.0.0") 
            
             try:
                 msg = self.connection.recv_match(blocking=True, timeout=5)
@@ -234,7 +234,7 @@ class Mavlink:
                     if data:
                         # --- Detect ARM/DISARM from HEARTBEAT ---
                         if data.get("messageType") == "HEARTBEAT":
-                            print("HEARTBEAT message received")
+                            logging.debug("HEARTBEAT message received")
                             base_mode = data.get("base_mode")
                             if base_mode is not None:
                                 currently_armed = (base_mode & mavutil.mavlink.MAV_MODE_FLAG_SAFETY_ARMED) != 0
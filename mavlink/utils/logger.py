@@ -2,29 +2,170 @@ import logging ,socket
 import sys
 import os
 import json
+import atexit
+import copy
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+#  "DEBUG" / "INFO" / "WARNING" / "ERROR
+_DEFAULTS = {
+    "log_level": "INFO",
+    "log_format": "text",           # "text" or "json"
+    "log_rate_limit": 5,            # max INFO/DEBUG records per call site per interval (0 = off)
+    "log_rate_interval": 1.0,       # seconds
+    "log_sample_rate": 1.0,         # fraction of INFO/DEBUG records kept (1.0 = all)
+}
+
+_settings = None
+_listener = None
+_queue_handler = None
+_lock = threading.Lock()
+
+
+def _load_settings():
+    """Read the logging settings from config.json once per process."""
+    global _settings
+    if _settings is None:
+        settings = dict(_DEFAULTS)
+        # LOG_CONFIG_PATH for services whose config lives elsewhere (mqtt_eon: /edgeCompute/config.json)
+        config_path = os.getenv("LOG_CONFIG_PATH",
+                                os.path.join(os.path.dirname(__file__), "../config/config.json"))
+        try:
+            with open(config_path, "r") as f:
+                config = json.load(f)
+                settings.update({k: config[k] for k in _DEFAULTS if k in config})
+        except Exception as e:
+            print(f"[Logger] Could not load config for log level: {e}")
+        # Env wins, e.g. LOG_FORMAT=json for services without a config.json
+        for key in ("log_level", "log_format"):
+            settings[key] = os.getenv(key.upper(), settings[key])
+        _settings = settings
+    return _settings
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Per call-site (file:line) rate limit plus random sampling for records below
+    WARNING, so hot loops can't flood the console. Warnings and errors always pass.
+    The next record let through from a throttled site says how many were dropped.
+    """
+    def __init__(self, limit, interval, sample_rate):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self.sites = {}     # (pathname, lineno) -> [window_start, count, suppressed]
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if not self.limit:
+            return True
+
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self.lock:
+            site = self.sites.get(key)
+            if site is None or now - site[0] >= self.interval:
+                suppressed = site[2] if site else 0
+                self.sites[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if site[1] < self.limit:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+
+class ExcQueueHandler(QueueHandler):
+    """
+    QueueHandler.prepare() folds the traceback into the message and clears
+    exc_info before the record is queued; keep it as record.exc instead so the
+    formatters on the listener thread still get it.
+    """
+    def prepare(self, record):
+        if record.exc_info:
+            record = copy.copy(record)      # other handlers may still see the original
+            record.exc = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = record.exc_text = None
+        return super().prepare(record)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        message = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            message += f" [{suppressed} similar messages suppressed]"
+        exc = getattr(record, "exc", None)
+        if exc:
+            message += "\n" + exc
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, container_name):
+        super().__init__()
+        self.container_name = container_name
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "container": self.container_name,
+            "level": record.levelname,
+            "logger": record.name,
+            "site": f"{record.module}:{record.lineno}",
+            "msg": record.getMessage(),
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        exc = getattr(record, "exc", None)
+        if exc:
+            entry["exc"] = exc
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _get_queue_handler(settings, container_name):
+    """One shared queue + listener thread per process; console I/O happens off the caller's thread."""
+    global _listener, _queue_handler
+    with _lock:
+        if _queue_handler is None:
+            if settings["log_format"] == "json":
+                formatter = JsonFormatter(container_name)
+            else:
+                formatter = TextFormatter(f'[{container_name}][%(asctime)s] %(levelname)s: %(message)s')
+            ch = logging.StreamHandler()
+            ch.setFormatter(formatter)
+
+            log_queue = queue.Queue(-1)
+            _queue_handler = ExcQueueHandler(log_queue)
+            _queue_handler.addFilter(RateLimitFilter(settings["log_rate_limit"],
+                                                     settings["log_rate_interval"],
+                                                     settings["log_sample_rate"]))
+            _listener = QueueListener(log_queue, ch, respect_handler_level=False)
+            _listener.start()
+            atexit.register(_listener.stop)
+        return _queue_handler
+
 
 def setup_logger(name=None):
     # Default level
     container_name = os.getenv("CONTAINER_NAME", socket.gethostname())
-    log_level = logging.INFO  
-    #  "DEBUG" / "INFO" / "WARNING" / "ERROR
-
-    # Try loading log level from config.json
-    config_path = os.path.join(os.path.dirname(__file__), "../config/config.json")
-    try:
-        with open(config_path, "r") as f:
-            config = json.load(f)
-            level_str = config.get("log_level", "INFO").upper()
-            log_level = getattr(logging, level_str, logging.INFO)
-    except Exception as e:
-        print(f"[Logger] Could not load config for log level: {e}")
+    settings = _load_settings()
+    log_level = getattr(logging, str(settings["log_level"]).upper(), logging.INFO)
 
     logger = logging.getLogger(name)
     if not logger.handlers:
         logger.setLevel(log_level)
-        formatter = logging.Formatter(f'[{container_name}][%(asctime)s] %(levelname)s: %(message)s')
-        ch = logging.StreamHandler()
-        ch.setFormatter(formatter)
-        logger.addHandler(ch)
+        logger.addHandler(_get_queue_handler(settings, container_name))
 
     return logger
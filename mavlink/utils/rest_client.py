@@ -31,7 +31,7 @@ class RestClient:
         try:
             url = self.base_url + "publish"
             resp = requests.post(url, json=payload, timeout=timeout)
-            logging.info(f"[REST] Publish response: {resp.status_code} {resp.text}")
+            logging.debug(f"[REST] Publish response: {resp.status_code} {resp.text}")
             return resp
         except requests.RequestException as e:
             logging.error(f"[REST] Publish error: {e}")
@@ -1,11 +1,12 @@
 import signal, sys, json, os,time, threading
 from flask import Flask, request, jsonify
 from core.mqttClient import MQTTClient
-from utils.db_buffer import DBBuffer
+from utils.db_buffer import create_buffer
 from core.mqtt_publisher import MQTTPublisher
 from rest_api.routes import register_routes
 import os
 from rest_api.config_manager import load_config
+from utils.host_metrics import get_host_sampler
 
 from utils.logger import setup_logger
 logging = setup_logger(__name__)
@@ -64,13 +65,13 @@ PASSWORD = os.getenv("HIVEMQ_PASSWORD")
 logging.info(f" [✅] Loaded  config values from file")
 
 
-buffer = DBBuffer()
+buffer = create_buffer(config)
 
 # ------------------------
 # Instantiate Publisher
 # ------------------------
 publisher = MQTTPublisher(MQTT_BROKER,MQTT_PORT,TOPIC,DRONE_UID,buffer,SPARKPLUG_NAMESPACE,
-                                SP_GROUP_ID,SP_EDGE_ID,SP_DEVICE_ID,USERNAME,PASSWORD)
+                                SP_GROUP_ID,SP_EDGE_ID,SP_DEVICE_ID,USERNAME,PASSWORD,config)
 
 # Register REST API routes
 register_routes(app, publisher,buffer)
@@ -86,12 +87,19 @@ def handle_shutdown(sig, frame):
     sys.exit(0)
 
 
-if __name__ == "__main__":
-    signal.signal(signal.SIGINT, handle_shutdown)
+def start_services():
+    """Start the MQTT publisher; called directly or from the gunicorn worker hook."""
     logging.info("🔌 Starting MQTT Publisher client services")
+    get_host_sampler(config.get("host_metrics_interval", 2.0))
     publisher.start()
+
+
+if __name__ == "__main__":
+    # Development server; the container runs gunicorn (see gunicorn.conf.py)
+    signal.signal(signal.SIGINT, handle_shutdown)
+    start_services()
     logging.info("🚀 Starting Flask service on port 5001")
-    app.run(host="0.0.0.0", port=5001)
+    app.run(host="0.0.0.0", port=5001, threaded=True)
 
 
 
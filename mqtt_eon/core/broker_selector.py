@@ -0,0 +1,133 @@
+import threading
+import time
+
+from utils.logger import setup_logger
+logging = setup_logger(__name__)
+
+
+class BrokerHealth:
+    def __init__(self, host, port, tls=True, username=None, password=None, priority=0, local=False):
+        self.host = host
+        self.port = port
+        self.tls = tls
+        self.username = username
+        self.password = password
+        self.priority = priority
+        self.local = local
+
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.connect_ms = None          # smoothed connect latency
+        self.cooldown_until = 0.0
+        self.connected_at = None
+
+    @property
+    def name(self):
+        return f"{self.host}:{self.port}"
+
+    def score(self, now):
+        """Lower is better: configured order first, then recent failures and latency."""
+        score = self.priority * 10.0
+        score += self.consecutive_failures * 25.0
+        if self.cooldown_until > now:
+            score += 1000.0
+        if self.connect_ms is not None:
+            score += min(self.connect_ms / 100.0, 20.0)
+        return score
+
+    def status(self, now):
+        return {
+            "broker": self.name,
+            "tls": self.tls,
+            "local": self.local,
+            "score": round(self.score(now), 1),
+            "successes": self.successes,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "connect_ms": round(self.connect_ms, 1) if self.connect_ms is not None else None,
+            "cooldown_seconds": max(0, round(self.cooldown_until - now)),
+            "connected": self.connected_at is not None,
+        }
+
+
+# ------------------------
+# Broker Selection / Failover
+# ------------------------
+class BrokerSelector:
+    """
+    Ordered broker list with health scoring. Failures put a broker into an
+    exponentially growing cooldown during which it is skipped (unless every
+    broker is cooling down); a successful connect clears it. A connection
+    that drops soon after it was made counts as a failure.
+    """
+    def __init__(self, brokers, base_cooldown=5, max_cooldown=300, stable_seconds=60):
+        self.brokers = [BrokerHealth(priority=i, **b) for i, b in enumerate(brokers)]
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.stable_seconds = stable_seconds
+        self.current = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, host, port, username=None, password=None):
+        """Local broker first (if enabled), then mqtt_brokers, or just host:port when none are listed."""
+        brokers = []
+        if config.get("local_broker_enabled"):
+            # Producers publish at LAN latency; mosquitto bridges upstream
+            brokers.append({"host": config.get("local_broker_host", "mosquitto"),
+                            "port": config.get("local_broker_port", 1883),
+                            "tls": False, "local": True})
+        for b in config.get("mqtt_brokers") or [{"host": host, "port": port,
+                                                  "tls": config.get("mqtt_tls", True)}]:
+            brokers.append({"host": b["host"], "port": b.get("port", 8883), "tls": b.get("tls", True),
+                            "username": b.get("username", username),
+                            "password": b.get("password", password)})
+        return cls(brokers)
+
+    def candidates(self):
+        """Brokers best score first, skipping those cooling down unless every broker is."""
+        now = time.monotonic()
+        with self.lock:
+            ready = [b for b in self.brokers if b.cooldown_until <= now] or self.brokers
+            return sorted(ready, key=lambda b: b.score(now))
+
+    def record_success(self, broker, connect_seconds):
+        with self.lock:
+            ms = connect_seconds * 1000
+            broker.connect_ms = ms if broker.connect_ms is None else 0.7 * broker.connect_ms + 0.3 * ms
+            broker.successes += 1
+            broker.consecutive_failures = 0
+            broker.cooldown_until = 0.0
+            broker.connected_at = time.monotonic()
+            self.current = broker
+
+    def record_failure(self, broker):
+        with self.lock:
+            broker.failures += 1
+            broker.consecutive_failures += 1
+            cooldown = min(self.base_cooldown * 2 ** (broker.consecutive_failures - 1), self.max_cooldown)
+            broker.cooldown_until = time.monotonic() + cooldown
+            broker.connected_at = None
+            if self.current is broker:
+                self.current = None
+        logging.warning(f"Broker {broker.name} marked unhealthy for {cooldown:.0f}s")
+
+    def record_disconnect(self, broker):
+        """A session that ended quickly is treated as a failure (flapping link)."""
+        if broker is None or broker.connected_at is None:
+            return
+        lived = time.monotonic() - broker.connected_at
+        if lived < self.stable_seconds:
+            self.record_failure(broker)
+        else:
+            with self.lock:
+                broker.consecutive_failures = 0
+                broker.connected_at = None
+                if self.current is broker:
+                    self.current = None
+
+    def status(self):
+        now = time.monotonic()
+        with self.lock:
+            return [b.status(now) for b in self.brokers]
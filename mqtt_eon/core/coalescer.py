@@ -0,0 +1,144 @@
+import ast
+import json
+import threading
+import time
+import zlib
+
+import paho.mqtt.client as mqtt
+
+from utils.logger import setup_logger
+logging = setup_logger(__name__)
+
+
+class CoalescedResult:
+    """Stand-in for paho's MQTTMessageInfo when a message is held for a batch."""
+    def __init__(self, topic):
+        self.topic = topic
+        self.rc = mqtt.MQTT_ERR_SUCCESS
+        self.coalesced = True
+
+
+# ------------------------
+# Message Coalescer
+# ------------------------
+class MessageCoalescer:
+    """
+    Collects messages for the same topic during a time window and sends them
+    as one MQTT publish, either as a JSON array or a zlib-compressed JSON array.
+    """
+    FORMATS = ("json", "zlib")
+
+    def __init__(self, client, buffer, window_ms=200, fmt="json", max_batch=100,
+                 exclude_topics=None, qos=1):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unknown coalesce format '{fmt}', expected one of {self.FORMATS}")
+        self.client = client
+        self.buffer = buffer
+        self.window = max(window_ms, 1) / 1000.0
+        self.fmt = fmt
+        self.max_batch = max(max_batch, 1)
+        self.exclude_topics = tuple(exclude_topics or ())
+        self.qos = qos
+
+        self.pending = {}       # topic -> list of messages
+        self.deadlines = {}     # topic -> monotonic time the batch must go out
+        self.cond = threading.Condition()
+        self.thread = None
+        self.running = False
+
+    def accepts(self, topic):
+        """Latency-sensitive topics (by suffix) bypass coalescing."""
+        return not topic.endswith(self.exclude_topics)
+
+    def add(self, topic, message):
+        with self.cond:
+            batch = self.pending.setdefault(topic, [])
+            if not batch:
+                self.deadlines[topic] = time.monotonic() + self.window
+            batch.append(message)
+            if len(batch) >= self.max_batch:
+                self.deadlines[topic] = 0
+            self.cond.notify()
+        return CoalescedResult(topic)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run_loop, daemon=True)
+        self.thread.start()
+        logging.info(f"Started message coalescer [window={self.window * 1000:.0f}ms, format={self.fmt}]")
+
+    def stop(self):
+        if not self.running:
+            return
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread:
+            self.thread.join(timeout=3)
+        self.flush()
+
+    def run_loop(self):
+        while self.running:
+            with self.cond:
+                now = time.monotonic()
+                due = [t for t, d in self.deadlines.items() if d <= now]
+                if not due:
+                    timeout = min(self.deadlines.values()) - now if self.deadlines else None
+                    self.cond.wait(timeout)
+                    continue
+                batches = [(t, self._take(t)) for t in due]
+
+            for topic, messages in batches:
+                self._send(topic, messages)
+
+    def flush(self):
+        """Send every pending batch immediately."""
+        while True:
+            with self.cond:
+                batches = [(t, self._take(t)) for t in list(self.pending)]
+            if not batches:
+                return
+            for topic, messages in batches:
+                self._send(topic, messages)
+
+    def _take(self, topic):
+        """Pop at most one batch; any overflow stays pending and is due immediately."""
+        batch = self.pending.pop(topic, [])
+        self.deadlines.pop(topic, None)
+        if len(batch) > self.max_batch:
+            self.pending[topic] = batch[self.max_batch:]
+            self.deadlines[topic] = 0
+            batch = batch[:self.max_batch]
+        return batch
+
+    def encode(self, messages):
+        items = []
+        for message in messages:
+            if isinstance(message, str):
+                try:
+                    message = ast.literal_eval(message)
+                except (ValueError, SyntaxError):
+                    pass
+            items.append(message)
+        frame = json.dumps(items, separators=(",", ":"))
+        if self.fmt == "zlib":
+            return zlib.compress(frame.encode("utf-8"))
+        return frame
+
+    def _send(self, topic, messages):
+        if not messages:
+            return
+        try:
+            result = self.client.publish_raw(topic, self.encode(messages), qos=self.qos)
+            if result and result.rc == mqtt.MQTT_ERR_SUCCESS:
+                logging.debug(f"Coalesced {len(messages)} messages into one publish on {topic}")
+                return
+        except Exception as e:
+            logging.error(f"Coalesced publish failed on {topic}: {e}")
+
+        # Not sent — keep each message individually so replay is unchanged
+        logging.warning(f"❌ Coalesced publish failed, buffering {len(messages)} messages for {topic}")
+        for message in messages:
+            self.buffer.store_payload({"topic": topic, "message": message})
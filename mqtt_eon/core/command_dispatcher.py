@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.logger import setup_logger
+logging = setup_logger(__name__)
+
+
+# ------------------------
+# Inbound Command Dispatcher
+# ------------------------
+class CommandDispatcher:
+    """
+    Routes inbound NCMD/DCMD messages to handlers registered by topic suffix and
+    runs them on a bounded worker pool, off paho's network thread.
+
+    Commands for the same target (e.g. container name) run one after another in
+    arrival order; different targets run in parallel. Replayed commands — same
+    topic and "cmd_id" within dedup_seconds — are dropped; commands without a
+    cmd_id are never deduplicated.
+    """
+    def __init__(self, max_workers=4, max_pending=100, dedup_seconds=30):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cmd")
+        self.max_pending = max_pending
+        self.dedup_seconds = dedup_seconds
+
+        self.handlers = []          # (suffix, handler, target_fn) in registration order
+        self.queues = {}            # target -> deque of pending commands
+        self.pending = 0
+        self.seen = OrderedDict()   # dedup key -> time seen
+        self.stats = {}             # suffix -> latency counters
+        self.lock = threading.Lock()
+
+    def register(self, suffix, handler, target=None):
+        """
+        :param suffix: Topic suffix to match (e.g. '/deploy')
+        :param handler: Callable(topic, payload)
+        :param target: Callable(payload) -> ordering key; defaults to the suffix
+        """
+        self.handlers.append((suffix, handler, target))
+
+    def match(self, topic):
+        for suffix, handler, target in self.handlers:
+            if topic.endswith(suffix):
+                return suffix, handler, target
+        return None
+
+    def dispatch(self, topic, payload):
+        """Queue a decoded command. Returns False if unmatched, duplicate or over capacity."""
+        matched = self.match(topic)
+        if matched is None:
+            logging.info(f"⏭ No handler for topic {topic}")
+            return False
+        suffix, handler, target_fn = matched
+        target = (target_fn(payload) if target_fn else None) or suffix
+
+        with self.lock:
+            if self._is_duplicate(topic, payload):
+                logging.warning(f"🔁 Dropping replayed command on {topic}")
+                self._stat(suffix)["duplicates"] += 1
+                return False
+            if self.pending >= self.max_pending:
+                logging.error(f"❌ Command queue full ({self.max_pending}), dropping {topic}")
+                self._stat(suffix)["rejected"] += 1
+                return False
+
+            self.pending += 1
+            queue = self.queues.get(target)
+            command = (suffix, handler, topic, payload, time.monotonic())
+            if queue is not None:
+                queue.append(command)   # a worker is already draining this target
+                return True
+            self.queues[target] = deque([command])
+
+        self.executor.submit(self._drain, target)
+        return True
+
+    def _drain(self, target):
+        while True:
+            with self.lock:
+                queue = self.queues[target]
+                if not queue:
+                    del self.queues[target]
+                    return
+                suffix, handler, topic, payload, queued_at = queue.popleft()
+
+            started = time.monotonic()
+            try:
+                handler(topic, payload)
+            except Exception as e:
+                logging.error(f"Error processing command on {topic}: {e}")
+            finished = time.monotonic()
+
+            with self.lock:
+                self.pending -= 1
+                self._record(suffix, started - queued_at, finished - started)
+            logging.info(f"⏱ {suffix} for '{target}' took {(finished - queued_at) * 1000:.0f} ms "
+                         f"(queued {(started - queued_at) * 1000:.0f} ms)")
+
+    def _is_duplicate(self, topic, payload):
+        now = time.monotonic()
+        while self.seen and next(iter(self.seen.values())) < now - self.dedup_seconds:
+            self.seen.popitem(last=False)
+
+        # Only an explicit cmd_id marks a replay: identical content may well be a
+        # deliberate repeat (stop, start, stop; a second /restart)
+        cmd_id = payload.get("cmd_id") if isinstance(payload, dict) else None
+        if cmd_id is None:
+            return False
+        key = f"{topic}:{cmd_id}"
+        if key in self.seen:
+            return True
+        self.seen[key] = now
+        return False
+
+    def _stat(self, suffix):
+        return self.stats.setdefault(suffix, {
+            "count": 0, "duplicates": 0, "rejected": 0,
+            "queue_ms_total": 0.0, "run_ms_total": 0.0, "last_ms": 0.0, "max_ms": 0.0
+        })
+
+    def _record(self, suffix, queued, ran):
+        stat = self._stat(suffix)
+        total_ms = (queued + ran) * 1000
+        stat["count"] += 1
+        stat["queue_ms_total"] += queued * 1000
+        stat["run_ms_total"] += ran * 1000
+        stat["last_ms"] = round(total_ms, 1)
+        stat["max_ms"] = round(max(stat["max_ms"], total_ms), 1)
+
+    def status(self):
+        with self.lock:
+            commands = {}
+            for suffix, stat in self.stats.items():
+                count = stat["count"] or 1
+                commands[suffix] = {
+                    "count": stat["count"],
+                    "duplicates": stat["duplicates"],
+                    "rejected": stat["rejected"],
+                    "avg_queue_ms": round(stat["queue_ms_total"] / count, 1),
+                    "avg_run_ms": round(stat["run_ms_total"] / count, 1),
+                    "last_ms": stat["last_ms"],
+                    "max_ms": stat["max_ms"],
+                }
+            return {"pending": self.pending, "max_pending": self.max_pending, "commands": commands}
@@ -0,0 +1,232 @@
+import datetime
+import json
+import os
+import platform
+import threading
+import time
+
+from core.lane_scheduler import classify
+from utils.logger import setup_logger
+from utils.metrics import Counter, Gauge
+logging = setup_logger(__name__)
+
+BUDGET_LEVEL = Gauge("mqtt_eon_data_budget_level", "Telemetry step-down level (0 = full rate)")
+BUDGET_DROPPED = Counter("mqtt_eon_data_budget_dropped_total", "Telemetry messages decimated by the data budget")
+
+HOUR = 3600
+RETENTION_HOURS = 24 * 40
+WINDOWS = {"1h": HOUR, "24h": 24 * HOUR, "30d": 30 * 24 * HOUR}
+TCP_IP_OVERHEAD = 40        # IPv4 + TCP headers per segment
+TLS_OVERHEAD = 29           # TLS 1.2/1.3 record header + AEAD tag, per record
+MSS = 1460
+
+
+def _varint_len(value):
+    length = 1
+    while value >= 128:
+        value //= 128
+        length += 1
+    return length
+
+
+def estimate_wire_bytes(topic, payload_len, qos=1, tls=True):
+    """
+    Approximate bytes on the link for one PUBLISH: MQTT fixed/variable header,
+    TLS record overhead and TCP/IP headers per segment, plus the PUBACK coming
+    back for QoS 1. Metered plans bill both directions.
+    """
+    remaining = 2 + len(topic.encode("utf-8")) + (2 if qos else 0) + payload_len
+    packet = 1 + _varint_len(remaining) + remaining
+    segments = max(1, -(-packet // MSS))
+    wire = packet + segments * (TCP_IP_OVERHEAD + (TLS_OVERHEAD if tls else 0))
+    if qos:
+        wire += 4 + TCP_IP_OVERHEAD + (TLS_OVERHEAD if tls else 0)
+    return wire
+
+
+# ------------------------
+# Data Usage / Budget
+# ------------------------
+class DataBudget:
+    """
+    Counts messages, payload bytes and estimated wire bytes per topic in hourly
+    buckets (kept 40 days), and steps telemetry down as the daily or monthly
+    wire-byte budget fills up. Usage is persisted to a JSON file only when a
+    budget is set; without one it is kept in memory for /usage.
+
+    steps: [[percent_of_budget, keep_one_in_n], ...]. Once a step is reached only
+    every n-th telemetry message per topic is sent (mode "decimate"), or telemetry
+    goes through the coalescer (mode "coalesce"). Control and bulk are never
+    stepped down.
+    """
+    def __init__(self, path=None, daily_bytes=0, monthly_bytes=0, billing_day=1,
+                 steps=None, mode="decimate", save_interval=60):
+        if path is None:
+            path = "usage.json" if platform.system() == "Windows" else "/app/data/usage.json"
+        self.path = path
+        self.persist = bool(daily_bytes or monthly_bytes)
+        self.daily_bytes = daily_bytes
+        self.monthly_bytes = monthly_bytes
+        self.billing_day = min(max(int(billing_day), 1), 28)
+        self.steps = sorted(steps or [[80, 2], [90, 5], [100, 20]])
+        self.mode = mode
+        self.save_interval = save_interval
+
+        self.buckets = {}           # hour start -> {topic: [messages, payload bytes, wire bytes]}
+        self.dropped = {}           # topic -> messages decimated
+        self.seen = {}              # topic -> telemetry messages offered while stepped down
+        self.level = 0
+        self.keep_every = 1
+        self.periods = {}           # "day"/"month" -> [period start, wire bytes]
+        self.last_saved = time.monotonic()
+        self.dirty = False
+        self.lock = threading.Lock()
+        self._load()
+        self._recompute_periods(time.time())
+
+    # --- persistence ---
+    def _load(self):
+        if not self.persist:
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.buckets = {int(hour): topics for hour, topics in data.get("buckets", {}).items()}
+            self.dropped = data.get("dropped", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"Could not load data usage from {self.path}: {e}")
+
+    def save(self):
+        if not self.persist:
+            return
+        with self.lock:
+            data = json.dumps({"buckets": self.buckets, "dropped": self.dropped})
+            self.dirty = False
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logging.error(f"Could not save data usage to {self.path}: {e}")
+        self.last_saved = time.monotonic()
+
+    def maybe_save(self):
+        if self.dirty and time.monotonic() - self.last_saved >= self.save_interval:
+            self.save()
+
+    # --- periods ---
+    def _period_starts(self, now):
+        day = datetime.datetime.fromtimestamp(now, datetime.timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        month = day.replace(day=self.billing_day)
+        if day.day < self.billing_day:
+            previous = month - datetime.timedelta(days=month.day)
+            month = previous.replace(day=self.billing_day)
+        return {"day": day.timestamp(), "month": month.timestamp()}
+
+    def _recompute_periods(self, now):
+        starts = self._period_starts(now)
+        self.periods = {name: [start, sum(t[2] for hour, topics in self.buckets.items() if hour >= start
+                                          for t in topics.values())]
+                        for name, start in starts.items()}
+        self._update_level()
+
+    def _update_level(self):
+        used = 0.0
+        if self.daily_bytes:
+            used = max(used, self.periods["day"][1] / self.daily_bytes)
+        if self.monthly_bytes:
+            used = max(used, self.periods["month"][1] / self.monthly_bytes)
+        level, keep_every = 0, 1
+        for i, (percent, every) in enumerate(self.steps):
+            if used * 100 >= percent:
+                level, keep_every = i + 1, max(int(every), 1)
+        if level != self.level:
+            logging.warning(f"Data budget {used * 100:.0f}% used: telemetry step level {self.level} -> {level}")
+            self.level, self.keep_every = level, keep_every
+            BUDGET_LEVEL.set(level)
+
+    # --- hot path ---
+    def record(self, topic, payload_bytes, wire_bytes):
+        now = time.time()
+        hour = int(now // HOUR * HOUR)
+        with self.lock:
+            topics = self.buckets.get(hour)
+            if topics is None:
+                topics = self.buckets[hour] = {}
+                cutoff = hour - RETENTION_HOURS * HOUR
+                for old in [h for h in self.buckets if h < cutoff]:
+                    del self.buckets[old]
+                # New hour: may also be a new day or billing month
+                self._recompute_periods(now)
+            counts = topics.setdefault(topic, [0, 0, 0])
+            counts[0] += 1
+            counts[1] += payload_bytes
+            counts[2] += wire_bytes
+            for period in self.periods.values():
+                period[1] += wire_bytes
+            self._update_level()
+            self.dirty = True
+
+    def allow(self, topic):
+        """False if this telemetry message should be dropped to stay within budget."""
+        if self.keep_every == 1 or self.mode != "decimate" or classify(topic) != "telemetry":
+            return True
+        with self.lock:
+            seen = self.seen.get(topic, 0)
+            self.seen[topic] = seen + 1
+            if seen % self.keep_every == 0:
+                return True
+            self.dropped[topic] = self.dropped.get(topic, 0) + 1
+        BUDGET_DROPPED.inc()
+        return False
+
+    def wants_coalescing(self, topic):
+        return self.level > 0 and self.mode == "coalesce" and classify(topic) == "telemetry"
+
+    # --- REST ---
+    def usage(self, window=None):
+        """Totals per topic and per message class over the rolling windows and budget periods."""
+        now = time.time()
+        with self.lock:
+            ranges = {name: now - seconds for name, seconds in WINDOWS.items()}
+            ranges.update({name: period[0] for name, period in self.periods.items()})
+            if window:
+                ranges = {window: ranges[window]}
+            result = {}
+            for name, start in ranges.items():
+                topics, classes = {}, {}
+                # Hour buckets overlapping the window start are counted whole
+                for hour, bucket in self.buckets.items():
+                    if hour + HOUR <= start:
+                        continue
+                    for topic, (messages, payload, wire) in bucket.items():
+                        for key, table in ((topic, topics), (classify(topic), classes)):
+                            totals = table.setdefault(key, {"messages": 0, "payload_bytes": 0, "wire_bytes": 0})
+                            totals["messages"] += messages
+                            totals["payload_bytes"] += payload
+                            totals["wire_bytes"] += wire
+                result[name] = {
+                    "wire_bytes": sum(t["wire_bytes"] for t in classes.values()),
+                    "classes": classes,
+                    "topics": topics,
+                }
+            return result
+
+    def status(self):
+        with self.lock:
+            return {
+                "mode": self.mode,
+                "level": self.level,
+                "keep_one_in": self.keep_every,
+                "daily_budget_bytes": self.daily_bytes or None,
+                "daily_used_bytes": self.periods["day"][1],
+                "monthly_budget_bytes": self.monthly_bytes or None,
+                "monthly_used_bytes": self.periods["month"][1],
+                "billing_day": self.billing_day,
+                "steps": self.steps,
+                "decimated": dict(self.dropped),
+            }
@@ -0,0 +1,196 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+from utils.metrics import Histogram
+
+LANES = ("control", "telemetry", "bulk")
+CONTROL_TYPES = {"NBIRTH", "NDEATH", "DBIRTH", "DDEATH", "NCMD", "DCMD", "STATE"}
+
+LANE_DELAY = Histogram("mqtt_eon_lane_queue_delay_seconds", "Time a /publish message waited in its lane",
+                       ("lane",))
+
+
+def classify(topic):
+    """control: Sparkplug state/commands, bulk: bin-file uploads, telemetry: everything else."""
+    if "/binFile" in topic:
+        return "bulk"
+    parts = topic.split("/")
+    if len(parts) > 2 and parts[2] in CONTROL_TYPES:
+        return "control"
+    return "telemetry"
+
+
+def chunk_message(topic, message, chunk_bytes):
+    """
+    Split a large bulk payload into chunk items on <topic>/chunk so other lanes can
+    be served between them. Each chunk is a JSON envelope; receivers reassemble
+    "data" by file_id in seq order (0 .. total-1).
+    """
+    file_id = uuid.uuid4().hex
+    total = (len(message) + chunk_bytes - 1) // chunk_bytes
+    return [{"topic": f"{topic}/chunk", "chunk": True,
+             "message": json.dumps({"file_id": file_id, "seq": seq, "total": total,
+                                    "data": message[seq * chunk_bytes:(seq + 1) * chunk_bytes]})}
+            for seq in range(total)]
+
+
+class ChunkAssembler:
+    """
+    Receiver side of chunk_message(): feed it each <topic>/chunk payload and it
+    returns the original message once every seq of a file_id has arrived
+    (None until then). Incomplete files are dropped after max_age seconds.
+    """
+    def __init__(self, max_age=600):
+        self.max_age = max_age
+        self.partial = {}           # file_id -> (first seen, total, {seq: data})
+
+    def add(self, payload):
+        envelope = json.loads(payload)
+        now = time.monotonic()
+        self.partial = {fid: entry for fid, entry in self.partial.items() if now - entry[0] <= self.max_age}
+        first_seen, total, parts = self.partial.setdefault(envelope["file_id"], (now, envelope["total"], {}))
+        parts[envelope["seq"]] = envelope["data"]
+        if len(parts) < total:
+            return None
+        del self.partial[envelope["file_id"]]
+        return "".join(parts[seq] for seq in range(total))
+
+
+# ------------------------
+# Priority Lanes
+# ------------------------
+class LaneScheduler:
+    """
+    Outbound /publish queue split into control, telemetry and bulk lanes, each
+    bounded on its own so bulk uploads can't crowd out state messages.
+
+    mode "strict": always the highest non-empty lane. mode "weighted": deficit
+    round robin by message bytes, each lane getting weight * quantum bytes per
+    round. bulk is only dequeued while bulk_ready() is true (e.g. paho's own
+    queue is short), so chunks never pile up ahead of control messages.
+
+    Queue interface used by publish_loop: put/get/drain/len, capacity and dropped.
+    """
+    def __init__(self, capacities, mode="strict", weights=None, quantum=4096, bulk_ready=None):
+        self.queues = {lane: deque() for lane in LANES}
+        self.capacities = {lane: max(int(capacities.get(lane, 1000)), 1) for lane in LANES}
+        self.mode = mode
+        self.weights = {"control": 8, "telemetry": 4, "bulk": 1, **(weights or {})}
+        self.quantum = quantum
+        self.bulk_ready = bulk_ready or (lambda: True)
+        self.deficit = {lane: 0 for lane in LANES}
+        self.turn = 0
+        self.topped_up = False
+        self.spilled = {lane: 0 for lane in LANES}
+        self.served = {lane: 0 for lane in LANES}
+        self.delay_total = {lane: 0.0 for lane in LANES}
+        self.delay_max = {lane: 0.0 for lane in LANES}
+        self.cond = threading.Condition()
+
+    @property
+    def capacity(self):
+        return sum(self.capacities.values())
+
+    @property
+    def dropped(self):
+        return sum(self.spilled.values())
+
+    def __len__(self):
+        return sum(len(q) for q in self.queues.values())
+
+    def put(self, item):
+        return self.put_many([item])
+
+    def put_many(self, items):
+        """Queue items (all for the same lane) together, or none of them if the lane is full."""
+        if not items:
+            return True
+        lane = classify(items[0]["topic"])
+        with self.cond:
+            queue = self.queues[lane]
+            if len(queue) + len(items) > self.capacities[lane]:
+                self.spilled[lane] += len(items)
+                return False
+            queue.extend(items)
+            self.cond.notify()
+            return True
+
+    def _eligible(self):
+        return [lane for lane in LANES
+                if self.queues[lane] and (lane != "bulk" or self.bulk_ready())]
+
+    def _pick(self):
+        eligible = self._eligible()
+        if not eligible:
+            return None
+        if self.mode != "weighted" or len(eligible) == 1:
+            return eligible[0]
+        # Deficit round robin: top a lane up once per turn, serve it while its deficit covers the head
+        while True:
+            lane = LANES[self.turn]
+            if lane in eligible:
+                size = len(self.queues[lane][0]["message"])
+                if self.deficit[lane] >= size:
+                    self.deficit[lane] -= size
+                    return lane
+                if not self.topped_up:
+                    self.deficit[lane] += self.weights[lane] * self.quantum
+                    self.topped_up = True
+                    continue
+            elif not self.queues[lane]:
+                self.deficit[lane] = 0
+            self.turn = (self.turn + 1) % len(LANES)
+            self.topped_up = False
+
+    def get(self, timeout=None):
+        """Next item by lane priority, waiting up to timeout seconds; None if nothing is ready."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while True:
+                lane = self._pick()
+                if lane is not None:
+                    item = self.queues[lane].popleft()
+                    self._record(lane, item)
+                    return item
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                # bulk waiting on bulk_ready() is polled, everything else wakes us via put()
+                wait = remaining
+                if self.queues["bulk"]:
+                    wait = 0.05 if remaining is None else min(0.05, remaining)
+                self.cond.wait(wait)
+
+    def _record(self, lane, item):
+        self.served[lane] += 1
+        enqueued_at = item.get("enqueued_at")
+        if enqueued_at is not None:
+            delay = time.monotonic() - enqueued_at
+            self.delay_total[lane] += delay
+            self.delay_max[lane] = max(self.delay_max[lane], delay)
+            LANE_DELAY.observe(delay, labels=(lane,))
+
+    def drain(self):
+        """Remove and return everything currently queued."""
+        with self.cond:
+            items = [item for lane in LANES for item in self.queues[lane]]
+            for queue in self.queues.values():
+                queue.clear()
+            return items
+
+    def status(self):
+        with self.cond:
+            result = {lane: {
+                "depth": len(self.queues[lane]),
+                "capacity": self.capacities[lane],
+                "spilled": self.spilled[lane],
+                "served": self.served[lane],
+                "avg_delay_ms": round(self.delay_total[lane] / self.served[lane] * 1000, 1)
+                if self.served[lane] else None,
+                "max_delay_ms": round(self.delay_max[lane] * 1000, 1),
+            } for lane in LANES}
+        result["mode"] = self.mode
+        return result
@@ -1,13 +1,22 @@
 import paho.mqtt.client as mqtt
+from paho.mqtt.properties import Properties
+from paho.mqtt.packettypes import PacketTypes
 import ssl
 import json
 import ast
 import time
-import psutil
-import socket
 import platform
+import threading
+from collections import OrderedDict
 from utils.logger import setup_logger
+from utils.metrics import Counter, Histogram
 from utils.rest_client import RestClient
+from core.snapshot_sampler import SnapshotSampler
+from core.command_dispatcher import CommandDispatcher
+from core.topic_alias import TopicAliasManager
+from core.broker_selector import BrokerSelector
+from core.tls_session import ResumingSSLContext
+from core.data_budget import estimate_wire_bytes
 logging = setup_logger(__name__)
 
 OTA_URL_LOCALHOST = "http://localhost:5000/"
@@ -25,15 +34,52 @@ else:
     mavlink_url = MAVLINK_URL_ENDPOINT 
     ota_url = OTA_URL_ENDPOINT
 
+PUBLISH_LATENCY = Histogram("mqtt_eon_publish_latency_seconds",
+                            "Time from enqueue to PUBACK (QoS1) or socket write (QoS0)")
+PUBLISHED_MESSAGES = Counter("mqtt_eon_published_messages_total", "Messages handed to paho per topic",
+                             ("topic",), max_series=500)
+PUBLISHED_BYTES = Counter("mqtt_eon_published_bytes_total", "Payload bytes handed to paho per topic",
+                          ("topic",), max_series=500)
+MAX_TRACKED_ACKS = 10000
+EARLY_ACK_SECONDS = 5
+
 class MQTTClient:
     def __init__(self, broker, port, topic,drone_id,sparkplug_namespace,
                             sp_group_id,sp_edge_id,sp_device_id,
-                            username, password):       
-        self.client = mqtt.Client(client_id=str(drone_id), clean_session=True,protocol=mqtt.MQTTv311)
+                            username, password, config=None):       
+        config = config or {}
+        # MQTT v5 adds topic aliases, message expiry and session expiry
+        self.mqtt5 = str(config.get("mqtt_protocol", "3.1.1")) == "5"
+        # Persistent session: the broker keeps our subscriptions and queued QoS1 commands
+        self.persistent_session = config.get("persistent_session", True)
+        if self.mqtt5:
+            self.client = mqtt.Client(client_id=str(drone_id), protocol=mqtt.MQTTv5)
+        else:
+            self.client = mqtt.Client(client_id=str(drone_id), clean_session=not self.persistent_session,
+                                      protocol=mqtt.MQTTv311)
+        self.session_expiry = config.get("session_expiry_seconds", 0)
+        if self.mqtt5 and self.persistent_session and not self.session_expiry:
+            self.session_expiry = 3600
+        # ReconnectManager owns reconnection; keep paho's own retry loop parked
+        self.client.reconnect_delay_set(min_delay=3600, max_delay=3600)
+        self.message_expiry = config.get("message_expiry_seconds", 0)
+        self.aliases = TopicAliasManager(limit=config.get("topic_alias_max", 16),
+                                         hot_threshold=config.get("topic_alias_hot_threshold", 3))
         self.broker = broker
         self.port = port
         self.topic = topic
         self.connected = False
+        # mid -> start time, for the enqueue -> PUBACK latency histogram
+        self.pending_acks = OrderedDict()
+        self.early_acks = OrderedDict()
+        self.ack_lock = threading.Lock()
+        # DataBudget set by MQTTPublisher; counts bytes of everything handed to paho
+        self.usage = None
+
+        # Ordered broker list with health scoring (local edge broker first when enabled)
+        self.brokers = BrokerSelector.from_config(config, broker, port, username, password)
+        self.client._connect_timeout = config.get("broker_connect_timeout", 5)
+        self.session_present = False
 
         self.drone_id = drone_id
         self.sparkplug_namespace = sparkplug_namespace
@@ -43,12 +89,28 @@ class MQTTClient:
         # self.TOPIC_PREFIX = f"{sparkplug_namespace}/{sp_group_id}/+/{sp_edge_id}"
         self.TOPIC_PREFIX = f"{sparkplug_namespace}/{sp_group_id}/NCMD/{sp_edge_id}"
         self.rest_client = RestClient()
+        # System info and deployments for NBIRTH, refreshed off the network thread
+        self.sampler = SnapshotSampler(ota_url, interval=config.get("snapshot_interval", 15))
+        # Inbound NCMD/DCMD handlers run on a bounded worker pool, not the network thread
+        self.dispatcher = CommandDispatcher(max_workers=config.get("command_workers", 4),
+                                            max_pending=config.get("command_queue_size", 100),
+                                            dedup_seconds=config.get("command_dedup_seconds", 30))
+        self._register_command_handlers()
 
         # 🔐 TLS CONFIG (NO cert files needed for HiveMQ Cloud)
-        self.client.tls_set(
-            tls_version=ssl.PROTOCOL_TLS_CLIENT
-        )
-        self.client.tls_insecure_set(False)
+        # Set up once; _use_broker() switches it off for plain-TCP (local) brokers
+        self.tls_context = None
+        if any(b.tls for b in self.brokers.brokers):
+            if config.get("tls_session_resumption", True):
+                # Reuse TLS session tickets across reconnects to skip the full handshake
+                self.tls_context = ResumingSSLContext.create(cafile=config.get("mqtt_ca_file"))
+                self.client.tls_set_context(self.tls_context)
+            else:
+                self.client.tls_set(
+                    ca_certs=config.get("mqtt_ca_file"),
+                    tls_version=ssl.PROTOCOL_TLS_CLIENT
+                )
+            self.client.tls_insecure_set(False)
 
         # 🔑 Authentication
         self.client.username_pw_set(username, password)
@@ -60,9 +122,44 @@ class MQTTClient:
         self.client.on_connect = self._on_connect
         self.client.on_disconnect = self._on_disconnect
         self.client.on_message = self._on_message
+        self.client.on_publish = self._on_publish
         self.client.will_set(topic,lwt_message,qos,retain)        
-        self.client.connect(self.broker, self.port, 60)
-        self.client.loop_start()
+        self.sampler.start()
+
+        # Try brokers best-score first; a failure moves straight on to the next one
+        last_error = None
+        for candidate in self.brokers.candidates():
+            self._use_broker(candidate)
+            started = time.monotonic()
+            try:
+                logging.info(f"Connecting to MQTT broker [{self.broker}:{self.port}]")
+                self._connect_current()
+            except Exception as e:
+                logging.warning(f"MQTT broker [{self.broker}:{self.port}] unreachable: {e}")
+                self.brokers.record_failure(candidate)
+                last_error = e
+                continue
+            self.brokers.record_success(candidate, time.monotonic() - started)
+            self.client.loop_start()
+            return
+        raise last_error or ConnectionError("No MQTT brokers configured")
+
+    def _use_broker(self, candidate):
+        self.broker = candidate.host
+        self.port = candidate.port
+        self.client._ssl = candidate.tls and self.client._ssl_context is not None
+        self.client.username_pw_set(candidate.username, candidate.password)
+
+    def _connect_current(self):
+        if self.mqtt5:
+            properties = Properties(PacketTypes.CONNECT)
+            if self.session_expiry:
+                properties.SessionExpiryInterval = self.session_expiry
+            # Resume the broker-side session when one is kept, otherwise start clean
+            self.client.connect(self.broker, self.port, 60, clean_start=not self.session_expiry,
+                                properties=properties)
+        else:
+            self.client.connect(self.broker, self.port, 60)
 
     def disconnect(self):
         disconnect_msg = json.dumps({
@@ -72,9 +169,10 @@ class MQTTClient:
         })
 
         topic = f"{self.sparkplug_namespace}/{self.sp_group_id}/NDEATH/{self.sp_edge_id}"
-        self.client.publish(topic, payload=disconnect_msg, qos=1, retain=False)
+        self.publish_raw(topic, disconnect_msg, qos=1)
 
         try:
+            self.sampler.stop()
             self.client.loop_stop()
             self.client.disconnect()
         finally:
@@ -83,59 +181,48 @@ class MQTTClient:
 
 
     def get_system_info(self):
-        hostname = socket.gethostname()
-        try:
-            ip_address = socket.gethostbyname(hostname)
-        except:
-            ip_address = "unknown"
-        uptime = time.time() - psutil.boot_time()
-        cpu_percent = psutil.cpu_percent(interval=1)
-        mem = psutil.virtual_memory()
-        return {
-            "hostname": hostname,
-            "ip_address": ip_address,
-            "uptime_seconds": round(uptime),
-            "cpu_percent": cpu_percent,
-            "memory": {
-                "total_mb": round(mem.total / 1024 / 1024),
-                "used_mb": round(mem.used / 1024 / 1024),
-                "percent": mem.percent
-            }
-        }
+        snapshot = self.sampler.snapshot()["system"]
+        return snapshot if snapshot is not None else self.sampler.collect_system_info()
 
     def publish_birth_message(self):    
-
-        resp = self.rest_client.get(ota_url+"/containers")
-
+        # From the sampler cache. on_connect (paho's network thread) only calls this
+        # once a snapshot exists; /publishNbirth and /nbirtMsg may be first and wait for one
+        snapshot = self.sampler.current()
              
         birth_msg = json.dumps({
             "drone_id": self.drone_id,
             "status": "online",
             "start_time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-             "system": self.get_system_info(),
-             "deployments": (self.rest_client.get(ota_url+"/containers")).json() # get this from OTA serive           
+             "system": snapshot["system"],
+             "deployments": snapshot["deployments"] # refreshed from the OTA service by the sampler
         })
 
         topic = f"{self.sparkplug_namespace}/{self.sp_group_id}/NBIRTH/{self.sp_edge_id}"
-        self.client.publish(topic, payload=birth_msg, qos=1, retain=False)
+        self.publish_raw(topic, birth_msg, qos=1)
 
         logging.info("Published MQTT birth message")        
 
-    def _on_connect(self, client, userdata, flags, rc):
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
         self.connected = (rc == 0)
+        if self.connected and self.mqtt5:
+            # Aliases are per connection; the broker tells us how many it accepts.
+            # Same lock order as _publish_v5 (alias lock, then paho's)
+            with self.aliases.lock:
+                self._unalias_pending()
+                self.aliases.reset(getattr(properties, "TopicAliasMaximum", 0))
 
         if self.connected:            
             logging.info(f"✅ Connected to MQTT broker [{self.broker}:{self.port}] with code {rc}")
+            self._remember_tls_session(client)
         else:           
             logging.error(f"❌ Failed to connect to MQTT broker [{self.broker}:{self.port}] with code {rc}")
+            if self.brokers.current:
+                self.brokers.record_failure(self.brokers.current)
             return
 
-        # Publish NBIRTH (only if Sparkplug fields exist)
-        try:
-            self.publish_birth_message()
-        except Exception as e:
-            logging.error(f"⚠️ Failed to publish NBIRTH: {e}")
-
+        # Subscribe first so commands are not missed while NBIRTH is prepared
+        # (with a resumed persistent session the broker still has them)
+        self.session_present = bool(flags.get("session present"))
         # Define topics to subscribe
         topics = [
            # f"{self.sparkplug_namespace}/{self.sp_group_id}/+/+/#",  # wildcard for Sparkplug messages
@@ -151,126 +238,218 @@ class MQTTClient:
             f"{self.sparkplug_namespace}/{self.sp_group_id}/DCMD/{self.sp_edge_id}/MAVLINK"
         ]
 
-        # Subscribe and log each topic
-        for t in topics:
+        # Subscribe and log each topic (QoS1 so the broker queues commands while we're away)
+        if self.session_present:
+            logging.info("📡 Resumed persistent session, subscriptions kept by broker")
+        else:
             try:
-                client.subscribe(t)
-                logging.info(f"📡 Subscribed to topic: {t}")
+                client.subscribe([(t, 1) for t in topics])
+                for t in topics:
+                    logging.info(f"📡 Subscribed to topic: {t}")
             except Exception as e:
-                logging.error(f"⚠️ Failed to subscribe to {t}: {e}")
+                logging.error(f"⚠️ Failed to subscribe to {topics}: {e}")
+
+        # Publish NBIRTH from the cached snapshot (or as soon as the first one is ready)
+        self.sampler.when_ready(self._publish_birth_safe)
+
+    def _publish_birth_safe(self):
+        try:
+            self.publish_birth_message()
+        except Exception as e:
+            logging.error(f"⚠️ Failed to publish NBIRTH: {e}")
+
   
-    def _on_disconnect(self, client, userdata, rc):
+    def _remember_tls_session(self, client):
+        # TLS 1.3 tickets arrive after the handshake; by CONNACK the session is resumable
+        sock = client.socket()
+        if self.tls_context is not None and isinstance(sock, ssl.SSLSocket):
+            self.tls_context.session_cache.store(self.broker, sock.session)
+
+    def tls_status(self):
+        if self.tls_context is None:
+            return None
+        return self.tls_context.session_cache.status()
+
+    def _on_disconnect(self, client, userdata, rc, properties=None):
         self.connected = False
         logging.warning("❌ MQTT disconnected")
+        if rc != 0:
+            self.brokers.record_disconnect(self.brokers.current)
+        if self.mqtt5:
+            self._restore_aliased_topics()
+
+    def _restore_aliased_topics(self):
+        """
+        paho re-sends unacknowledged messages after reconnect exactly as queued,
+        but aliases die with the connection — put the full topic back.
+        """
+        with self.client._out_message_mutex:
+            for m in self.client._out_messages.values():
+                alias = getattr(m.properties, "TopicAlias", None) if m.properties else None
+                if alias is None:
+                    continue
+                if not m._topic:
+                    topic = self.aliases.topic_for(alias)
+                    if topic is None:
+                        continue
+                    m._topic = topic.encode("utf-8")
+                delattr(m.properties, "TopicAlias")
 
     def subscribe(self, topic):
         self.client.client.subscribe(topic)
         self.client.client.on_message = self._on_message
 
     def _on_message(self, client, userdata, msg):
-               
+        # Runs on paho's network thread: decode and hand off, never block here
         try:
             payload_str = msg.payload.decode("utf-8")
             logging.info(f"📩 Received message on {msg.topic}: {payload_str}")
-       
-            topic = msg.topic
-            payload = json.loads(msg.payload.decode())
-           
-           
-            if topic.endswith("/deploy"):
-                image = payload.get("image")
-                name = payload.get("name")
-                ports = payload.get("ports")
-                if image and name:
-                    self.rest_client.post(ota_url+"/deploy", payload)                   
-                else:
-                    logging.error(f"Missing 'image' or 'name' in deploy payload")
-                  
-
-            elif topic.endswith("/start"):
-                name = payload.get("name")
-                if name is not None:
-                    # Send as JSON payload                   
-                    resp = self.rest_client.post(f"{ota_url}start", payload)                    
-                    logging.info(f"Start response:{resp.status_code}")
-                   
-                else:
-                    logging.info(f"⚠️ Start command received but no 'name' in payload:{payload}")
-
-            elif topic.endswith("/stop"):              
-                name = payload.get("name")  # will be None if key not present              
-               
-                if name is not None:
-                    # Send as JSON payload                   
-                    resp = self.rest_client.post(f"{ota_url}stop", payload)                    
-                    logging.info(f"Stop response:{resp.status_code}")
-                   
-                else:
-                    logging.info(f"⚠️ Stop command received but no 'name' in payload:{payload}")
-                  
-
-            elif topic.endswith("/restart"):
-                name = payload.get("name")
-                if name is not None:
-                    # Send as JSON payload                   
-                    resp = self.rest_client.post(f"{ota_url}restart", payload)                    
-                    logging.info(f"restart response:{resp.status_code}")
-                   
-                else:
-                    logging.info(f"⚠️ restart command received but no 'name' in payload:{payload}")
-
-            elif topic.endswith("/nbirtMsg"):
-                self.publish_birth_message()
-                    
-
-
-
-            # Only process messages for MAVLINK topics      
-            if "MAVLINK" not in msg.topic.upper():
-                logging.info("⏭ Skipping message (not a MAVLINK topic)")
-                return
-
-            data = json.loads(payload_str)
-
-            if data.get("CMD") == "BIN_FILE":
-                logging.info("📂 Command received to send BIN_FILE.")
-
-                # Call your BIN file upload logic here
-                # Call the MAVLink REST service
-                # if platform.system() == "Windows": #2dl delete later
-                #     url = MAVLINK_URL_LOCALHOST # 2dl read from config
-                # else:
-                #     url = MAVLINK_URL_ENDPOINT  # 2dl read from config
-
-                # self.rest_client.post(mavlink_url, data)
-                self.rest_client.get(mavlink_url)
+            payload = json.loads(payload_str)
+            self.dispatcher.dispatch(msg.topic, payload)
 
         except json.JSONDecodeError as e:
             logging.error(f"Invalid JSON in payload: {e}")
         except Exception as e:
             logging.error(f"Error processing message: {e}")
 
-
-
-
-    def publish(self, topic=None, payload =None, qos=1,storeAndForward = False):   
+    # ------------------------
+    # Command Handlers (run on the dispatcher's worker pool)
+    # ------------------------
+    def _register_command_handlers(self):
+        by_name = lambda payload: payload.get("name")
+        self.dispatcher.register("/deploy", self._handle_deploy, target=by_name)
+        self.dispatcher.register("/start", self._handle_container_action, target=by_name)
+        self.dispatcher.register("/stop", self._handle_container_action, target=by_name)
+        self.dispatcher.register("/restart", self._handle_container_action, target=by_name)
+        self.dispatcher.register("/nbirtMsg", lambda topic, payload: self.publish_birth_message())
+        self.dispatcher.register("/MAVLINK", self._handle_mavlink)
+
+    def _handle_deploy(self, topic, payload):
+        image = payload.get("image")
+        name = payload.get("name")
+        if image and name:
+            self.rest_client.post(ota_url+"deploy", payload)                   
+        else:
+            logging.error(f"Missing 'image' or 'name' in deploy payload")
+
+    def _handle_container_action(self, topic, payload):
+        action = topic.rsplit("/", 1)[-1]   # start / stop / restart
+        name = payload.get("name")
+        if name is not None:
+            # Send as JSON payload                   
+            resp = self.rest_client.post(f"{ota_url}{action}", payload)                    
+            logging.info(f"{action} response:{resp.status_code if resp is not None else 'no response'}")
+        else:
+            logging.info(f"⚠️ {action} command received but no 'name' in payload:{payload}")
+
+    def _handle_mavlink(self, topic, payload):
+        if payload.get("CMD") == "BIN_FILE":
+            logging.info("📂 Command received to send BIN_FILE.")
+            # Call the MAVLink REST service
+            self.rest_client.get(mavlink_url)
+
+    def publish(self, topic=None, payload =None, qos=1,storeAndForward = False, enqueued_at=None):   
         actual_topic = topic or self.topic
         if not self.connected:
             logging.warning("❌ MQTT not connected")
             return None
         
-        logging.info(f"✅ Published to {actual_topic} [qos={qos}]")
+        logging.debug(f"✅ Published to {actual_topic} [qos={qos}]")
 
   
         if actual_topic.endswith("/binFile"):
-            return self.client.publish(actual_topic, payload, qos=qos)
+            return self.publish_raw(actual_topic, payload, qos=qos, enqueued_at=enqueued_at)
 
         python_dict = ast.literal_eval(payload)
         payload_json_string = json.dumps(python_dict)   
 
-        return self.client.publish(actual_topic, payload_json_string, qos=qos)
-
+        return self.publish_raw(actual_topic, payload_json_string, qos=qos, enqueued_at=enqueued_at)
 
+    def publish_raw(self, topic, payload, qos=1, enqueued_at=None):
+        """Publish an already-encoded payload (str/bytes) without conversion."""
+        if not self.connected:
+            logging.warning("❌ MQTT not connected")
+            return None
+        sent_at = time.monotonic()
+        started = enqueued_at or sent_at
+        if self.mqtt5:
+            result = self._publish_v5(topic, payload, qos)
+        else:
+            result = self.client.publish(topic, payload, qos=qos)
+        if result.rc == mqtt.MQTT_ERR_SUCCESS:
+            size = len(payload.encode("utf-8")) if isinstance(payload, str) else len(payload or b"")
+            PUBLISHED_MESSAGES.inc(labels=(topic,))
+            PUBLISHED_BYTES.inc(size, labels=(topic,))
+            self._account(topic, size, qos)
+            self._track_ack(result.mid, started, sent_at)
+        return result
+
+    def _account(self, topic, size, qos):
+        if self.usage is not None:
+            # Full topic even when a v5 alias is sent: an upper bound is what a budget wants
+            tls = bool(getattr(self.client, "_ssl", False))
+            self.usage.record(topic, size, estimate_wire_bytes(topic, size, qos, tls))
+
+    def _track_ack(self, mid, started, sent_at):
+        with self.ack_lock:
+            acked_at = self.early_acks.pop(mid, None)
+            # An ack from before this publish was for an earlier message with the same (reused) mid
+            if acked_at is None or acked_at < sent_at:
+                self.pending_acks[mid] = started
+                if len(self.pending_acks) > MAX_TRACKED_ACKS:
+                    self.pending_acks.popitem(last=False)
+                return
+        # PUBACK beat us back from the network thread
+        PUBLISH_LATENCY.observe(max(0.0, acked_at - started))
+
+    def _on_publish(self, client, userdata, mid):
+        now = time.monotonic()
+        with self.ack_lock:
+            started = self.pending_acks.pop(mid, None)
+            if started is None:
+                # Only kept until the publishing thread picks it up
+                self.early_acks.pop(mid, None)
+                self.early_acks[mid] = now
+                while self.early_acks and (len(self.early_acks) > MAX_TRACKED_ACKS
+                                           or next(iter(self.early_acks.values())) < now - EARLY_ACK_SECONDS):
+                    self.early_acks.popitem(last=False)
+                return
+        PUBLISH_LATENCY.observe(now - started)
+
+    def _unalias_pending(self):
+        """Messages paho resends after the CONNACK go out with full topics: the old aliases are gone."""
+        with self.client._out_message_mutex:
+            for message in self.client._out_messages.values():
+                alias = getattr(message.properties, "TopicAlias", None)
+                if alias is None:
+                    continue
+                if not message.topic:
+                    message.topic = (self.aliases.topic_for(alias) or "").encode("utf-8")
+                delattr(message.properties, "TopicAlias")
+
+    def _publish_v5(self, topic, payload, qos):
+        properties = Properties(PacketTypes.PUBLISH)
+        has_properties = False
+        if self.message_expiry and "/DDATA/" in topic:
+            # Telemetry that can't be delivered in time is dropped by the broker
+            properties.MessageExpiryInterval = self.message_expiry
+            has_properties = True
+
+        def send(send_topic, alias):
+            # Runs under the alias lock: paho queues the announce before any reuse
+            if alias is not None:
+                properties.TopicAlias = alias
+            return self.client.publish(send_topic, payload, qos=qos,
+                                       properties=properties if has_properties or alias is not None else None)
+        return self.aliases.publish(topic, send)
+
+
+    def queue_stats(self):
+        """In-flight and total unacknowledged outgoing messages held by paho."""
+        return {
+            "inflight": getattr(self.client, "_inflight_messages", 0),
+            "queued": len(getattr(self.client, "_out_messages", ())),
+        }
 
     def is_connected(self):
         return self.connected
\ No newline at end of file
@@ -3,7 +3,13 @@ import sys
 import os
 
 from core.mqttClient import MQTTClient
-from utils.db_buffer import DBBuffer
+from core.coalescer import MessageCoalescer
+from core.rate_governor import RateGovernor
+from core.reconnect_manager import ReconnectManager
+from core.replay_policy import BacklogCompactor, is_compactable, parse_row
+from core.lane_scheduler import LaneScheduler, classify, chunk_message
+from core.data_budget import DataBudget
+from utils.metrics import Counter, Gauge
 import json
 import time
 import threading
@@ -12,39 +18,155 @@ import ast
 from utils.logger import setup_logger
 logging = setup_logger(__name__)
 
+REPLAYED = Counter("mqtt_eon_replayed_total", "Buffered messages replayed to the broker")
+REPLAY_FAILURES = Counter("mqtt_eon_replay_failures_total", "Buffered messages that failed to replay")
+CONNECTED = Gauge("mqtt_eon_mqtt_connected", "1 while connected to an MQTT broker")
+RECONNECTS = Counter("mqtt_eon_reconnects_total", "Successful MQTT reconnections after the first connect")
+PAHO_QUEUED = Gauge("mqtt_eon_paho_queued_messages", "Outgoing messages held by paho (queued + in flight)")
+PAHO_INFLIGHT = Gauge("mqtt_eon_paho_inflight_messages", "QoS>0 messages awaiting PUBACK")
+PUBLISH_QUEUE_DEPTH = Gauge("mqtt_eon_publish_queue_depth", "Messages waiting in the /publish lanes")
+PUBLISH_QUEUE_SPILLED = Counter("mqtt_eon_publish_queue_spilled_total", "Messages spilled to disk because a lane was full")
+
 
 # ------------------------
 # Publisher Class
 # ------------------------
 class MQTTPublisher:
     def __init__(self, mqtt_broker, mqtt_port, topic, drone_uid,buffer,sparkplug_namespace,
-                            sp_group_id,sp_edge_id,sp_device_id,username,password):
+                            sp_group_id,sp_edge_id,sp_device_id,username,password,config=None):
+        config = config or {}
         self.broker = mqtt_broker
         self.port = mqtt_port
         self.topic = topic
         self.client = MQTTClient(mqtt_broker, mqtt_port, topic, drone_uid,sparkplug_namespace,
-                            sp_group_id,sp_edge_id,sp_device_id,username,password)
+                            sp_group_id,sp_edge_id,sp_device_id,username,password,config)
         
         self.mqtt_connected = False
         self.thread = None
+        self.publish_thread = None
         self.running = False
+        self.reconnector = None
+        self.reconnect_settings = {"min_delay": config.get("reconnect_min_delay", 1),
+                                   "max_delay": config.get("reconnect_max_delay", 60)}
         self.buffer = buffer
+        # /publish enqueues into priority lanes and returns; publish_loop() drains them.
+        # Bulk messages are only handed to paho while few of them are unacknowledged,
+        # so a large upload never sits in front of a state message. Chunking is off
+        # (0) by default: binFile then keeps its single-message wire format
+        self.bulk_chunk_bytes = config.get("bulk_chunk_bytes", 0)
+        self.bulk_max_queued = config.get("bulk_max_queued", 10)
+        self.bulk_inflight = []     # MQTTMessageInfo of bulk publishes not yet acknowledged
+        self.queue = LaneScheduler(
+            capacities={"control": config.get("lane_capacity_control", 1000),
+                        "telemetry": config.get("publish_queue_size", 10000),
+                        "bulk": config.get("lane_capacity_bulk", 256)},
+            mode=config.get("lane_mode", "strict"),
+            weights=config.get("lane_weights"),
+            bulk_ready=self.bulk_ready)
         self.sparkplug_namespace = sparkplug_namespace
         self.sp_group_id = sp_group_id
         self.sp_edge_id = sp_edge_id
         self.sp_device_id = sp_device_id
         self.drone_uid = drone_uid
+
+        # How the backlog is replayed after an outage (compaction runs on each reconnect)
+        # newest_first: (row id up to which the backlog is all telemetry, buffer.stored then)
+        self.replay_scanned = (0, None)
+        self.compactor = BacklogCompactor(
+            policy=config.get("replay_policy", "fifo"),
+            downsample_after=config.get("replay_downsample_after_minutes", 10) * 60,
+            bucket_seconds=config.get("replay_downsample_bucket_seconds", 60))
+
+        # Per-topic byte accounting; telemetry steps down as the daily/monthly budget fills
+        self.usage = DataBudget(
+            path=config.get("usage_path"),
+            daily_bytes=config.get("data_budget_daily_bytes", 0),
+            monthly_bytes=config.get("data_budget_monthly_bytes", 0),
+            billing_day=config.get("data_budget_billing_day", 1),
+            steps=config.get("data_budget_steps"),
+            mode=config.get("data_budget_mode", "decimate"))
+        self.client.usage = self.usage
+
+        # Optional time-windowed coalescing of small messages per topic. With the
+        # "coalesce" budget mode it is also used for telemetry once a budget step is hit
+        self.coalesce_always = bool(config.get("coalesce_enabled"))
+        self.coalescer = None
+        if self.coalesce_always or self.usage.mode == "coalesce":
+            self.coalescer = MessageCoalescer(
+                self.client, buffer,
+                window_ms=config.get("coalesce_window_ms" if self.coalesce_always else "data_budget_coalesce_window_ms",
+                                     200 if self.coalesce_always else 5000),
+                fmt=config.get("coalesce_format", "json"),
+                max_batch=config.get("coalesce_max_batch", 100),
+                exclude_topics=config.get("coalesce_exclude_topics", []))
+
+        # Optional token-bucket governor in front of client.publish
+        self.governor = None
+        if config.get("governor_enabled"):
+            self.governor = RateGovernor(
+                self.client,
+                global_rate=config.get("governor_global_rate", 50),
+                global_burst=config.get("governor_global_burst", 100),
+                topic_rate=config.get("governor_topic_rate", 20),
+                topic_burst=config.get("governor_topic_burst", 40),
+                max_queued=config.get("governor_max_queued", 500),
+                overflow=config.get("governor_overflow", "buffer"))
+            # Hard ceiling inside paho as well, so nothing else can grow its queue unbounded
+            self.client.client.max_queued_messages_set(self.governor.max_queued)
+        self._bind_metrics()
+
+    def _bind_metrics(self):
+        """Values read from live state at scrape time."""
+        CONNECTED.set_function(lambda: int(self.mqtt_connected))
+        RECONNECTS.set_function(lambda: self.connection_status().get("reconnects", 0))
+        PAHO_QUEUED.set_function(lambda: self.client.queue_stats()["queued"])
+        PAHO_INFLIGHT.set_function(lambda: self.client.queue_stats()["inflight"])
+        PUBLISH_QUEUE_DEPTH.set_function(lambda: len(self.queue))
+        PUBLISH_QUEUE_SPILLED.set_function(lambda: self.queue.dropped)
   
     
+    def bulk_ready(self):
+        """True while fewer than bulk_max_queued bulk-lane messages await their PUBACK."""
+        self.bulk_inflight = [info for info in self.bulk_inflight if not info.is_published()]
+        return len(self.bulk_inflight) < self.bulk_max_queued
+
     def store_payload(self, payload):        
         self.buffer.store_payload(payload)
+
+    def admit(self, topic):
+        """Return 0 if a publish on topic is within budget, else a retry-after hint in seconds."""
+        if self.governor:
+            return self.governor.admit(topic)
+        return 0
+
+    def enqueue(self, topic, message, coalesce=True):
+        """Queue a message for the publisher thread; False means its lane is full."""
+        enqueued_at = time.monotonic()
+        if (self.bulk_chunk_bytes and classify(topic) == "bulk"
+                and isinstance(message, str) and len(message) > self.bulk_chunk_bytes):
+            chunks = chunk_message(topic, message, self.bulk_chunk_bytes)
+            for chunk in chunks:
+                chunk["enqueued_at"] = enqueued_at
+            return self.queue.put_many(chunks)
+        return self.queue.put({"topic": topic, "message": message, "coalesce": coalesce,
+                               "enqueued_at": enqueued_at})
+
+    def publish(self, topic, message, coalesce=True, enqueued_at=None):
+        """Publish a message, holding it for a coalesced batch when enabled for the topic."""
+        if (coalesce and self.coalescer and self.coalescer.accepts(topic)
+                and (self.coalesce_always or self.usage.wants_coalescing(topic))):
+            return self.coalescer.add(topic, message)
+        return self.client.publish(topic, message, enqueued_at=enqueued_at)
    
 
     def flush_buffer(self, max_flush=10):
         try:
-            rows= self.buffer.getAllRows()             
-            for i, (row_id, payload) in enumerate(rows):
-                if i >= max_flush:
+            rows= self.buffer.getAllRows(limit=max_flush)             
+            if self.compactor.policy == "newest_first":
+                rows = self.replay_order(rows, max_flush)
+            for row_id, payload in rows:
+                if self.governor and self.governor.backlogged():
+                    logging.debug("Outgoing queue full, pausing replay.")
                     break
                 
                 payload_dict = ast.literal_eval(payload)
@@ -52,56 +174,79 @@ class MQTTPublisher:
                 topic = payload_dict.get('topic', self.topic)  # optional override
               
                 message = payload_dict['message']               
+                if not self.usage.allow(topic):
+                    # Decimated by the data budget: acknowledged without sending
+                    self.buffer.delete(row_id)
+                    continue
                 result = self.client.publish(topic, message,1)
                 
                 if result.rc == 0:
                     self.buffer.delete(row_id)                    
-                    logging.info(f"✅ Replayed: {payload}")
+                    REPLAYED.inc()
+                    logging.debug(f"✅ Replayed: {payload}")
                 else:
+                    REPLAY_FAILURES.inc()
                     logging.warning("❌ Failed to publish buffered message.")
                     break
         except Exception as e:
             logging.error(f"Failed to flush buffer: {e}")
 
 
-    def connect_mqtt_with_retries(self,max_retries=10, delay_seconds=1):
-        attempt = 0
+    def replay_order(self, rows, max_flush):
+        """
+        newest_first: commands, state and binFile rows replay in full and in
+        order ahead of all telemetry, wherever they sit in the backlog; DDATA
+        telemetry follows newest first.
+
+        The scan for them starts after the rows already known to be telemetry,
+        from the start again whenever rows were stored meanwhile (sqlite may
+        reuse ids below the mark).
+        """
+        stored = self.buffer.stored
+        scanned = self.replay_scanned[0] if self.replay_scanned[1] == stored else 0
+        ordered = []
+        for row_id, payload in self.buffer.iterRows(after_id=scanned):
+            if not is_compactable(parse_row(payload)[0]):
+                ordered.append((row_id, payload))
+                if len(ordered) >= max_flush:
+                    break
+            elif not ordered:
+                scanned = row_id    # everything up to here is telemetry
+        self.replay_scanned = (scanned, stored)
+        if ordered:
+            return ordered
+        newest = self.buffer.getAllRows(limit=max_flush, newest_first=True)
+        return [row for row in newest if is_compactable(parse_row(row[1])[0])] or rows
+
+    def lwt(self):
         # --- LWT Setup ---
         lwt_message = json.dumps({
             "drone_id": self.drone_uid,
             "status": "offline",
             "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
         })
-        
-        while True:
-            try:
-                logging.info(f"Attempting to connect to MQTT broker ({self.broker}:{self.port})... [Attempt {attempt + 1}]")
-                self.client.connect(f"{self.sparkplug_namespace}/{self.sp_group_id}/NDEATH/{self.sp_edge_id}", 
-                                    lwt_message, 1, False)
-                logging.info("MQTT connected successfully.")
-                self.mqtt_connected = True
-                break
-            except Exception as e:
-                attempt += 1
-                logging.warning(f"MQTT connection failed: {e}")
-                # if attempt >= max_retries:
-                #     log.error("Max retries reached. Giving up.")
-                #     raise e
-                self.mqtt_connected = False
-                time.sleep(delay_seconds)               
+        return (f"{self.sparkplug_namespace}/{self.sp_group_id}/NDEATH/{self.sp_edge_id}",
+                lwt_message, 1, False)
 
     def start(self):
+        """Start the worker threads; connecting happens in the background (see /status)."""
         if self.running:
             logging.info("Already running.")
             return False
         try:          
-            self.connect_mqtt_with_retries(5,1)
             self.running = True      
+            if self.coalescer:
+                self.coalescer.start()
+            self.publish_thread = threading.Thread(target=self.publish_loop, daemon=True)
+            self.publish_thread.start()
             self.thread = threading.Thread(target=self.run_loop, daemon=True)
             self.thread.start()            
+            self.reconnector = ReconnectManager(self.client, self.lwt(), **self.reconnect_settings)
+            self.reconnector.start()
             return True
         except Exception as e:
             logging.error(f"Start failed: {e}")
+            self.running = False
             return False
 
     def stop(self):
@@ -109,8 +254,18 @@ class MQTTPublisher:
             logging.info("Not running.")
             return False
         self.running = False   
+        if self.reconnector:
+            self.reconnector.stop()
         if self.thread:
             self.thread.join(timeout=3)     
+        if self.publish_thread:
+            self.publish_thread.join(timeout=3)
+        # Anything still queued goes to disk rather than being lost
+        for item in self.queue.drain():
+            self.store_payload({"topic": item["topic"], "message": item["message"]})
+        if self.coalescer:
+            self.coalescer.stop()
+        self.usage.save()
        
         self.client.disconnect()
         self.mqtt_connected = False
@@ -120,18 +275,52 @@ class MQTTPublisher:
     def is_mqtt_connected(self):
         return self.mqtt_connected
 
+    def connection_status(self):
+        if self.reconnector is None:
+            return {"state": "stopped"}
+        return self.reconnector.status()
+
     def run_loop(self):
         logging.info("Started run_loop() thread for store and forward messages.")
         while self.running:
             #logging.info(f"Checking for store and forward messages !!!!")   
+            was_connected = self.mqtt_connected
             self.mqtt_connected = self.client.is_connected() 
                 
             try:
+                if self.mqtt_connected and not was_connected:
+                    # Back online: thin out stale telemetry before replaying it
+                    self.compactor.compact(self.buffer)
                 if self.mqtt_connected:
                     self.flush_buffer()
-                    time.sleep(1.0)
+                self.usage.maybe_save()
+                time.sleep(1.0)
             except Exception as e:
                 logging.error(f"❌ Exception in run_loop: {e}", exc_info=True)
 
+    def publish_loop(self):
+        logging.info("Started publish_loop() thread for queued /publish messages.")
+        while self.running:
+            item = self.queue.get(timeout=0.5)
+            if item is None:
+                continue
+            topic, message = item["topic"], item["message"]
+            try:
+                result = None
+                if self.client.is_connected():
+                    if item.get("chunk"):
+                        result = self.client.publish_raw(topic, message, qos=1, enqueued_at=item["enqueued_at"])
+                    else:
+                        result = self.publish(topic, message, item["coalesce"], item["enqueued_at"])
+                if result and getattr(result, "rc", 1) == 0:
+                    if classify(topic) == "bulk" and hasattr(result, "is_published"):
+                        self.bulk_inflight.append(result)
+                    logging.debug(f"Payload: {message}, topic: {topic}")
+                else:
+                    self.store_payload({"topic": topic, "message": message})
+            except Exception as e:
+                logging.error(f"❌ Queued publish failed, buffering: {e}")
+                self.store_payload({"topic": topic, "message": message})
+
     def sendNbirthMsg(self):
         return self.client.publish_birth_message()
\ No newline at end of file
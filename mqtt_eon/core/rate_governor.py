@@ -0,0 +1,94 @@
+import threading
+import time
+
+from utils.logger import setup_logger
+logging = setup_logger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = float(max(burst, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now, n=1):
+        """Seconds until n tokens are available (0 if available now)."""
+        self._refill(now)
+        if self.tokens >= n:
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (n - self.tokens) / self.rate
+
+    def take(self, n=1):
+        self.tokens -= n
+
+
+# ------------------------
+# Outbound Rate Governor
+# ------------------------
+class RateGovernor:
+    """
+    Global and per-topic token buckets in front of MQTTClient.publish, plus a
+    ceiling on paho's own outgoing queue so a degraded uplink does not let it
+    grow without bound.
+    """
+    OVERFLOW_POLICIES = ("buffer", "reject")
+
+    def __init__(self, client, global_rate=50, global_burst=100, topic_rate=20, topic_burst=40,
+                 max_queued=500, overflow="buffer"):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown governor overflow policy '{overflow}', expected one of {self.OVERFLOW_POLICIES}")
+        self.client = client
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.topic_rate = topic_rate
+        self.topic_burst = topic_burst
+        self.topic_buckets = {}
+        self.max_queued = max_queued
+        self.overflow = overflow
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def backlogged(self):
+        """True when paho already holds more unacknowledged messages than allowed."""
+        stats = self.client.queue_stats()
+        return stats["queued"] >= self.max_queued
+
+    def admit(self, topic):
+        """Return 0 if the publish may go ahead, otherwise a retry-after hint in seconds."""
+        if self.backlogged():
+            self._count_throttle(topic, "paho queue full")
+            return 1.0
+
+        with self.lock:
+            now = time.monotonic()
+            bucket = self.topic_buckets.get(topic)
+            if bucket is None:
+                bucket = self.topic_buckets[topic] = TokenBucket(self.topic_rate, self.topic_burst)
+
+            # Only spend tokens when both buckets allow it
+            wait = max(bucket.wait_time(now), self.global_bucket.wait_time(now))
+            if wait == 0:
+                bucket.take()
+                self.global_bucket.take()
+                return 0.0
+
+        self._count_throttle(topic, "rate budget exceeded")
+        return round(min(wait, 60.0), 3)
+
+    def _count_throttle(self, topic, reason):
+        self.throttled += 1
+        logging.debug(f"Throttled publish on {topic}: {reason}")
+
+    def status(self):
+        return {
+            "throttled": self.throttled,
+            "overflow": self.overflow,
+            "max_queued": self.max_queued,
+            **self.client.queue_stats()
+        }
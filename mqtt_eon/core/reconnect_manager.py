@@ -0,0 +1,112 @@
+import random
+import threading
+import time
+
+from utils.logger import setup_logger
+logging = setup_logger(__name__)
+
+
+# ------------------------
+# Reconnect Manager
+# ------------------------
+class ReconnectManager:
+    """
+    Owns the MQTT connection on a background thread so callers never block on
+    the broker. States: stopped -> connecting -> connected -> backoff -> connecting ...
+
+    Every attempt goes through MQTTClient.connect(), i.e. the broker selector,
+    so a broker in cooldown is skipped immediately. Between attempts it sleeps
+    a "full jitter" exponential backoff: uniform(0, min(max_delay, min_delay * 2^n)).
+    """
+    def __init__(self, client, lwt, min_delay=1, max_delay=60, connack_timeout=10):
+        self.client = client
+        self.lwt = lwt                      # (topic, message, qos, retain)
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.connack_timeout = connack_timeout
+
+        self.state = "stopped"
+        self.attempt = 0
+        self.last_error = None
+        self.next_retry_at = None
+        self.state_since = time.time()
+        self.connections = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.client.client._connect_timeout + 2)
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.min_delay * 2 ** (attempt - 1)))
+
+    def _set_state(self, state):
+        if state != self.state:
+            logging.info(f"MQTT connection state: {self.state} -> {state}")
+            self.state = state
+            self.state_since = time.time()
+
+    def _wait_connected(self):
+        deadline = time.monotonic() + self.connack_timeout
+        while time.monotonic() < deadline and not self.stop_event.is_set():
+            if self.client.is_connected():
+                return True
+            self.stop_event.wait(0.1)
+        return self.client.is_connected()
+
+    def run_loop(self):
+        logging.info("Started reconnect manager thread.")
+        while not self.stop_event.is_set():
+            self.attempt += 1
+            self.next_retry_at = None
+            self._set_state("connecting")
+            try:
+                self.client.connect(*self.lwt)
+                if not self._wait_connected():
+                    raise ConnectionError(f"No successful CONNACK within {self.connack_timeout}s")
+
+                self.connections += 1
+                self.attempt = 0
+                self.last_error = None
+                self._set_state("connected")
+                while self.client.is_connected() and not self.stop_event.wait(0.5):
+                    pass
+                if self.stop_event.is_set():
+                    break
+                logging.warning("MQTT connection lost, reconnecting in background")
+            except Exception as e:
+                self.last_error = str(e)
+                logging.warning(f"MQTT connect attempt {self.attempt} failed: {e}")
+
+            # Take reconnection over from paho's own loop so every retry is jittered
+            # and may move to another broker
+            self.client.client.loop_stop()
+            delay = self.backoff(max(self.attempt, 1))
+            self.next_retry_at = time.time() + delay
+            self._set_state("backoff")
+            self.stop_event.wait(delay)
+
+        self.next_retry_at = None
+        self._set_state("stopped")
+
+    def status(self):
+        next_retry = None
+        if self.next_retry_at is not None:
+            next_retry = max(0.0, round(self.next_retry_at - time.time(), 1))
+        return {
+            "state": self.state,
+            "since": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.state_since)),
+            "attempt": self.attempt,
+            "next_retry_seconds": next_retry,
+            "last_error": self.last_error,
+            "reconnects": max(0, self.connections - 1),
+        }
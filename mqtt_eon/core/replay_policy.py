@@ -0,0 +1,123 @@
+import ast
+import re
+import time
+
+from utils.logger import setup_logger
+from utils.metrics import Counter
+logging = setup_logger(__name__)
+
+COMPACTED = Counter("mqtt_eon_replay_compacted_total", "Buffered rows dropped by the replay policy")
+
+REPLAY_POLICIES = ("fifo", "newest_first", "last_value", "downsample")
+MESSAGE_TYPE = re.compile(r"""['"]messageType['"]: ['"]([^'"]+)['"]""")
+
+
+def is_compactable(topic):
+    """Only Sparkplug telemetry may be thinned out; commands, state and bin-file chunks replay in full."""
+    return "/DDATA/" in topic and "/binFile" not in topic
+
+
+def parse_row(payload):
+    """(topic, messageType, stored_at) of a buffered row; stored_at is None for rows buffered before it existed."""
+    row = ast.literal_eval(payload)
+    message = row.get("message")
+    match = MESSAGE_TYPE.search(message) if isinstance(message, str) else None
+    return row.get("topic", ""), match.group(1) if match else None, row.get("stored_at")
+
+
+# ------------------------
+# Backlog Compaction
+# ------------------------
+class BacklogCompactor:
+    """
+    Thins out buffered telemetry before it is replayed (run on reconnect):
+
+    - last_value: keep only the newest row per (topic, messageType)
+    - downsample: rows older than downsample_after seconds keep one row per
+      (topic, messageType, bucket_seconds); newer rows are kept as they are
+
+    Rows without a messageType are never dropped. fifo and newest_first drop
+    nothing; newest_first is a replay order for compactable telemetry only
+    (see MQTTPublisher.flush_buffer). Rows are streamed with iterRows() and
+    dropped with delete_many(), so the backlog is never loaded whole.
+    """
+    def __init__(self, policy="fifo", downsample_after=600, bucket_seconds=60, batch_size=1000):
+        if policy not in REPLAY_POLICIES:
+            raise ValueError(f"Unknown replay policy '{policy}', expected one of {REPLAY_POLICIES}")
+        self.policy = policy
+        self.downsample_after = downsample_after
+        self.bucket_seconds = bucket_seconds
+        self.batch_size = batch_size
+        self.runs = 0
+        self.dropped = 0
+        self.last_run = None
+
+    def _rows(self, buffer):
+        for row_id, payload in buffer.iterRows():
+            try:
+                topic, message_type, stored_at = parse_row(payload)
+            except (ValueError, SyntaxError):
+                continue                # left for flush_buffer to report
+            # Without a messageType rows can't be told apart, so none of them is dropped
+            if is_compactable(topic) and message_type is not None:
+                yield row_id, (topic, message_type), stored_at
+
+    def _drop(self, buffer, row_ids):
+        buffer.delete_many(row_ids)
+        COMPACTED.inc(len(row_ids))
+        self.dropped += len(row_ids)
+
+    def compact(self, buffer):
+        """Apply the policy to everything currently buffered; returns the number of rows dropped."""
+        if self.policy not in ("last_value", "downsample"):
+            return 0
+        started = time.monotonic()
+        dropped, pending = 0, []
+
+        if self.policy == "last_value":
+            # Pass 1: newest row per key. Pass 2: drop the rest.
+            newest = {}
+            for row_id, key, _ in self._rows(buffer):
+                newest[key] = row_id
+            candidates = ((row_id, newest[key] != row_id) for row_id, key, _ in self._rows(buffer))
+        else:
+            cutoff = time.time() - self.downsample_after
+            seen = set()
+
+            def downsample():
+                for row_id, key, stored_at in self._rows(buffer):
+                    if stored_at is None or stored_at >= cutoff:
+                        yield row_id, False
+                        continue
+                    bucket = key + (int(stored_at // self.bucket_seconds),)
+                    yield row_id, bucket in seen
+                    seen.add(bucket)
+            candidates = downsample()
+
+        for row_id, drop in candidates:
+            if drop:
+                pending.append(row_id)
+                if len(pending) >= self.batch_size:
+                    self._drop(buffer, pending)
+                    dropped += len(pending)
+                    pending = []
+        if pending:
+            self._drop(buffer, pending)
+            dropped += len(pending)
+
+        self.runs += 1
+        self.last_run = {"at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "dropped": dropped,
+                         "seconds": round(time.monotonic() - started, 2)}
+        logging.info(f"Replay policy {self.policy}: dropped {dropped} stale telemetry rows "
+                     f"in {self.last_run['seconds']}s")
+        return dropped
+
+    def status(self):
+        return {
+            "policy": self.policy,
+            "downsample_after_seconds": self.downsample_after,
+            "bucket_seconds": self.bucket_seconds,
+            "runs": self.runs,
+            "dropped": self.dropped,
+            "last_run": self.last_run,
+        }
@@ -0,0 +1,98 @@
+import threading
+import time
+
+from utils.logger import setup_logger
+from utils.rest_client import RestClient
+from utils.host_metrics import get_host_sampler
+logging = setup_logger(__name__)
+
+
+# ------------------------
+# Background Snapshot Sampler
+# ------------------------
+class SnapshotSampler:
+    """
+    Keeps the system info and OTA deployment list used by NBIRTH fresh on a
+    background thread, so the birth message can be built from cache inside
+    paho's on_connect callback without any blocking I/O.
+    """
+    def __init__(self, ota_url, interval=15, timeout=5):
+        self.ota_url = ota_url
+        self.interval = interval
+        self.rest_client = RestClient(timeout=timeout)
+
+        self.system = None
+        self.deployments = None
+        self.updated_at = None
+        self.ready = False
+        self.callbacks = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive() and not self.stop_event.is_set():
+            return
+        # Fresh event per thread: a stopped thread still blocked in a REST call
+        # exits on its own event while the new one runs
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run_loop, args=(self.stop_event,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run_loop(self, stop_event):
+        while not stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Snapshot refresh failed: {e}")
+            stop_event.wait(self.interval)
+
+    def refresh(self):
+        system = self.collect_system_info()
+        deployments = self.collect_deployments()
+        with self.lock:
+            self.system = system
+            if deployments is not None or self.deployments is None:
+                self.deployments = deployments  # keep last known list if OTA is unreachable
+            self.updated_at = time.time()
+            self.ready = True
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"Snapshot callback failed: {e}")
+
+    def when_ready(self, callback):
+        """Run callback now if a snapshot exists, otherwise after the first refresh."""
+        with self.lock:
+            if not self.ready:
+                self.callbacks.append(callback)
+                return
+        callback()
+
+    def current(self):
+        """The cached snapshot, taken synchronously first if there is none yet."""
+        if not self.ready:
+            self.refresh()
+        return self.snapshot()
+
+    def snapshot(self):
+        with self.lock:
+            return {"system": self.system, "deployments": self.deployments}
+
+    def collect_system_info(self):
+        # Host metrics come from the shared background sampler's cache
+        return get_host_sampler().snapshot()
+
+    def collect_deployments(self):
+        resp = self.rest_client.get(self.ota_url + "containers")
+        if resp is None or resp.status_code != 200:
+            return None
+        try:
+            return resp.json()
+        except ValueError:
+            return None
@@ -0,0 +1,107 @@
+import ssl
+import threading
+import time
+
+from utils.logger import setup_logger
+logging = setup_logger(__name__)
+
+
+# ------------------------
+# TLS Session Resumption
+# ------------------------
+class TLSSessionCache:
+    """Last TLS session per broker host plus handshake timing / resumption counters."""
+    def __init__(self):
+        self.sessions = {}
+        self.handshakes = 0
+        self.resumed = 0
+        self.total_ms = 0.0
+        self.last_ms = None
+        self.last_resumed = None
+        self.lock = threading.Lock()
+
+    def get(self, host):
+        with self.lock:
+            return self.sessions.get(host)
+
+    def store(self, host, session):
+        if host and session is not None:
+            with self.lock:
+                self.sessions[host] = session
+
+    def forget(self, host):
+        with self.lock:
+            self.sessions.pop(host, None)
+
+    def record_handshake(self, host, seconds, resumed):
+        ms = seconds * 1000
+        with self.lock:
+            self.handshakes += 1
+            self.resumed += 1 if resumed else 0
+            self.total_ms += ms
+            self.last_ms = ms
+            self.last_resumed = resumed
+        logging.info(f"🔐 TLS handshake with {host}: {ms:.0f} ms ({'resumed' if resumed else 'full'})")
+
+    def status(self):
+        with self.lock:
+            return {
+                "handshakes": self.handshakes,
+                "resumed": self.resumed,
+                "resumption_rate": round(self.resumed / self.handshakes, 3) if self.handshakes else None,
+                "avg_handshake_ms": round(self.total_ms / self.handshakes, 1) if self.handshakes else None,
+                "last_handshake_ms": round(self.last_ms, 1) if self.last_ms is not None else None,
+                "last_resumed": self.last_resumed,
+            }
+
+
+class TimedSSLSocket(ssl.SSLSocket):
+    """Times the handshake paho drives and remembers the resulting session."""
+    def do_handshake(self, block=False):
+        started = time.perf_counter()
+        super().do_handshake(block)
+        cache = self.context.session_cache
+        cache.record_handshake(self.server_hostname, time.perf_counter() - started, self.session_reused)
+        cache.store(self.server_hostname, self.session)
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """SSLContext that offers the cached session for the host on every new connection."""
+    sslsocket_class = TimedSSLSocket
+
+    @classmethod
+    def create(cls, cafile=None):
+        # Same defaults as paho's tls_set(tls_version=PROTOCOL_TLS_CLIENT)
+        context = cls(ssl.PROTOCOL_TLS_CLIENT)
+        context.session_cache = TLSSessionCache()
+        if cafile:
+            context.load_verify_locations(cafile)
+        else:
+            context.load_default_certs()
+        return context
+
+    def wrap_socket(self, sock, server_side=False, do_handshake_on_connect=True,
+                    suppress_ragged_eofs=True, server_hostname=None, session=None):
+        if session is None and server_hostname:
+            session = self._resumable(server_hostname)
+        try:
+            return super().wrap_socket(sock, server_side=server_side,
+                                       do_handshake_on_connect=do_handshake_on_connect,
+                                       suppress_ragged_eofs=suppress_ragged_eofs,
+                                       server_hostname=server_hostname, session=session)
+        except ValueError:
+            # sock is already closed by now, so no retry here: the next reconnect
+            # starts from a fresh socket and does a full handshake
+            if session is not None:
+                self.session_cache.forget(server_hostname)
+            raise
+
+    def _resumable(self, host):
+        """The cached session for host if the server can still resume it, else None."""
+        session = self.session_cache.get(host)
+        if session is None:
+            return None
+        if not session.has_ticket or time.time() > session.time + session.timeout:
+            self.session_cache.forget(host)
+            return None
+        return session
@@ -0,0 +1,80 @@
+import threading
+
+# A PUBLISH carrying a Topic Alias spends 3 bytes on it (property id + 2-byte value)
+ALIAS_PROPERTY_BYTES = 3
+
+
+# ------------------------
+# MQTT v5 Topic Aliases
+# ------------------------
+class TopicAliasManager:
+    """
+    Assigns MQTT v5 topic aliases to hot topics. The first publish on an alias
+    carries the full topic plus the alias; later publishes send an empty topic.
+    Aliases only live for one network connection, so reset() must be called on
+    every (re)connect with the broker's TopicAliasMaximum.
+    """
+    def __init__(self, limit=16, hot_threshold=3):
+        self.limit = limit
+        self.hot_threshold = hot_threshold
+        self.max_alias = 0
+        self.aliases = {}       # topic -> alias
+        self.announced = set()  # aliases the broker has seen with their full topic
+        self.hits = {}          # topic -> publishes seen (until it gets an alias)
+        self.lock = threading.RLock()  # held by callers across a publish / reconnect fix-up
+
+        self.aliased_publishes = 0
+        self.bytes_saved = 0
+
+    def reset(self, broker_max):
+        """Start a new connection: forget all aliases and cap at what the broker allows."""
+        with self.lock:
+            self.max_alias = min(self.limit, broker_max or 0)
+            self.aliases.clear()
+            self.announced.clear()
+            self.hits.clear()
+
+    def topic_for(self, alias):
+        with self.lock:
+            for topic, a in self.aliases.items():
+                if a == alias:
+                    return topic
+        return None
+
+    def publish(self, topic, send):
+        """
+        Resolve topic and call send(topic_to_send, alias or None) under the lock,
+        so the publish announcing an alias is always queued before any publish
+        using it, and none straddles a reset() from a reconnect.
+        """
+        with self.lock:
+            return send(*self._resolve(topic))
+
+    def _resolve(self, topic):
+        alias = self.aliases.get(topic)
+        if alias is None:
+            if len(self.aliases) >= self.max_alias:
+                return topic, None
+            self.hits[topic] = self.hits.get(topic, 0) + 1
+            if self.hits[topic] < self.hot_threshold:
+                return topic, None
+            alias = self.aliases[topic] = len(self.aliases) + 1
+            self.hits.pop(topic, None)
+
+        if alias not in self.announced:
+            self.announced.add(alias)
+            self.bytes_saved -= ALIAS_PROPERTY_BYTES
+            return topic, alias
+
+        self.aliased_publishes += 1
+        self.bytes_saved += len(topic.encode("utf-8")) - ALIAS_PROPERTY_BYTES
+        return "", alias
+
+    def status(self):
+        with self.lock:
+            return {
+                "max_alias": self.max_alias,
+                "aliases": dict(self.aliases),
+                "aliased_publishes": self.aliased_publishes,
+                "topic_bytes_saved": self.bytes_saved,
+            }
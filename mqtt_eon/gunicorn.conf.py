@@ -0,0 +1,25 @@
+import os
+
+# Production server for mqtt_eon:  gunicorn -c gunicorn.conf.py app:app
+bind = "0.0.0.0:5001"
+
+# One worker process only: the MQTT session (client id = drone_UID), the publish
+# ring and the SQLite buffer live in-process, and a second process would fight
+# over the same client id at the broker. Concurrency comes from threads instead.
+workers = 1
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+backlog = 2048
+keepalive = 5
+timeout = 30
+
+
+def post_worker_init(worker):
+    from app import start_services
+    # Returns immediately; the MQTT connection is made by the reconnect manager thread
+    start_services()
+
+
+def worker_exit(server, worker):
+    from app import publisher
+    publisher.stop()
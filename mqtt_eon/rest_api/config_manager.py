@@ -15,6 +15,9 @@ os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
 DEFAULT_CONFIG = {
     "mqtt_broker": "",
     "mqtt_port": 8883,
+    "mqtt_tls": True,
+    "mqtt_ca_file": None,               # CA bundle for a private/local TLS broker
+    "tls_session_resumption": True,     # reuse TLS session tickets across reconnects
     "topic": "",
 
     "sparkplug_namespace": "spBv1.0",
@@ -23,11 +26,122 @@ DEFAULT_CONFIG = {
 
     "drone_UID": "",
     "log_level": "INFO",
+    # Logging: "text" or "json" lines; per call-site INFO/DEBUG rate limit and sampling.
+    # Read once at startup by utils/logger.py (LOG_CONFIG_PATH points it at this file)
+    "log_format": "text",
+    "log_rate_limit": 5,
+    "log_rate_interval": 1.0,
+    "log_sample_rate": 1.0,
 
     "comm_type": "udp",
     "com_number": "COM12",
     "baudrate": 115200,
-    "mavlink_connection_str": "udp:0.0.0.0:14550"
+    "mavlink_connection_str": "udp:0.0.0.0:14550",
+
+    # Seconds between background refreshes of the NBIRTH system/deployment snapshot
+    "snapshot_interval": 15,
+    # Host CPU/memory/disk/temperature/network sampling period (s) for /health and NBIRTH
+    "host_metrics_interval": 2.0,
+
+    # Inbound command executor: worker threads, max pending commands, window (s) in
+    # which a repeated cmd_id is dropped as a replay (commands without one never are)
+    "command_workers": 4,
+    "command_queue_size": 100,
+    "command_dedup_seconds": 30,
+
+    # Store-and-forward buffer: "sqlite" table or "segment_log" (append-only mmap'd
+    # segment files under /app/data/buffer_log, dropped whole once replayed).
+    # buffer_sync_every: msync after every N appends (0 = leave it to the OS)
+    "buffer_backend": "sqlite",
+    "buffer_segment_bytes": 8388608,
+    "buffer_sync_every": 1,
+    # Buffered rows are compressed with "zstd" + a payload dictionary ("zlib" if
+    # zstandard is missing, "none" to store plain text). Trained dictionaries
+    # (tools/train_payload_dict.py) live in buffer_dict_dir; keep old versions
+    # until the rows written with them have been replayed.
+    "buffer_compression": "zstd",
+    "buffer_compression_level": 3,
+    "buffer_dict_dir": "/app/data/dicts",
+
+    # Replay after an outage: "fifo", "newest_first", "last_value" (newest row per
+    # topic + messageType) or "downsample" (one row per bucket for backlog older
+    # than N minutes). Only DDATA telemetry is reordered, and only rows with a
+    # messageType are thinned; commands, state and binFile rows always replay in
+    # full and in order.
+    "replay_policy": "fifo",
+    "replay_downsample_after_minutes": 10,
+    "replay_downsample_bucket_seconds": 60,
+
+    # /publish enqueues into priority lanes (control: Sparkplug state/commands,
+    # telemetry, bulk: binFile); a full lane spills to DBBuffer. publish_queue_size
+    # bounds the telemetry lane. lane_mode "strict" or "weighted" (deficit round
+    # robin by bytes using lane_weights). Bulk messages are handed to paho only
+    # while fewer than bulk_max_queued of them await a PUBACK. bulk_chunk_bytes > 0
+    # splits larger binFile payloads into {file_id, seq, total, data} envelopes on
+    # <topic>/chunk (reassemble with core.lane_scheduler.ChunkAssembler); 0 keeps
+    # the single-message binFile format
+    "publish_queue_size": 10000,
+    "lane_capacity_control": 1000,
+    "lane_capacity_bulk": 256,
+    "lane_mode": "strict",
+    "lane_weights": {"control": 8, "telemetry": 4, "bulk": 1},
+    "bulk_chunk_bytes": 0,
+    "bulk_max_queued": 10,
+
+    # Failover: ordered list of {"host", "port", "tls", ["username", "password"]}.
+    # Empty means just mqtt_broker/mqtt_port. With local_broker_enabled, producers
+    # publish to the local mosquitto (bridged upstream, see mosquitto/mosquitto.conf)
+    # and the cloud brokers are only used directly if it is down.
+    "mqtt_brokers": [],
+    "broker_connect_timeout": 5,
+    "local_broker_enabled": False,
+    "local_broker_host": "mosquitto",
+    "local_broker_port": 1883,
+
+    # Background reconnects: jittered exponential backoff between these bounds (s).
+    # persistent_session keeps subscriptions and queued QoS1 commands at the broker
+    "reconnect_min_delay": 1,
+    "reconnect_max_delay": 60,
+    "persistent_session": True,
+
+    # MQTT protocol: "3.1.1" or "5". v5 enables topic aliases for hot topics,
+    # message expiry on DDATA telemetry and a session expiry (persistent_session defaults it to 3600)
+    "mqtt_protocol": "3.1.1",
+    "topic_alias_max": 16,
+    "topic_alias_hot_threshold": 3,
+    "message_expiry_seconds": 0,
+    "session_expiry_seconds": 0,
+
+    # Outbound coalescing: one publish per topic per window ("json" array or "zlib" frame)
+    "coalesce_enabled": False,
+    "coalesce_window_ms": 200,
+    "coalesce_format": "json",
+    "coalesce_max_batch": 100,
+    "coalesce_exclude_topics": ["/binFile", "/FlightMetrics"],
+
+    # Data usage: messages, payload and estimated wire bytes per topic (GET /usage),
+    # persisted to usage_path (default /app/data/usage.json, usage.json on Windows)
+    # while a budget is set. Budgets are wire bytes per UTC day / billing month
+    # (0 = none). data_budget_steps: [percent used, keep 1 in N] — telemetry is then
+    # decimated per topic, or with mode "coalesce" batched every
+    # data_budget_coalesce_window_ms. Control and binFile traffic is never stepped down.
+    "usage_path": None,
+    "data_budget_daily_bytes": 0,
+    "data_budget_monthly_bytes": 0,
+    "data_budget_billing_day": 1,
+    "data_budget_steps": [[80, 2], [90, 5], [100, 20]],
+    "data_budget_mode": "decimate",
+    "data_budget_coalesce_window_ms": 5000,
+
+    # Outbound rate governor: token buckets (msgs/s) plus a cap on paho's queue.
+    # governor_overflow: "buffer" stores to DBBuffer (202), "reject" returns 429
+    "governor_enabled": False,
+    "governor_global_rate": 50,
+    "governor_global_burst": 100,
+    "governor_topic_rate": 20,
+    "governor_topic_burst": 40,
+    "governor_max_queued": 500,
+    "governor_overflow": "buffer"
 }
 
 def load_config():
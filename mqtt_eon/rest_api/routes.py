@@ -1,7 +1,10 @@
-from flask import Flask, request, jsonify,send_from_directory,render_template, redirect, url_for, jsonify
+from flask import Flask, request, jsonify,send_from_directory,render_template, redirect, url_for, jsonify, Response
 from utils.logger import setup_logger
+from utils.metrics import REGISTRY
+from utils.host_metrics import get_host_sampler
 from flask_cors import CORS
 import os
+import math
 from rest_api.config_manager import load_config, save_config
 
 logging = setup_logger(__name__)
@@ -43,7 +46,8 @@ def register_routes(app,publisher,buffer):
                 ).strip()
             }
 
-            save_config(updated_config)
+            # Keep settings that are not on the form (e.g. coalescing options)
+            save_config({**load_config(), **updated_config})
             return redirect(url_for("config_page"))
 
         config = load_config()
@@ -56,7 +60,9 @@ def register_routes(app,publisher,buffer):
         if publisher.running:
             return jsonify({"status": "already running"}), 400
         success = publisher.start()
-        return jsonify({"status": "started" if success else "failed"}), 200 if success else 500
+        # Returns immediately; the broker connection comes up in the background
+        return jsonify({"status": "started" if success else "failed",
+                        "connection": publisher.connection_status()}), 200 if success else 500
 
    
     @app.post("/stop")
@@ -68,7 +74,40 @@ def register_routes(app,publisher,buffer):
    
     @app.get("/status")
     def status():
-        return jsonify({"running": publisher.running, "mqtt_connected": publisher.mqtt_connected})
+        result = {"running": publisher.running, "mqtt_connected": publisher.mqtt_connected}
+        result["connection"] = publisher.connection_status()
+        result["broker"] = f"{publisher.client.broker}:{publisher.client.port}"
+        result["brokers"] = publisher.client.brokers.status()
+        if publisher.client.tls_context is not None:
+            result["tls"] = publisher.client.tls_status()
+        if publisher.governor:
+            result["governor"] = publisher.governor.status()
+        if publisher.client.mqtt5:
+            result["mqtt5"] = publisher.client.aliases.status()
+        result["replay"] = publisher.compactor.status()
+        result["data_budget"] = publisher.usage.status()
+        result["publish_queue"] = {"depth": len(publisher.queue), "capacity": publisher.queue.capacity,
+                                   "spilled": publisher.queue.dropped, "lanes": publisher.queue.status()}
+        return jsonify(result)
+
+    @app.get("/metrics")
+    def metrics():
+        # Prometheus text exposition
+        return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+    @app.get("/usage")
+    def usage():
+        # ?window=1h|24h|30d|day|month narrows the report to one window
+        window = request.args.get("window")
+        try:
+            windows = publisher.usage.usage(window)
+        except KeyError:
+            return jsonify({"error": f"Unknown window '{window}'"}), 400
+        return jsonify({"budget": publisher.usage.status(), "windows": windows})
+
+    @app.get("/commands")
+    def command_stats():
+        return jsonify(publisher.client.dispatcher.status())
 
     @app.get("/uiStatus")
     def newStatus():
@@ -79,7 +118,7 @@ def register_routes(app,publisher,buffer):
 
     @app.get("/health")
     def health():
-        return jsonify({"status": "ok"})
+        return jsonify({"status": "ok", "system": get_host_sampler().snapshot()})
 
     @app.route("/control.html")
     def serve_page():
@@ -91,6 +130,8 @@ def register_routes(app,publisher,buffer):
         result = buffer.getBufferCount()
         if "error" in result:
             return jsonify(result), result.get("code", 500)
+        if buffer.codec:
+            result = {**result, "compression": buffer.codec.status()}
         return jsonify(result)
     
 
@@ -104,24 +145,39 @@ def register_routes(app,publisher,buffer):
 
         topic = data.get('topic', publisher.topic)  # optional override
         message = data['message']
+        coalesce = data.get('coalesce', True)  # latency-sensitive callers can opt out
 
-        if publisher.is_mqtt_connected():
-            result = publisher.client.publish(topic,message)
-         
-            if result and getattr(result, "rc", 1) == 0:   
-                logging.info(f"Payload: {message}, topic: {topic}")
-                
-                return jsonify({"status": "published", "topic": topic}), 200
-            else:
-                # MQTT connected but publish failed — buffer it                
-               
-                publisher.store_payload(data)
-                return jsonify({"status": "publish failed, buffered", "topic": topic}), 202
-        else:
+        # Publishing is asynchronous, so reject what would fail later in paho
+        if not isinstance(topic, str) or not topic or "+" in topic or "#" in topic:
+            return jsonify({"error": f"Invalid topic '{topic}'"}), 400
+
+        if not publisher.is_mqtt_connected():
             # MQTT not connected — buffer it
             publisher.store_payload(data)
-
             return jsonify({"status": "mqtt disconnected, buffered", "topic": topic}), 202
+
+        if not publisher.usage.allow(topic):
+            # Decimated by the data budget: acknowledged, never sent
+            return jsonify({"status": "skipped, data budget", "topic": topic,
+                            "budget_level": publisher.usage.level}), 200
+
+        retry_after = publisher.admit(topic)
+        if retry_after:
+            # Over the outbound budget — tell the producer to slow down
+            body = {"topic": topic, "retry_after": retry_after}
+            if publisher.governor.overflow == "reject":
+                response = jsonify({"status": "rate limited", **body})
+                response.headers["Retry-After"] = str(math.ceil(retry_after))
+                return response, 429
+            publisher.store_payload(data)
+            return jsonify({"status": "rate limited, buffered", **body}), 202
+
+        if publisher.enqueue(topic, message, coalesce):
+            return jsonify({"status": "queued", "topic": topic}), 202
+
+        # Lane full — spill to the disk buffer
+        publisher.store_payload(data)
+        return jsonify({"status": "queue full, buffered", "topic": topic}), 202
         
     @app.get("/publishNbirth")
     def publish_nbirth():
@@ -0,0 +1,93 @@
+"""
+Compare the store-and-forward buffer backends on the same workload: append N
+telemetry rows (as during an outage), then drain them the way flush_buffer
+does (read a batch, delete row by row). Reports rows/s for each phase, the
+peak on-disk size, and the cost of a /buffer/status count.
+
+    cd mqtt_eon && python tools/buffer_benchmark.py --rows 50000 --size 200 --batch 10
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.db_buffer import DBBuffer
+from utils.segment_log import SegmentLogBuffer
+
+
+def disk_usage(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            # Allocated blocks, since segments are preallocated sparse files
+            total += os.stat(os.path.join(root, name)).st_blocks * 512
+    return total
+
+
+def make_rows(count, size):
+    pad = "x" * max(0, size - 180)
+    for i in range(count):
+        message = str({"messageType": "ATTITUDE", "time_boot_ms": 1000 + i, "roll": 0.0123,
+                       "pitch": -0.0456, "yaw": 1.5707, "timestamp": "2025-01-01T00:00:00+00:00",
+                       "pad": pad})
+        yield {"topic": "spBv1.0/bench/DDATA/bench/Mavlink", "message": message}
+
+
+def bench(name, buffer, disk_path, args):
+    started = time.perf_counter()
+    for row in make_rows(args.rows, args.size):
+        buffer.store_payload(row)
+    store_s = time.perf_counter() - started
+    peak_disk = disk_usage(disk_path)
+
+    started = time.perf_counter()
+    for _ in range(100):
+        buffer.getBufferCount()
+    count_ms = (time.perf_counter() - started) * 10
+
+    started = time.perf_counter()
+    drained = 0
+    while True:
+        rows = buffer.getAllRows(limit=args.batch)
+        if not rows:
+            break
+        for row_id, _ in rows:
+            buffer.delete(row_id)
+        drained += len(rows)
+    drain_s = time.perf_counter() - started
+
+    print(f"{name:12s} store {args.rows / store_s:9.0f} rows/s | drain {drained / drain_s:9.0f} rows/s | "
+          f"count {count_ms:7.3f} ms | peak disk {peak_disk / 1e6:7.1f} MB | "
+          f"after drain {disk_usage(disk_path) / 1e6:6.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=200, help="approximate bytes per message")
+    parser.add_argument("--batch", type=int, default=10, help="rows read per flush (flush_buffer uses 10)")
+    parser.add_argument("--segment-bytes", type=int, default=8 * 1024 * 1024)
+    parser.add_argument("--sync-every", type=int, default=1, help="segment log msync interval in rows (0 = never)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="buffer-bench-")
+    try:
+        db_path = os.path.join(workdir, "buffer.db")
+        bench("sqlite", DBBuffer(db_path), db_path, args)
+
+        log_path = os.path.join(workdir, "buffer_log")
+        log = SegmentLogBuffer(log_path, segment_bytes=args.segment_bytes, sync_every=args.sync_every)
+        bench("segment_log", log, log_path, args)
+        log.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Run a simulated fleet of edge nodes against a local broker to size the broker
+and find scaling cliffs. Every node is a real MQTTPublisher (its own MQTTClient,
+paho connection, lanes, buffer and command dispatcher) with a distinct
+drone_UID; nodes are spread over a pool of worker processes.
+
+The fleet grows through --sizes. At each size, every node sends DDATA
+telemetry at --rate msgs/s, a few nodes per step are restarted cleanly
+(NDEATH then NBIRTH), and the tool sends NCMD .../nbirtMsg commands and times
+the NBIRTH that answers them. Per step it reports:
+
+  - node side: CPU % and RSS per instance (process totals / nodes in them)
+  - broker fan-in: messages/s and bytes/s per Sparkplug message type, as seen
+    by a subscriber on <namespace>/<group>/#
+  - command round trip: NCMD publish -> NBIRTH received, p50/p95/p99 and lost
+
+    cd mqtt_eon && python tools/fleet_sim.py --sizes 50,100,200,400 --processes 4 --step-seconds 30
+    python tools/fleet_sim.py --no-broker --broker-port 1884 --sizes 100 --json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import paho.mqtt.client as mqtt
+import psutil
+
+from publish_loadtest import BrokerProcess, percentile
+
+
+# ------------------------
+# Worker process: a slice of the fleet
+# ------------------------
+def sample_message(msg_type, seq):
+    from utils.payload_codec import _MAVLINK_SHAPES
+    fields = {key: (value + random.uniform(-1, 1) if isinstance(value, float) else value)
+              for key, value in _MAVLINK_SHAPES[msg_type].items()}
+    return str({"messageType": msg_type, **fields, "seq": seq,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime())})
+
+
+class FleetWorker:
+    def __init__(self, settings):
+        from rest_api.config_manager import DEFAULT_CONFIG
+        self.settings = settings
+        self.workdir = tempfile.mkdtemp(prefix="fleet_sim_")
+        self.config = {**DEFAULT_CONFIG,
+                       "mqtt_brokers": [{"host": settings["host"], "port": settings["port"], "tls": False}],
+                       "local_broker_enabled": False,
+                       "persistent_session": False,
+                       "snapshot_interval": 3600,
+                       "reconnect_max_delay": 5,
+                       "buffer_compression": "none"}
+        self.nodes = {}
+        self.enqueue_failed = 0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.traffic = threading.Thread(target=self.traffic_loop, daemon=True)
+        self.traffic.start()
+
+    def add_node(self, uid):
+        from core.mqtt_publisher import MQTTPublisher
+        from utils.db_buffer import DBBuffer
+        s = self.settings
+        config = {**self.config, "usage_path": os.path.join(self.workdir, f"{uid}.usage.json")}
+        buffer = DBBuffer(path=os.path.join(self.workdir, f"{uid}.db"))
+        node = MQTTPublisher(s["host"], s["port"], s["topic"], uid, buffer, s["namespace"], s["group"],
+                             uid, s["device"], None, None, config)
+        # No OTA service here: fail fast (connection refused) instead of timing out on DNS
+        node.client.sampler.ota_url = s["ota_url"]
+        node.start()
+        with self.lock:
+            self.nodes[uid] = node
+
+    def churn(self, count):
+        """Restart count random nodes cleanly: NDEATH on stop, NBIRTH on reconnect."""
+        with self.lock:
+            chosen = random.sample(list(self.nodes.values()), min(count, len(self.nodes)))
+        for node in chosen:
+            node.stop()
+        time.sleep(0.5)
+        for node in chosen:
+            node.start()
+
+    def traffic_loop(self):
+        s = self.settings
+        types = list(s["message_types"])
+        interval = 1.0 / s["rate"] if s["rate"] else None
+        seq = 0
+        while interval and not self.stop_event.wait(interval):
+            seq += 1
+            with self.lock:
+                nodes = list(self.nodes.items())
+            for uid, node in nodes:
+                if not node.client.is_connected():
+                    continue
+                topic = f"{s['namespace']}/{s['group']}/DDATA/{uid}/{s['device']}"
+                if not node.enqueue(topic, sample_message(types[seq % len(types)], seq)):
+                    self.enqueue_failed += 1
+
+    def stats(self):
+        proc = psutil.Process()
+        cpu = proc.cpu_times()
+        return {"nodes": len(self.nodes), "cpu_seconds": cpu.user + cpu.system,
+                "rss": proc.memory_info().rss, "threads": proc.num_threads(),
+                "enqueue_failed": self.enqueue_failed,
+                "buffered": sum(n.buffer.getBufferCount().get("buffered_messages", 0)
+                                for n in self.nodes.values())}
+
+    def stop(self):
+        self.stop_event.set()
+        for node in list(self.nodes.values()):
+            try:
+                node.stop()
+            except Exception:
+                pass
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def run_worker(conn, settings):
+    os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    worker = FleetWorker(settings)
+    while True:
+        command, arg = conn.recv()
+        if command == "grow":
+            for uid in arg:
+                worker.add_node(uid)
+            conn.send(len(worker.nodes))
+        elif command == "churn":
+            worker.churn(arg)
+            conn.send(True)
+        elif command == "stats":
+            conn.send(worker.stats())
+        elif command == "stop":
+            worker.stop()
+            conn.send(True)
+            return
+
+
+# ------------------------
+# Broker-side observer and commander
+# ------------------------
+class FleetObserver:
+    """Subscribes to the whole group: counts fan-in per message type and times NCMD -> NBIRTH."""
+    def __init__(self, args):
+        self.args = args
+        self.prefix = f"{args.namespace}/{args.group}"
+        self.client = mqtt.Client(client_id=f"fleet-sim-observer-{uuid.uuid4().hex[:8]}")
+        self.client.on_connect = lambda c, u, f, rc: c.subscribe(f"{self.prefix}/#", qos=0)
+        self.client.on_message = self._on_message
+        self.lock = threading.Lock()
+        self.births = set()         # uids that published NBIRTH at least once
+        self.pending = {}           # uid -> NCMD send time
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counts = {}        # message type -> [messages, bytes]
+            self.rtts = []
+            self.lost = 0
+            self.sent = 0
+            self.since = time.monotonic()
+
+    def start(self):
+        self.client.connect(self.args.broker_host, self.args.broker_port, 60)
+        self.client.loop_start()
+
+    def stop(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+    def _on_message(self, client, userdata, msg):
+        now = time.monotonic()
+        parts = msg.topic.split("/")
+        msg_type = parts[2] if len(parts) > 3 else "other"
+        with self.lock:
+            counts = self.counts.setdefault(msg_type, [0, 0])
+            counts[0] += 1
+            counts[1] += len(msg.payload)
+            if msg_type == "NBIRTH":
+                uid = parts[3]
+                self.births.add(uid)
+                sent_at = self.pending.pop(uid, None)
+                if sent_at is not None:
+                    self.rtts.append(now - sent_at)
+
+    def send_command(self, uid):
+        with self.lock:
+            if uid in self.pending:
+                return
+            self.pending[uid] = time.monotonic()
+            self.sent += 1
+        self.client.publish(f"{self.prefix}/NCMD/{uid}/nbirtMsg",
+                            json.dumps({"cmd_id": uuid.uuid4().hex}), qos=1)
+
+    def expire(self, timeout):
+        now = time.monotonic()
+        with self.lock:
+            for uid in [u for u, sent_at in self.pending.items() if now - sent_at > timeout]:
+                del self.pending[uid]
+                self.lost += 1
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = max(time.monotonic() - self.since, 1e-9)
+            rtts = list(self.rtts)
+            return {
+                "fan_in": {t: {"msgs_per_s": round(c[0] / elapsed, 1), "bytes_per_s": round(c[1] / elapsed)}
+                           for t, c in sorted(self.counts.items())},
+                "fan_in_msgs_per_s": round(sum(c[0] for c in self.counts.values()) / elapsed, 1),
+                "commands": {"sent": self.sent, "answered": len(rtts), "lost": self.lost,
+                             "rtt_ms": {f"p{p}": round(percentile(rtts, p) * 1000, 1) if rtts else None
+                                        for p in (50, 95, 99)}},
+            }
+
+
+def run_commands(observer, uids, rate, stop_event, timeout):
+    interval = 1.0 / rate
+    while not stop_event.wait(interval):
+        observer.send_command(random.choice(uids))
+        observer.expire(timeout)
+
+
+# ------------------------
+# Driver
+# ------------------------
+def call_all(conns, command, args=None):
+    for i, conn in enumerate(conns):
+        conn.send((command, args[i] if args else None))
+    return [conn.recv() for conn in conns]
+
+
+def print_report(steps):
+    print(f"{'nodes':>6} {'ready':>6} {'birth s':>8} {'cpu%/node':>10} {'rss MB/node':>12} {'thr/node':>9} "
+          f"{'fan-in/s':>9} {'cmd p50':>8} {'p95':>8} {'p99':>8} {'lost':>5}")
+    for s in steps:
+        rtt = s["commands"]["rtt_ms"]
+        print(f"{s['nodes']:>6} {s['ready']:>6} {s['birth_seconds']:>8} {s['cpu_percent_per_node']:>10} "
+              f"{s['rss_mb_per_node']:>12} {s['threads_per_node']:>9} {s['fan_in_msgs_per_s']:>9} "
+              f"{rtt['p50'] or '-':>8} {rtt['p95'] or '-':>8} {rtt['p99'] or '-':>8} {s['commands']['lost']:>5}")
+    for s in steps:
+        print(f"\n{s['nodes']} nodes fan-in: " + ", ".join(
+            f"{t} {v['msgs_per_s']}/s {v['bytes_per_s'] / 1024:.1f} KiB/s" for t, v in s["fan_in"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,50,100", help="fleet sizes to step through, comma separated")
+    parser.add_argument("--processes", type=int, default=2, help="worker processes the fleet is spread over")
+    parser.add_argument("--step-seconds", type=float, default=20, help="measurement time per fleet size")
+    parser.add_argument("--rate", type=float, default=1.0, help="DDATA messages/s per node")
+    parser.add_argument("--cmd-rate", type=float, default=5.0, help="NCMD commands/s across the fleet")
+    parser.add_argument("--cmd-timeout", type=float, default=10.0, help="seconds before a command counts as lost")
+    parser.add_argument("--churn", type=float, default=0.05, help="fraction of nodes restarted per step")
+    parser.add_argument("--birth-timeout", type=float, default=60, help="max seconds to wait for new nodes' NBIRTH")
+    parser.add_argument("--namespace", default="spBv1.0")
+    parser.add_argument("--group", default="FleetSim")
+    parser.add_argument("--uid-prefix", default="SIM")
+    parser.add_argument("--device", default="Mavlink")
+    parser.add_argument("--ota-url", default="http://127.0.0.1:9/", help="OTA service the nodes poll for NBIRTH")
+    parser.add_argument("--broker-cmd", default="mosquitto -p {port}", help="stand-in broker command")
+    parser.add_argument("--broker-host", default="localhost")
+    parser.add_argument("--broker-port", type=int, default=1883)
+    parser.add_argument("--no-broker", action="store_true", help="use an already running broker")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")   # hundreds of nodes logging INFO would dominate the CPU
+    settings = {"host": args.broker_host, "port": args.broker_port, "topic": f"{args.namespace}/{args.group}",
+                "namespace": args.namespace, "group": args.group, "device": args.device,
+                "ota_url": args.ota_url, "rate": args.rate,
+                "message_types": ["ATTITUDE", "GLOBAL_POSITION_INT", "VFR_HUD", "SYS_STATUS", "BATTERY_STATUS"]}
+
+    broker = None
+    if not args.no_broker:
+        broker = BrokerProcess(args.broker_cmd, args.broker_port)
+        broker.start()
+        time.sleep(1)
+
+    ctx = multiprocessing.get_context("spawn")
+    pipes = [ctx.Pipe() for _ in range(args.processes)]
+    procs = [ctx.Process(target=run_worker, args=(child, settings), daemon=True) for _, child in pipes]
+    conns = [parent for parent, _ in pipes]
+    observer = FleetObserver(args)
+    steps, uids = [], []
+    try:
+        for p in procs:
+            p.start()
+        observer.start()
+        baseline = call_all(conns, "stats")
+        for size in sizes:
+            new = [f"{args.uid_prefix}-{i:05d}" for i in range(len(uids), size)]
+            uids.extend(new)
+            grow_started = time.monotonic()
+            call_all(conns, "grow", [new[i::len(conns)] for i in range(len(conns))])
+            while time.monotonic() - grow_started < args.birth_timeout:
+                if len(observer.births.intersection(uids)) >= len(uids):
+                    break
+                time.sleep(0.2)
+            birth_seconds = round(time.monotonic() - grow_started, 1)
+
+            observer.reset()
+            before = call_all(conns, "stats")
+            started = time.monotonic()
+            stop_event = threading.Event()
+            commander = threading.Thread(target=run_commands, daemon=True,
+                                         args=(observer, list(uids), args.cmd_rate, stop_event, args.cmd_timeout))
+            commander.start()
+            time.sleep(args.step_seconds / 2)
+            churn = round(size * args.churn / len(conns))
+            if churn:
+                call_all(conns, "churn", [churn] * len(conns))
+            time.sleep(max(0.0, started + args.step_seconds - time.monotonic()))
+            stop_event.set()
+            commander.join()
+            after = call_all(conns, "stats")
+            elapsed = time.monotonic() - started
+
+            cpu = sum(a["cpu_seconds"] - b["cpu_seconds"] for a, b in zip(after, before))
+            rss = sum(a["rss"] - base["rss"] for a, base in zip(after, baseline))
+            threads = sum(a["threads"] - base["threads"] for a, base in zip(after, baseline))
+            step = {"nodes": size, "ready": len(observer.births.intersection(uids)),
+                    "birth_seconds": birth_seconds,
+                    "cpu_percent_per_node": round(cpu / elapsed * 100 / size, 2),
+                    "rss_mb_per_node": round(rss / size / 1024 / 1024, 2),
+                    "threads_per_node": round(threads / size, 1),
+                    "enqueue_failed": sum(a["enqueue_failed"] for a in after),
+                    "buffered": sum(a["buffered"] for a in after),
+                    **observer.snapshot()}
+            steps.append(step)
+            if not args.json:
+                print(f"{size} nodes: fan-in {step['fan_in_msgs_per_s']}/s, "
+                      f"cmd p95 {step['commands']['rtt_ms']['p95']} ms", flush=True)
+    finally:
+        try:
+            call_all(conns, "stop")
+        except Exception:
+            pass
+        for p in procs:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+        observer.stop()
+        if broker:
+            broker.kill()
+
+    if args.json:
+        print(json.dumps({"settings": vars(args), "steps": steps}, indent=2))
+    else:
+        print()
+        print_report(steps)
+
+
+if __name__ == "__main__":
+    main()
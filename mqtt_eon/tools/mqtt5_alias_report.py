@@ -0,0 +1,111 @@
+"""
+Check MQTT v5 topic aliases and message expiry against a local broker and
+report how many bytes they save compared with MQTT 3.1.1.
+
+    mosquitto -p 1883 -v
+    cd mqtt_eon && python tools/mqtt5_alias_report.py --host localhost --port 1883 --count 2000
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import paho.mqtt.client as mqtt
+from core.mqttClient import MQTTClient
+
+SAMPLE = str({"messageType": "ATTITUDE", "time_boot_ms": 123456, "roll": 0.01, "pitch": -0.02,
+              "yaw": 1.57, "rollspeed": 0.0, "pitchspeed": 0.0, "yawspeed": 0.0,
+              "timestamp": "2025-01-01T00:00:00+00:00"})
+
+
+def run(args, protocol):
+    config = {"mqtt_protocol": protocol, "mqtt_tls": False, "topic_alias_max": args.aliases,
+              "message_expiry_seconds": args.expiry, "snapshot_interval": 3600}
+    edge = f"alias-check-{protocol.replace('.', '')}"
+    topic = f"spBv1.0/{args.group}/DDATA/{edge}/Mavlink"
+
+    received = []
+    done = threading.Event()
+    sub = mqtt.Client(client_id=f"{edge}-sub", protocol=mqtt.MQTTv5)
+
+    def on_message(client, userdata, msg):
+        received.append(msg)
+        if len(received) >= args.count:
+            done.set()
+    sub.on_message = on_message
+    sub.connect(args.host, args.port)
+    sub.subscribe(topic, qos=1)
+    sub.loop_start()
+
+    client = MQTTClient(args.host, args.port, topic, edge, "spBv1.0", args.group, edge, "",
+                        None, None, config)
+    sent_bytes = [0]
+    sock_send = client.client._sock_send
+
+    def counting_send(buf):
+        n = sock_send(buf)
+        sent_bytes[0] += n
+        return n
+    client.client._sock_send = counting_send
+
+    client.connect(f"spBv1.0/{args.group}/NDEATH/{edge}", "offline", 1, False)
+    deadline = time.time() + 10
+    while not client.is_connected() and time.time() < deadline:
+        time.sleep(0.05)
+    if not client.is_connected():
+        raise SystemExit(f"Could not connect to {args.host}:{args.port}")
+
+    time.sleep(0.5)  # let NBIRTH and subscriptions go out before counting
+    sent_bytes[0] = 0
+    started = time.time()
+    for _ in range(args.count):
+        info = client.publish(topic, SAMPLE, 1)
+    info.wait_for_publish(10)
+    elapsed = time.time() - started
+    done.wait(10)
+
+    wrong_topic = sum(1 for m in received if m.topic != topic)
+    client.disconnect()
+    sub.loop_stop()
+    sub.disconnect()
+    return {
+        "protocol": protocol,
+        "sent": args.count,
+        "received": len(received),
+        "wrong_topic": wrong_topic,
+        "bytes": sent_bytes[0],
+        "seconds": round(elapsed, 2),
+        "aliases": client.aliases.status() if client.mqtt5 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--group", default="DroneFleet")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--aliases", type=int, default=16)
+    parser.add_argument("--expiry", type=int, default=60)
+    args = parser.parse_args()
+
+    baseline = run(args, "3.1.1")
+    v5 = run(args, "5")
+
+    for result in (baseline, v5):
+        print(f"MQTT {result['protocol']:>5}: {result['bytes']:>9} bytes for {result['sent']} publishes "
+              f"({result['bytes'] / result['sent']:.1f} B/msg), received {result['received']}, "
+              f"wrong topic {result['wrong_topic']}, {result['seconds']} s")
+    if v5["aliases"]:
+        print(f"Topic aliases: {v5['aliases']['aliases']}, "
+              f"aliased publishes {v5['aliases']['aliased_publishes']}, "
+              f"topic bytes saved {v5['aliases']['topic_bytes_saved']}")
+    saved = baseline["bytes"] - v5["bytes"]
+    print(f"Wire bytes saved by v5: {saved} ({saved / max(baseline['bytes'], 1) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
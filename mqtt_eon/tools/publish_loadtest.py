@@ -0,0 +1,286 @@
+"""
+Load-test a running mqtt_eon through POST /publish while a local stand-in
+broker is killed and restored on a schedule. Reports request throughput,
+HTTP and enqueue->PUBACK latency percentiles, buffer growth per outage and
+how long the buffer takes to drain once the broker is back.
+
+mqtt_eon must point at the broker this tool starts, e.g. in config.json:
+    "mqtt_brokers": [{"host": "localhost", "port": 1883, "tls": false}]
+
+    cd mqtt_eon && gunicorn -c gunicorn.conf.py app:app
+    python tools/publish_loadtest.py --duration 60 --concurrency 16 --size 256 --outage 15:10 --outage 40:5
+"""
+import argparse
+import json
+import os
+import re
+import shlex
+import signal
+import subprocess
+import threading
+import time
+
+import requests
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+# ------------------------
+# Stand-in broker
+# ------------------------
+class BrokerProcess:
+    def __init__(self, command, port):
+        self.command = shlex.split(command.format(port=port))
+        self.proc = None
+
+    def start(self):
+        self.proc = subprocess.Popen(self.command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def kill(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.send_signal(signal.SIGKILL)
+            self.proc.wait()
+
+    def is_up(self):
+        return self.proc is not None and self.proc.poll() is None
+
+
+def run_schedule(broker, outages, started, stop_event, events):
+    """outages: [(at_seconds, down_seconds)] relative to the start of the load."""
+    for at, down in sorted(outages):
+        if stop_event.wait(max(0.0, started + at - time.monotonic())):
+            return
+        broker.kill()
+        killed = time.monotonic() - started
+        if stop_event.wait(down):
+            broker.start()
+            events.append((killed, time.monotonic() - started))
+            return
+        broker.start()
+        events.append((killed, time.monotonic() - started))
+
+
+# ------------------------
+# Load generator
+# ------------------------
+class LoadStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds, status):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def error(self):
+        with self.lock:
+            self.errors += 1
+
+
+def worker(args, worker_id, stats, stop_event, interval):
+    session = requests.Session()
+    url = args.url.rstrip("/") + "/publish"
+    pad = "x" * args.size
+    seq = 0
+    next_at = time.monotonic()
+    while not stop_event.is_set():
+        if interval:
+            next_at += interval
+            delay = next_at - time.monotonic()
+            if delay > 0 and stop_event.wait(delay):
+                break
+        seq += 1
+        message = str({"messageType": "LOADTEST", "worker": worker_id, "seq": seq,
+                       "ts": time.time(), "pad": pad})
+        body = {"topic": args.topic, "message": message}
+        started = time.perf_counter()
+        try:
+            resp = session.post(url, json=body, timeout=args.timeout)
+            status = resp.json().get("status", str(resp.status_code)) if resp.status_code < 500 else "error"
+            stats.record(time.perf_counter() - started, f"{resp.status_code} {status}")
+        except Exception:
+            stats.error()
+
+
+def sample_buffer(args, started, stop_event, samples):
+    url = args.url.rstrip("/") + "/buffer/status"
+    while not stop_event.wait(args.sample_interval):
+        try:
+            depth = requests.get(url, timeout=2).json().get("buffered_messages")
+        except Exception:
+            depth = None
+        samples.append((time.monotonic() - started, depth))
+
+
+def scrape_latency_histogram(url):
+    """Bucket counts of mqtt_eon_publish_latency_seconds from /metrics, or None."""
+    try:
+        text = requests.get(url.rstrip("/") + "/metrics", timeout=2).text
+    except Exception:
+        return None
+    buckets = {}
+    for le, count in re.findall(r'mqtt_eon_publish_latency_seconds_bucket\{le="([^"]+)"\} (\S+)', text):
+        buckets[float("inf") if le == "+Inf" else float(le)] = float(count)
+    return buckets or None
+
+
+def histogram_percentile(before, after, p):
+    """Upper bucket bound holding the p-th percentile of observations between two scrapes."""
+    bounds = sorted(after)
+    deltas = [after[b] - (before or {}).get(b, 0) for b in bounds]
+    total = deltas[-1] if deltas else 0
+    if total <= 0:
+        return None
+    for bound, cumulative in zip(bounds, deltas):
+        if cumulative >= total * p / 100.0:
+            return bound
+    return bounds[-1]
+
+
+# ------------------------
+# Report
+# ------------------------
+def outage_report(events, samples):
+    report = []
+    for killed, restored in events:
+        before = [d for t, d in samples if t <= killed and d is not None]
+        base = before[-1] if before else 0
+        window = [(t, d) for t, d in samples if t >= killed and d is not None]
+        peak = max((d for _, d in window), default=base)
+        drained = next((t for t, d in window if t >= restored and d <= base), None)
+        report.append({
+            "killed_at": round(killed, 1),
+            "restored_at": round(restored, 1),
+            "buffer_growth": peak - base,
+            "peak_depth": peak,
+            "drain_seconds": round(drained - restored, 1) if drained is not None else None,
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5001", help="mqtt_eon base URL")
+    parser.add_argument("--topic", default="spBv1.0/loadtest/DDATA/loadtest/Mavlink")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel HTTP clients")
+    parser.add_argument("--rate", type=float, default=0, help="total requests/s (0 = as fast as possible)")
+    parser.add_argument("--size", type=int, default=128, help="padding bytes per message")
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--broker-cmd", default="mosquitto -p {port}", help="stand-in broker command")
+    parser.add_argument("--broker-port", type=int, default=1883)
+    parser.add_argument("--no-broker", action="store_true", help="use an already running broker (no outages)")
+    parser.add_argument("--outage", action="append", default=[], metavar="AT:DOWN",
+                        help="kill the broker AT seconds into the run for DOWN seconds (repeatable)")
+    parser.add_argument("--drain-timeout", type=float, default=120, help="max seconds to wait for the buffer to drain")
+    parser.add_argument("--sample-interval", type=float, default=0.5)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    outages = [tuple(float(x) for x in o.split(":")) for o in args.outage]
+    broker = None
+    if not args.no_broker:
+        broker = BrokerProcess(args.broker_cmd, args.broker_port)
+        broker.start()
+    elif outages:
+        parser.error("--outage needs the tool to manage the broker")
+
+    try:
+        # Give mqtt_eon's reconnect manager a moment to find the broker
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                if requests.get(args.url.rstrip("/") + "/status", timeout=2).json().get("mqtt_connected"):
+                    break
+            except Exception:
+                pass
+            time.sleep(0.5)
+        else:
+            raise SystemExit(f"mqtt_eon at {args.url} is not connected to a broker")
+
+        histogram_before = scrape_latency_histogram(args.url)
+        stats = LoadStats()
+        samples, events = [], []
+        load_stop, sample_stop = threading.Event(), threading.Event()
+        started = time.monotonic()
+        interval = args.concurrency / args.rate if args.rate else 0
+
+        threads = [threading.Thread(target=worker, args=(args, i, stats, load_stop, interval), daemon=True)
+                   for i in range(args.concurrency)]
+        threads.append(threading.Thread(target=sample_buffer, args=(args, started, sample_stop, samples), daemon=True))
+        if broker and outages:
+            threads.append(threading.Thread(target=run_schedule,
+                                            args=(broker, outages, started, load_stop, events), daemon=True))
+        for t in threads:
+            t.start()
+
+        time.sleep(args.duration)
+        load_stop.set()
+        load_elapsed = time.monotonic() - started
+        if broker and not broker.is_up():
+            broker.start()
+
+        # Let the store-and-forward buffer drain
+        drain_started = time.monotonic()
+        drain_seconds = None
+        while time.monotonic() - drain_started < args.drain_timeout:
+            if samples and samples[-1][1] == 0:
+                drain_seconds = round(time.monotonic() - drain_started, 1)
+                break
+            time.sleep(args.sample_interval)
+        sample_stop.set()
+        for t in threads:
+            t.join(timeout=args.timeout + 1)
+        histogram_after = scrape_latency_histogram(args.url)
+    finally:
+        if broker:
+            broker.kill()
+
+    total = len(stats.latencies)
+    report = {
+        "requests": total,
+        "errors": stats.errors,
+        "throughput_rps": round(total / load_elapsed, 1) if load_elapsed else 0,
+        "statuses": stats.statuses,
+        "http_latency_ms": {f"p{p}": round(percentile(stats.latencies, p) * 1000, 2) if total else None
+                            for p in (50, 90, 99)},
+        "peak_buffer_depth": max((d for _, d in samples if d is not None), default=0),
+        "outages": outage_report(events, samples),
+        "final_drain_seconds": drain_seconds,
+    }
+    report["http_latency_ms"]["max"] = round(max(stats.latencies) * 1000, 2) if total else None
+    if histogram_after:
+        report["publish_to_puback_seconds"] = {f"p{p}_le": histogram_percentile(histogram_before, histogram_after, p)
+                                               for p in (50, 90, 99)}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"requests {total} in {load_elapsed:.1f}s -> {report['throughput_rps']} req/s "
+          f"({stats.errors} transport errors)")
+    for status, count in sorted(stats.statuses.items()):
+        print(f"  {status}: {count}")
+    lat = report["http_latency_ms"]
+    print(f"HTTP latency ms: p50 {lat['p50']} p90 {lat['p90']} p99 {lat['p99']} max {lat['max']}")
+    if "publish_to_puback_seconds" in report:
+        pub = report["publish_to_puback_seconds"]
+        print(f"enqueue->PUBACK (bucket bound) s: p50 <= {pub['p50_le']} p90 <= {pub['p90_le']} p99 <= {pub['p99_le']}")
+    print(f"peak buffer depth {report['peak_buffer_depth']}")
+    for o in report["outages"]:
+        print(f"  outage {o['killed_at']}s-{o['restored_at']}s: +{o['buffer_growth']} buffered, "
+              f"drained in {o['drain_seconds']}s" if o["drain_seconds"] is not None else
+              f"  outage {o['killed_at']}s-{o['restored_at']}s: +{o['buffer_growth']} buffered, not drained")
+    print(f"final drain: {drain_seconds}s" if drain_seconds is not None
+          else f"final drain: not drained within {args.drain_timeout}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Reconnect repeatedly to a TLS broker and report handshake times and the TLS
+session resumption hit rate.
+
+    # mosquitto.conf: listener 8883 / cafile, certfile, keyfile
+    mosquitto -c mosquitto-tls.conf
+    cd mqtt_eon && python tools/tls_resumption_check.py --host localhost --port 8883 --cafile ca.crt --cycles 20
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from core.mqttClient import MQTTClient
+
+
+def cycle(client, timeout=10):
+    started = time.perf_counter()
+    client.connect("spBv1.0/tls-check/NDEATH/tls-check", "offline", 1, False)
+    deadline = time.time() + timeout
+    while not client.is_connected() and time.time() < deadline:
+        time.sleep(0.01)
+    connected = client.is_connected()
+    elapsed = time.perf_counter() - started
+    client.client.loop_stop()
+    client.client.disconnect()
+    client.connected = False
+    return connected, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8883)
+    parser.add_argument("--cafile", default=None)
+    parser.add_argument("--username", default=None)
+    parser.add_argument("--password", default=None)
+    parser.add_argument("--cycles", type=int, default=10)
+    args = parser.parse_args()
+
+    results = {}
+    for resumption in (False, True):
+        config = {"mqtt_ca_file": args.cafile, "tls_session_resumption": resumption,
+                  "persistent_session": False, "snapshot_interval": 3600}
+        client = MQTTClient(args.host, args.port, "t", f"tls-check-{int(resumption)}", "spBv1.0",
+                            "tls-check", "tls-check", "", args.username, args.password, config)
+        times = []
+        for _ in range(args.cycles):
+            connected, elapsed = cycle(client)
+            if not connected:
+                raise SystemExit(f"Could not connect to {args.host}:{args.port}")
+            times.append(elapsed * 1000)
+            time.sleep(0.2)
+        client.sampler.stop()
+        results[resumption] = (times, client.tls_status())
+
+    for resumption, (times, tls) in results.items():
+        label = "resumption on " if resumption else "resumption off"
+        times = sorted(times)
+        print(f"{label}: connect p50 {times[len(times) // 2]:.1f} ms, max {times[-1]:.1f} ms", end="")
+        if tls:
+            print(f" | handshakes {tls['handshakes']}, resumed {tls['resumed']} "
+                  f"({tls['resumption_rate']}), avg handshake {tls['avg_handshake_ms']} ms")
+        else:
+            print()
+
+
+if __name__ == "__main__":
+    main()
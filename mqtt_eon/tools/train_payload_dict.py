@@ -0,0 +1,89 @@
+"""
+Train the next version of the buffered-payload dictionary from real rows and
+report the compression ratio of each codec on them.
+
+Samples come from a JSON-lines file of {"topic", "message"} rows (e.g. captured
+from mavlink-service), or from the rows currently in the buffer. The new
+version is written as payload-v<N>.zstd (trained zstd dictionary) and
+payload-v<N>.raw (raw content used by the zlib fallback). mqtt_eon picks the
+highest version at startup; keep the older files until their rows are replayed.
+
+    cd mqtt_eon && python tools/train_payload_dict.py --samples rows.jsonl --dict-dir /app/data/dicts
+    python tools/train_payload_dict.py --from-buffer --dict-dir /app/data/dicts --dry-run
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.payload_codec import PayloadCodec, load_dictionaries, zstandard
+from utils.db_buffer import create_buffer
+from rest_api.config_manager import load_config
+
+
+def read_samples(args):
+    if args.from_buffer:
+        config = {**load_config(), "buffer_dict_dir": args.dict_dir}
+        return [payload for _, payload in create_buffer(config).getAllRows(limit=args.max_samples)]
+    samples = []
+    with open(args.samples) as f:
+        for line in f:
+            if line.strip():
+                samples.append(str(json.loads(line)))
+            if len(samples) >= args.max_samples:
+                break
+    return samples
+
+
+def ratio(codec, samples):
+    raw = sum(len(s.encode("utf-8")) for s in samples)
+    stored = sum(len(codec.encode(s)) for s in samples)
+    return raw / stored if stored else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--samples", help="JSON-lines file of {topic, message} rows")
+    source.add_argument("--from-buffer", action="store_true", help="sample the rows waiting in the buffer")
+    parser.add_argument("--dict-dir", default="/app/data/dicts")
+    parser.add_argument("--dict-size", type=int, default=16384, help="bytes")
+    parser.add_argument("--max-samples", type=int, default=20000)
+    parser.add_argument("--dry-run", action="store_true", help="report ratios without writing a new version")
+    args = parser.parse_args()
+
+    if zstandard is None:
+        raise SystemExit("Training needs the zstandard package (pip install zstandard)")
+    samples = read_samples(args)
+    if len(samples) < 100:
+        raise SystemExit(f"Need at least 100 sample rows, got {len(samples)}")
+
+    # Hold some rows back so the reported ratio isn't measured on the training set
+    holdout = samples[::10]
+    training = [s for i, s in enumerate(samples) if i % 10]
+    trained = zstandard.train_dictionary(args.dict_size, [s.encode("utf-8") for s in training])
+    # Raw content for zlib: the most recent rows, which sit nearest the data in its 32 KiB window
+    raw = "".join(training[-200:]).encode("utf-8")[-32768:]
+
+    version = max(load_dictionaries(args.dict_dir)) + 1
+    current = {codec: PayloadCodec(codec, dict_dir=args.dict_dir) for codec in ("zlib", "zstd")}
+    print(f"{len(samples)} samples, {len(holdout)} held out")
+    for codec, instance in current.items():
+        print(f"  current v{instance.version} {codec}: {ratio(instance, holdout):.2f}x")
+
+    if args.dry_run:
+        return
+    os.makedirs(args.dict_dir, exist_ok=True)
+    with open(os.path.join(args.dict_dir, f"payload-v{version}.zstd"), "wb") as f:
+        f.write(trained.as_bytes())
+    with open(os.path.join(args.dict_dir, f"payload-v{version}.raw"), "wb") as f:
+        f.write(raw)
+    for codec in ("zlib", "zstd"):
+        print(f"  new v{version} {codec}: {ratio(PayloadCodec(codec, dict_dir=args.dict_dir), holdout):.2f}x")
+    print(f"Wrote dictionary v{version} to {args.dict_dir}; restart mqtt_eon to use it")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,131 @@
 import sqlite3
 import platform
+import threading
+import time
 from flask import jsonify
 from utils.logger import setup_logger
+from utils.metrics import Counter, Gauge
 logging = setup_logger(__name__)
 
+BUFFER_DEPTH = Gauge("mqtt_eon_buffer_depth", "Messages waiting in the store-and-forward buffer")
+BUFFERED_TOTAL = Counter("mqtt_eon_buffered_total", "Messages written to the store-and-forward buffer")
+
+def row_text(payload):
+    """Row as stored: the {"topic", "message"} dict plus when it was buffered (for replay policies)."""
+    if isinstance(payload, dict) and "stored_at" not in payload:
+        payload = {**payload, "stored_at": round(time.time(), 3)}
+    return str(payload)
+
+
+def create_buffer(config=None):
+    """Store-and-forward buffer selected by config["buffer_backend"]: "sqlite" or "segment_log"."""
+    config = config or {}
+    codec = None
+    if config.get("buffer_compression", "zstd") != "none":
+        from utils.payload_codec import PayloadCodec
+        codec = PayloadCodec(config.get("buffer_compression", "zstd"),
+                             dict_dir=config.get("buffer_dict_dir"),
+                             level=config.get("buffer_compression_level", 3))
+    if config.get("buffer_backend", "sqlite") == "segment_log":
+        from utils.segment_log import SegmentLogBuffer
+        return SegmentLogBuffer(segment_bytes=config.get("buffer_segment_bytes", 8 * 1024 * 1024),
+                                sync_every=config.get("buffer_sync_every", 1), codec=codec)
+    return DBBuffer(codec=codec)
+
+
 class DBBuffer:
-    def __init__(self, path="buffer.db"):  
-        if platform.system() == "Windows": 
+    def __init__(self, path=None, codec=None):  
+        # Optional PayloadCodec compressing rows on the way in and out
+        self.codec = codec
+        if path:
+            self.path = path
+        elif platform.system() == "Windows": 
             self.path = "buffer.db"
         else:
             self.path = "/app/data/buffer.db"
+        self.count_lock = threading.Lock()
+        self.stored = 0             # rows stored by this process (lets readers notice new rows)
         self._init_db()
 
     def _init_db(self):
         with sqlite3.connect(self.path) as conn:
             cursor = conn.cursor()
             cursor.execute("CREATE TABLE IF NOT EXISTS buffer (id INTEGER PRIMARY KEY, payload TEXT)")
+            # Counted once at startup, then maintained on every insert/delete
+            cursor.execute("SELECT COUNT(*) FROM buffer")
+            self.count = cursor.fetchone()[0]
+        BUFFER_DEPTH.set(self.count)
+
+    def _adjust_count(self, delta):
+        with self.count_lock:
+            self.count = max(0, self.count + delta)
+            BUFFER_DEPTH.set(self.count)
 
     def store_payload(self, payload):
-       
+        text = row_text(payload)
+        value = self.codec.encode(text) if self.codec else text
         with sqlite3.connect(self.path) as conn:
             cursor = conn.cursor()
-            cursor.execute("INSERT INTO buffer (payload) VALUES (?)", (str(payload),))     
-            logging.info("💾 Stored offline payload.")     
+            cursor.execute("INSERT INTO buffer (payload) VALUES (?)", (value,))     
+            logging.debug("💾 Stored offline payload.")     
+        self._adjust_count(1)
+        self.stored += 1
+        BUFFERED_TOTAL.inc()
+
+    def _decode(self, rows):
+        if self.codec:
+            return [(row_id, self.codec.decode(payload)) for row_id, payload in rows]
+        return rows
 
-    def getAllRows(self):
+    def getAllRows(self, limit=None, newest_first=False):
+        order = "DESC" if newest_first else "ASC"
         with sqlite3.connect(self.path) as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT id, payload FROM buffer ORDER BY id ASC")
+            if limit:
+                cursor.execute(f"SELECT id, payload FROM buffer ORDER BY id {order} LIMIT ?", (limit,))
+            else:
+                cursor.execute(f"SELECT id, payload FROM buffer ORDER BY id {order}")
             rows = cursor.fetchall()
-            return rows
+        return self._decode(rows)
+
+    def iterRows(self, batch_size=500, after_id=0):
+        """All rows (after after_id) oldest first, fetched in batches so a large backlog is never held in memory."""
+        last_id = after_id
+        while True:
+            with sqlite3.connect(self.path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT id, payload FROM buffer WHERE id > ? ORDER BY id ASC LIMIT ?",
+                               (last_id, batch_size))
+                rows = cursor.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield from self._decode(rows)
 
     def delete(self, row_id):
         with sqlite3.connect(self.path) as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM buffer WHERE id = ?", (row_id,))
+            deleted = cursor.rowcount
+        self._adjust_count(-deleted)
+
+    def delete_many(self, row_ids):
+        with sqlite3.connect(self.path) as conn:
+            cursor = conn.cursor()
+            cursor.executemany("DELETE FROM buffer WHERE id = ?", [(row_id,) for row_id in row_ids])
+            deleted = cursor.rowcount
+        self._adjust_count(-deleted)
         
     def getBufferCount(self):
-        with sqlite3.connect(self.path) as conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM buffer")
-                count = cursor.fetchone()[0]
-                return {"buffered_messages": count}
-            except Exception as e:
-                logging.error(f"Buffer status error: {e}")
-                return {"error": "Could not retrieve buffer status"}, 500
+        # No table scan: the count is kept up to date by store_payload/delete/clear_all
+        return {"buffered_messages": self.count}
 
 
     def clear_all(self):
         with sqlite3.connect(self.path) as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM buffer")
-            logging.info("🗑️ Cleared all buffered data.")
\ No newline at end of file
+            logging.info("🗑️ Cleared all buffered data.")
+        with self.count_lock:
+            self.count = 0
+            BUFFER_DEPTH.set(0)
\ No newline at end of file
@@ -0,0 +1,175 @@
+import socket
+import threading
+import time
+from collections import deque
+
+import psutil
+
+from utils.logger import setup_logger
+log = setup_logger(__name__)
+
+
+def _busy_idle(times):
+    idle = times.idle + getattr(times, "iowait", 0.0)
+    # On Linux guest/guest_nice are already counted in user/nice (as in psutil.cpu_percent)
+    total = sum(times) - getattr(times, "guest", 0.0) - getattr(times, "guest_nice", 0.0)
+    return total - idle, idle
+
+
+# ------------------------
+# Background Host Metrics Sampler
+# ------------------------
+class HostSampler:
+    """
+    Samples host CPU (total and per core), memory, disk, temperature and network
+    throughput every `interval` seconds on a background thread and keeps the
+    latest snapshot plus a short rolling window. Readers (/health, NBIRTH) get
+    the cached snapshot instantly instead of blocking in cpu_percent(interval=1).
+
+    CPU % comes from cpu_times() deltas between samples, so nothing else in the
+    process interferes with psutil.cpu_percent()'s shared state.
+    """
+    def __init__(self, interval=2.0, window=30, disk_paths=("/",)):
+        self.interval = interval
+        self.disk_paths = disk_paths
+        self.history = deque(maxlen=window)     # (ts, cpu %, rx bytes/s, tx bytes/s)
+        self.latest = None
+        self.previous_cpu = None
+        self.previous_net = None
+        self.hostname = socket.gethostname()
+        try:
+            self.ip_address = socket.gethostbyname(self.hostname)
+        except Exception:
+            self.ip_address = "unknown"
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        # Prime the CPU/network counters so the first snapshot already has numbers
+        self._cpu()
+        self._network(time.monotonic())
+        time.sleep(0.1)
+        self.sample()
+        self.thread = threading.Thread(target=self.run_loop, daemon=True, name="host-metrics")
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run_loop(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                log.error(f"Host metrics sample failed: {e}")
+
+    def _cpu(self):
+        per_core = psutil.cpu_times(percpu=True)
+        previous, self.previous_cpu = self.previous_cpu, per_core
+        if previous is None or len(previous) != len(per_core):
+            return None, []
+        cores = []
+        total_busy = total_all = 0.0
+        for now, before in zip(per_core, previous):
+            busy_now, idle_now = _busy_idle(now)
+            busy_before, idle_before = _busy_idle(before)
+            busy, idle = max(busy_now - busy_before, 0.0), max(idle_now - idle_before, 0.0)
+            cores.append(round(busy / (busy + idle) * 100.0, 1) if busy + idle else 0.0)
+            total_busy += busy
+            total_all += busy + idle
+        return round(total_busy / total_all * 100.0, 1) if total_all else 0.0, cores
+
+    def _network(self, now):
+        counters = psutil.net_io_counters()
+        previous, self.previous_net = self.previous_net, (now, counters.bytes_recv, counters.bytes_sent)
+        rx_rate = tx_rate = None
+        if previous and now > previous[0]:
+            rx_rate = max(counters.bytes_recv - previous[1], 0) / (now - previous[0])
+            tx_rate = max(counters.bytes_sent - previous[2], 0) / (now - previous[0])
+        return {"rx_bytes": counters.bytes_recv, "tx_bytes": counters.bytes_sent,
+                "rx_bytes_per_s": round(rx_rate) if rx_rate is not None else None,
+                "tx_bytes_per_s": round(tx_rate) if tx_rate is not None else None}
+
+    def _disks(self):
+        disks = {}
+        for path in self.disk_paths:
+            try:
+                usage = psutil.disk_usage(path)
+                disks[path] = {"total_gb": round(usage.total / 1024 ** 3, 1),
+                               "used_gb": round(usage.used / 1024 ** 3, 1), "percent": usage.percent}
+            except OSError:
+                pass
+        return disks
+
+    @staticmethod
+    def _temperature():
+        """Hottest reading per sensor chip in °C, or None where the platform has none."""
+        try:
+            sensors = psutil.sensors_temperatures()
+        except (AttributeError, OSError):
+            return None
+        return {chip: max(r.current for r in readings) for chip, readings in sensors.items() if readings} or None
+
+    def sample(self):
+        now = time.monotonic()
+        cpu_percent, per_core = self._cpu()
+        mem = psutil.virtual_memory()
+        network = self._network(now)
+        snapshot = {
+            "hostname": self.hostname,
+            "ip_address": self.ip_address,
+            "uptime_seconds": round(time.time() - psutil.boot_time()),
+            "cpu_percent": cpu_percent,
+            "cpu_per_core": per_core,
+            "load_average": [round(x, 2) for x in psutil.getloadavg()],
+            "memory": {
+                "total_mb": round(mem.total / 1024 / 1024),
+                "used_mb": round(mem.used / 1024 / 1024),
+                "percent": mem.percent
+            },
+            "disk": self._disks(),
+            "temperature_c": self._temperature(),
+            "network": network,
+            "sampled_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        with self.lock:
+            if cpu_percent is not None:
+                self.history.append((now, cpu_percent, network["rx_bytes_per_s"], network["tx_bytes_per_s"]))
+            snapshot["rolling"] = self._rolling()
+            self.latest = snapshot
+
+    def _rolling(self):
+        if not self.history:
+            return None
+        cpu = [h[1] for h in self.history]
+        rx = [h[2] for h in self.history if h[2] is not None]
+        tx = [h[3] for h in self.history if h[3] is not None]
+        return {
+            "seconds": round(self.history[-1][0] - self.history[0][0] + self.interval),
+            "cpu_percent_avg": round(sum(cpu) / len(cpu), 1),
+            "cpu_percent_max": max(cpu),
+            "rx_bytes_per_s_avg": round(sum(rx) / len(rx)) if rx else None,
+            "tx_bytes_per_s_avg": round(sum(tx) / len(tx)) if tx else None,
+        }
+
+    def snapshot(self):
+        with self.lock:
+            return self.latest
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_host_sampler(interval=2.0):
+    """The process-wide sampler, started on first use."""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = HostSampler(interval=interval)
+            _sampler.start()
+        return _sampler
@@ -0,0 +1,141 @@
+import math
+import threading
+
+
+# ------------------------
+# Prometheus Metrics
+# ------------------------
+# Minimal in-process registry rendering the Prometheus text format (0.0.4),
+# enough for counters, gauges and histograms with a handful of labels.
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.doc}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, doc, labelnames=(), max_series=None, registry=REGISTRY):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        # Caps label cardinality (e.g. per-topic series); the rest is folded into "other"
+        self.max_series = max_series
+        self.function = None
+        self.values = {}
+        self.lock = threading.Lock()
+        registry.register(self)
+
+    def set_function(self, fn):
+        """Read the value from fn() at scrape time instead of tracking it."""
+        self.function = fn
+
+    def _key(self, labels):
+        labels = tuple(labels)
+        if self.max_series and labels not in self.values and len(self.values) >= self.max_series:
+            return ("other",) * len(self.labelnames)
+        return labels
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                return [f"{self.name} {_number(self.function())}"]
+            except Exception:
+                return []
+        with self.lock:
+            return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in self.values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, labels=()):
+        with self.lock:
+            key = self._key(labels)
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, labels=()):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount=1, labels=()):
+        with self.lock:
+            key = self._key(labels)
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS, **kwargs):
+        super().__init__(name, doc, labelnames, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, labels=()):
+        with self.lock:
+            key = self._key(labels)
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def samples(self):
+        lines = []
+        with self.lock:
+            for key, state in self.values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, state["counts"]):
+                    cumulative += count
+                    le = _labels(self.labelnames, key, ("le", _number(bound)))
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {state['sum']!r}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {state['count']}")
+        return lines
@@ -0,0 +1,170 @@
+import os
+import platform
+import re
+import struct
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:             # optional: zlib with the same dictionaries is the fallback
+    zstandard = None
+
+from utils.logger import setup_logger
+from utils.metrics import Counter
+logging = setup_logger(__name__)
+
+RAW_BYTES = Counter("mqtt_eon_buffer_payload_bytes_total", "Buffered payload bytes before compression")
+STORED_BYTES = Counter("mqtt_eon_buffer_stored_bytes_total", "Buffered payload bytes written after compression")
+
+# Row header: codec id, dictionary version. Uncompressed rows have no header
+# (they start with "{"), so rows written before compression was enabled still decode.
+HEADER = struct.Struct(">BH")
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+BUILTIN_VERSION = 1
+DICT_FILE = re.compile(r"payload-v(\d+)\.(zstd|raw)$")
+
+# Field layouts of the MAVLink messages mavlink-service forwards most often
+_MAVLINK_SHAPES = {
+    "SYSTEM_TIME": {"time_unix_usec": 1735689600000000, "time_boot_ms": 123456},
+    "BATTERY_STATUS": {"id": 0, "battery_function": 0, "type": 0, "temperature": 32767,
+                       "voltages": [4200, 4200, 4200, 65535], "current_battery": 1234,
+                       "current_consumed": 512, "energy_consumed": -1, "battery_remaining": 87,
+                       "time_remaining": 0, "charge_state": 1},
+    "SERVO_OUTPUT_RAW": {"time_usec": 123456789, "port": 0, **{f"servo{i}_raw": 1500 for i in range(1, 9)}},
+    "RC_CHANNELS": {"time_boot_ms": 123456, "chancount": 16,
+                    **{f"chan{i}_raw": 1500 for i in range(1, 9)}, "rssi": 255},
+    "HEARTBEAT": {"type": 2, "autopilot": 3, "base_mode": 81, "custom_mode": 0,
+                  "system_status": 3, "mavlink_version": 3},
+    "SYS_STATUS": {"onboard_control_sensors_present": 1399979055, "onboard_control_sensors_enabled": 1382128687,
+                   "onboard_control_sensors_health": 1399979055, "load": 120, "voltage_battery": 12600,
+                   "current_battery": 1234, "battery_remaining": 87, "drop_rate_comm": 0, "errors_comm": 0,
+                   "errors_count1": 0, "errors_count2": 0, "errors_count3": 0, "errors_count4": 0},
+    "VFR_HUD": {"airspeed": 0.0, "groundspeed": 0.0, "heading": 90, "throttle": 0, "alt": 0.0, "climb": 0.0},
+    "GPS_RAW_INT": {"time_usec": 123456789, "fix_type": 3, "lat": 129876543, "lon": 776543210, "alt": 900000,
+                    "eph": 121, "epv": 200, "vel": 0, "cog": 0, "satellites_visible": 10,
+                    "alt_ellipsoid": 0, "h_acc": 0, "v_acc": 0, "vel_acc": 0, "hdg_acc": 0, "yaw": 0},
+    "LOCAL_POSITION_NED": {"time_boot_ms": 123456, "x": 0.0, "y": 0.0, "z": 0.0, "vx": 0.0, "vy": 0.0, "vz": 0.0},
+    "GLOBAL_POSITION_INT": {"time_boot_ms": 123456, "lat": 129876543, "lon": 776543210, "alt": 900000,
+                            "relative_alt": 0, "vx": 0, "vy": 0, "vz": 0, "hdg": 9000},
+    "ATTITUDE": {"time_boot_ms": 123456, "roll": 0.0123, "pitch": -0.0456, "yaw": 1.5707,
+                 "rollspeed": 0.0001, "pitchspeed": -0.0002, "yawspeed": 0.0003},
+}
+
+
+def builtin_dictionary():
+    """
+    Raw-content dictionary (version 1): buffer rows shaped exactly like the ones
+    store_payload writes. Rows compressed with it must stay readable, so never
+    change this; train a new version with tools/train_payload_dict.py instead.
+    """
+    rows = []
+    for msg_type, fields in _MAVLINK_SHAPES.items():     # most frequent last, nearest the data
+        message = str({"messageType": msg_type, **fields, "timestamp": "2025-01-01T00:00:00.000000+00:00"})
+        rows.append(str({"topic": "spBv1.0/DroneFleet/DDATA/DRONE-001/Mavlink", "message": message}))
+    return "".join(rows).encode("utf-8")
+
+
+def default_dict_dir():
+    return "dicts" if platform.system() == "Windows" else "/app/data/dicts"
+
+
+def load_dictionaries(dict_dir):
+    """{version: {"zstd": trained dict bytes, "raw": raw content}} found in dict_dir."""
+    found = {BUILTIN_VERSION: {"raw": builtin_dictionary()}}
+    if dict_dir and os.path.isdir(dict_dir):
+        for name in os.listdir(dict_dir):
+            match = DICT_FILE.match(name)
+            if match:
+                with open(os.path.join(dict_dir, name), "rb") as f:
+                    found.setdefault(int(match.group(1)), {})[match.group(2)] = f.read()
+    return found
+
+
+# ------------------------
+# Buffered Payload Codec
+# ------------------------
+class PayloadCodec:
+    """
+    Compresses buffer rows with zstd and the newest dictionary (zlib with the
+    dictionary's raw content when zstandard is not installed). Every row carries
+    the codec id and dictionary version it was written with, so dictionaries
+    can be retrained while older rows are still waiting to be replayed.
+    """
+    def __init__(self, codec="zstd", dict_dir=None, level=3):
+        if codec == "zstd" and zstandard is None:
+            logging.warning("zstandard not installed, compressing buffered payloads with zlib")
+            codec = "zlib"
+        self.codec = codec
+        self.level = level
+        self.dictionaries = load_dictionaries(dict_dir or default_dict_dir())
+        self.version = max(self.dictionaries)
+        self.compressors = {}
+        self.decompressors = {}
+        self.lock = threading.Lock()
+
+    def _zstd_dict(self, version):
+        entry = self.dictionaries[version]
+        if "zstd" in entry:
+            return zstandard.ZstdCompressionDict(entry["zstd"])
+        return zstandard.ZstdCompressionDict(entry["raw"], dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+
+    def _zlib_dict(self, version):
+        # zlib only looks back 32 KiB
+        return self.dictionaries[version].get("raw", b"")[-32768:]
+
+    def encode(self, text):
+        """Row value to store: compressed bytes, or text unchanged when compression is off."""
+        data = text.encode("utf-8")
+        RAW_BYTES.inc(len(data))
+        if self.codec == "zstd":
+            compressor = self.compressors.get(self.version)
+            if compressor is None:
+                compressor = zstandard.ZstdCompressor(level=self.level, dict_data=self._zstd_dict(self.version))
+                self.compressors[self.version] = compressor
+            # ZstdCompressor objects are not thread-safe
+            with self.lock:
+                body = compressor.compress(data)
+            stored = HEADER.pack(CODEC_ZSTD, self.version) + body
+        elif self.codec == "zlib":
+            zdict = self._zlib_dict(self.version)
+            compressor = zlib.compressobj(level=min(self.level * 2, 9), zdict=zdict) if zdict else \
+                zlib.compressobj(level=min(self.level * 2, 9))
+            stored = HEADER.pack(CODEC_ZLIB, self.version) + compressor.compress(data) + compressor.flush()
+        else:
+            STORED_BYTES.inc(len(data))
+            return text
+        STORED_BYTES.inc(len(stored))
+        return stored
+
+    def decode(self, value):
+        if isinstance(value, str):
+            return value
+        value = bytes(value)
+        if not value or value[0] not in (CODEC_ZLIB, CODEC_ZSTD):
+            return value.decode("utf-8")
+        codec, version = HEADER.unpack_from(value, 0)
+        body = value[HEADER.size:]
+        if version not in self.dictionaries:
+            raise ValueError(f"Buffered row needs payload dictionary v{version}, which is not installed")
+        if codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise ValueError("Buffered row is zstd-compressed but zstandard is not installed")
+            decompressor = self.decompressors.get(version)
+            if decompressor is None:
+                decompressor = zstandard.ZstdDecompressor(dict_data=self._zstd_dict(version))
+                self.decompressors[version] = decompressor
+            with self.lock:
+                return decompressor.decompress(body).decode("utf-8")
+        zdict = self._zlib_dict(version)
+        decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+        return (decompressor.decompress(body) + decompressor.flush()).decode("utf-8")
+
+    def status(self):
+        raw, stored = sum(RAW_BYTES.values.values()), sum(STORED_BYTES.values.values())
+        return {
+            "codec": self.codec,
+            "dictionary_version": self.version,
+            "ratio": round(raw / stored, 2) if stored else None,
+        }
@@ -22,12 +22,13 @@ class RestClient:
         url = endpoint
 
         try:
-            logging.info(f"🔗 POST {url}")
+            logging.debug(f"🔗 POST {url}")
 
             response = requests.post(url, json=json_data, timeout=self.timeout)
            
             if response.status_code == 200:
-                logging.info(f"✅ Response: {response.json()}")
+                if logging.isEnabledFor(logging.DEBUG):
+                    logging.debug(f"✅ Response: {response.json()}")
             else:
                 logging.error(f"❌ Error {response.status_code}: {response.text}")
             return response
@@ -46,12 +47,13 @@ class RestClient:
         url = endpoint
 
         try:
-            logging.info(f"🔗 GET {url} params={params}")
+            logging.debug(f"🔗 GET {url} params={params}")
 
             response = requests.get(url, params=params, timeout=self.timeout)
 
             if response.status_code == 200:
-                logging.info(f"✅ Response: {response.json()}")
+                if logging.isEnabledFor(logging.DEBUG):
+                    logging.debug(f"✅ Response: {response.json()}")
             else:
                 logging.error(f"❌ Error {response.status_code}: {response.text}")
 
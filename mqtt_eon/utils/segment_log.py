@@ -0,0 +1,344 @@
+import mmap
+import os
+import platform
+import struct
+import threading
+import zlib
+
+from utils.logger import setup_logger
+from utils.db_buffer import BUFFER_DEPTH, BUFFERED_TOTAL, row_text
+logging = setup_logger(__name__)
+
+# Record: payload length, crc32(payload), row id, payload bytes
+HEADER = struct.Struct("<IIQ")
+OFFSET = struct.Struct("<Q")
+SEGMENT_SUFFIX = ".seg"
+# Sparse index: byte position of every Nth record, for reading a segment backwards
+CHECKPOINT_EVERY = 256
+
+
+class Segment:
+    """One preallocated, memory-mapped segment file. Unused space is zero-filled."""
+    def __init__(self, path, base_id, size=None):
+        self.path = path
+        self.base_id = base_id
+        exists = os.path.exists(path)
+        self.file = open(path, "r+b" if exists else "w+b")
+        if not exists:
+            self.file.truncate(size)
+        self.size = os.path.getsize(path)
+        self.mm = mmap.mmap(self.file.fileno(), self.size)
+        self.records = 0
+        self.checkpoints = []
+        self.end, self.last_id = self._recover()
+
+    def _recover(self):
+        """Find the end of the valid records; a torn/partial tail write is zeroed."""
+        pos, last_id = 0, self.base_id - 1
+        while pos + HEADER.size <= self.size:
+            length, crc, row_id = HEADER.unpack_from(self.mm, pos)
+            if length == 0 or pos + HEADER.size + length > self.size:
+                break
+            if zlib.crc32(self.mm[pos + HEADER.size:pos + HEADER.size + length]) != crc:
+                logging.warning(f"Truncating corrupt buffer record at {self.path}:{pos}")
+                self.mm[pos:pos + HEADER.size] = bytes(HEADER.size)
+                break
+            self._index(pos)
+            last_id = row_id
+            pos += HEADER.size + length
+        return pos, last_id
+
+    def _index(self, pos):
+        if self.records % CHECKPOINT_EVERY == 0:
+            self.checkpoints.append(pos)
+        self.records += 1
+
+    def fits(self, length):
+        return self.end + HEADER.size + length <= self.size
+
+    def append(self, row_id, data, sync):
+        pos = self.end
+        self.mm[pos + HEADER.size:pos + HEADER.size + len(data)] = data
+        # Header last, so a crash mid-write leaves a zero length (end of log) behind
+        HEADER.pack_into(self.mm, pos, len(data), zlib.crc32(data), row_id)
+        self._index(pos)
+        self.end = pos + HEADER.size + len(data)
+        self.last_id = row_id
+        if sync:
+            start = pos - pos % mmap.PAGESIZE
+            self.mm.flush(start, self.end - start)
+
+    def read(self, pos):
+        """(row_id, payload bytes, next position) or None at the end of the segment."""
+        if pos + HEADER.size > self.end:
+            return None
+        length, _, row_id = HEADER.unpack_from(self.mm, pos)
+        start = pos + HEADER.size
+        return row_id, self.mm[start:start + length], start + length
+
+    def block_for(self, row_id):
+        """Index of the last checkpoint block starting at or below row_id (-1 if none)."""
+        lo, hi = 0, len(self.checkpoints) - 1
+        found = -1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if HEADER.unpack_from(self.mm, self.checkpoints[mid])[2] <= row_id:
+                found, lo = mid, mid + 1
+            else:
+                hi = mid - 1
+        return found
+
+    def block(self, index):
+        """[(row_id, payload bytes)] of one checkpoint block, oldest first."""
+        pos = self.checkpoints[index]
+        end = self.checkpoints[index + 1] if index + 1 < len(self.checkpoints) else self.end
+        records = []
+        while pos < end:
+            row_id, data, pos = self.read(pos)
+            records.append((row_id, data))
+        return records
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    def remove(self):
+        self.close()
+        os.remove(self.path)
+
+
+# ------------------------
+# Segmented Log Buffer
+# ------------------------
+class SegmentLogBuffer:
+    """
+    Store-and-forward buffer as an append-only log of mmap'd segment files, with
+    the same surface as DBBuffer. Row ids are sequence numbers; delete(row_id)
+    acknowledges a row. The persisted consumer offset is the highest id below
+    which everything is acknowledged, and segments wholly below it are unlinked.
+    Rows acknowledged out of order are remembered in memory until the offset
+    catches up (after a crash they are replayed again, i.e. at-least-once).
+    """
+    def __init__(self, path=None, segment_bytes=8 * 1024 * 1024, sync_every=1, codec=None):
+        if path is None:
+            path = "buffer_log" if platform.system() == "Windows" else "/app/data/buffer_log"
+        self.path = path
+        self.codec = codec
+        self.segment_bytes = segment_bytes
+        # msync after every N appends (1 = every record, 0 = leave it to the OS)
+        self.sync_every = sync_every
+        self.unsynced = 0
+        self.stored = 0             # rows stored by this process (lets readers notice new rows)
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        offset_path = os.path.join(path, "consumer.offset")
+        self.offset_file = open(offset_path, "r+b" if os.path.exists(offset_path) else "w+b")
+        self.offset_file.truncate(OFFSET.size)
+        self.offset_mm = mmap.mmap(self.offset_file.fileno(), OFFSET.size)
+        self.committed = OFFSET.unpack_from(self.offset_mm, 0)[0]
+        self.acked = set()
+        # newest_first reads: top id seen last time and the ids handed out
+        self.desc_top = None
+        self.desc_last = []
+
+        self.segments = []
+        for name in sorted(f for f in os.listdir(path) if f.endswith(SEGMENT_SUFFIX)):
+            self.segments.append(Segment(os.path.join(path, name), int(name[:-len(SEGMENT_SUFFIX)])))
+        if self.segments:
+            self.next_id = max(self.segments[-1].last_id, self.committed) + 1
+        else:
+            self.next_id = self.committed + 1
+        # Read cursor: (segment index, byte position) of the first row after the offset
+        self.cursor = (0, 0)
+        self._drop_consumed_segments()
+        self._publish_count()
+        logging.info(f"Segment log buffer at {path}: {self._count()} pending rows")
+
+    # --- bookkeeping ---
+    def _count(self):
+        return max(0, self.next_id - 1 - self.committed - len(self.acked))
+
+    def _publish_count(self):
+        BUFFER_DEPTH.set(self._count())
+
+    def _new_segment(self, min_size):
+        base = self.next_id
+        path = os.path.join(self.path, f"{base:020d}{SEGMENT_SUFFIX}")
+        segment = Segment(path, base, max(self.segment_bytes, min_size))
+        self.segments.append(segment)
+        return segment
+
+    def _commit(self):
+        while self.committed + 1 in self.acked:
+            self.committed += 1
+            self.acked.discard(self.committed)
+        OFFSET.pack_into(self.offset_mm, 0, self.committed)
+        if self.sync_every:
+            self.offset_mm.flush()
+        self._drop_consumed_segments()
+
+    def _drop_consumed_segments(self):
+        # Never drop the active (last) segment; it is still being appended to
+        while len(self.segments) > 1 and self.segments[0].last_id <= self.committed:
+            self.segments.pop(0).remove()
+            seg_index, pos = self.cursor
+            self.cursor = (max(0, seg_index - 1), pos if seg_index else 0)
+
+    def _decode(self, data):
+        return self.codec.decode(data) if self.codec else data.decode("utf-8")
+
+    def _pending(self, row_id):
+        return row_id > self.committed and row_id not in self.acked
+
+    def _rows_desc(self, hi, lo, limit, rows):
+        """Append pending rows with lo <= id <= hi to rows, newest first, until limit."""
+        for segment in reversed(self.segments):
+            block = segment.block_for(hi)
+            while block >= 0:
+                for row_id, data in reversed(segment.block(block)):
+                    if row_id > hi:
+                        continue
+                    if row_id < lo or row_id <= self.committed:
+                        return
+                    if row_id not in self.acked:
+                        rows.append((row_id, self._decode(data)))
+                        if len(rows) >= limit:
+                            return
+                block -= 1
+
+    def _newest_rows(self, limit):
+        top = self.next_id - 1
+        if self.desc_top is None:
+            resume = top
+        elif self.desc_last:
+            # Everything above the highest row still unacknowledged from last time was replayed
+            unacked = [i for i in self.desc_last if self._pending(i)]
+            resume = max(unacked) if unacked else min(self.desc_last) - 1
+        else:
+            resume = self.committed
+        rows = []
+        if self.desc_top is not None and top > self.desc_top:
+            self._rows_desc(top, self.desc_top + 1, limit, rows)      # stored since the last call
+        if len(rows) < limit:
+            self._rows_desc(resume, self.committed + 1, limit, rows)
+        self.desc_top = top
+        self.desc_last = [row_id for row_id, _ in rows]
+        return rows
+
+    # --- DBBuffer surface ---
+    def store_payload(self, payload):
+        text = row_text(payload)
+        data = self.codec.encode(text) if self.codec else text
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with self.lock:
+            segment = self.segments[-1] if self.segments else None
+            if segment is None or not segment.fits(len(data)):
+                segment = self._new_segment(HEADER.size + len(data))
+            self.unsynced += 1
+            sync = bool(self.sync_every) and self.unsynced >= self.sync_every
+            if sync:
+                self.unsynced = 0
+            segment.append(self.next_id, data, sync)
+            self.next_id += 1
+            self.stored += 1
+            self._publish_count()
+        BUFFERED_TOTAL.inc()
+        logging.debug("💾 Stored offline payload.")
+
+    def getAllRows(self, limit=None, newest_first=False):
+        if newest_first:
+            with self.lock:
+                return self._newest_rows(limit or max(self.next_id, 1))
+        rows = []
+        with self.lock:
+            seg_index, pos = self.cursor
+            advancing = True
+            while seg_index < len(self.segments):
+                record = self.segments[seg_index].read(pos)
+                if record is None:
+                    if seg_index == len(self.segments) - 1:
+                        break
+                    seg_index, pos = seg_index + 1, 0
+                    if advancing:
+                        self.cursor = (seg_index, 0)
+                    continue
+                row_id, data, next_pos = record
+                if row_id <= self.committed:
+                    if advancing:
+                        self.cursor = (seg_index, next_pos)
+                elif row_id not in self.acked:
+                    advancing = False
+                    rows.append((row_id, self._decode(data)))
+                    if limit and len(rows) >= limit:
+                        break
+                pos = next_pos
+        return rows
+
+    def iterRows(self, batch_size=500, after_id=0):
+        """All pending rows (after after_id) oldest first, read in batches so the lock isn't held throughout."""
+        base, pos = None, 0
+        while True:
+            batch = []
+            with self.lock:
+                if base is None:
+                    index, pos = self.cursor
+                else:
+                    # Segments may have been dropped meanwhile; carry on from the same one or the next
+                    index = next((i for i, seg in enumerate(self.segments) if seg.base_id >= base),
+                                 len(self.segments))
+                    if index < len(self.segments) and self.segments[index].base_id != base:
+                        pos = 0
+                while index < len(self.segments) and len(batch) < batch_size:
+                    record = self.segments[index].read(pos)
+                    if record is None:
+                        if index == len(self.segments) - 1:
+                            break
+                        index, pos = index + 1, 0
+                        continue
+                    row_id, data, pos = record
+                    if row_id > after_id and self._pending(row_id):
+                        batch.append((row_id, self._decode(data)))
+                if index < len(self.segments):
+                    base = self.segments[index].base_id
+            if not batch:
+                return
+            yield from batch
+
+    def delete(self, row_id):
+        self.delete_many((row_id,))
+
+    def delete_many(self, row_ids):
+        with self.lock:
+            for row_id in row_ids:
+                if self.committed < row_id < self.next_id:
+                    self.acked.add(row_id)
+            self._commit()
+            self._publish_count()
+
+    def getBufferCount(self):
+        return {"buffered_messages": self._count()}
+
+    def clear_all(self):
+        with self.lock:
+            for segment in self.segments:
+                segment.remove()
+            self.segments = []
+            self.cursor = (0, 0)
+            self.acked.clear()
+            self.desc_top, self.desc_last = None, []
+            self.committed = self.next_id - 1
+            self._commit()
+            self._publish_count()
+        logging.info("🗑️ Cleared all buffered data.")
+
+    def close(self):
+        with self.lock:
+            for segment in self.segments:
+                segment.mm.flush()
+                segment.close()
+            self.segments = []
+            self.offset_mm.flush()
+            self.offset_mm.close()
+            self.offset_file.close()
@@ -2,6 +2,9 @@ from utils.db import init_db
 import json
 from flask import Flask
 from rest_api.routes import register_routes
+from core.docker_manager import stats_cache, container_state, deploy_settings
+from core.job_queue import JobQueue
+from utils.host_metrics import get_host_sampler
 
 from utils.logger import setup_logger
 log = setup_logger()
@@ -13,15 +16,27 @@ CONFIG_PATH = "config.json"
 try:
     with open(CONFIG_PATH, "r") as f:
         config = json.load(f)
-        FLASK_PORT = config.get("flask_port", 5000)
 except:
-    FLASK_PORT = 5000
+    config = {}
+FLASK_PORT = config.get("flask_port", 5000)
 
 
+deploy_settings.update({k: config[k] for k in deploy_settings if k in config})
+
+# Deploy/start/stop/restart run as jobs: bounded workers, one at a time per container
+jobs = JobQueue(max_workers=config.get("job_workers", 2))
+
 # Register REST API routes
-register_routes(app)    
+register_routes(app, jobs)    
 
 if __name__ == "__main__":
     init_db()
+    # Container/image/network cache fed by docker events, with a periodic full resync
+    container_state.resync_interval = config.get("docker_resync_interval", 300)
+    container_state.start()
+    # Container stats are sampled in the background; /status serves the cache
+    stats_cache.configure(config)
+    stats_cache.start()
+    get_host_sampler(config.get("host_metrics_interval", 2.0))
     log.info("🚀 Starting Edge Compute OTA Agent REST services...")
     app.run(host="0.0.0.0", port=FLASK_PORT, threaded=True)
\ No newline at end of file
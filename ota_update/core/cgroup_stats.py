@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+
+import psutil
+
+from utils.logger import setup_logger
+log = setup_logger()
+
+UNLIMITED = 1 << 60     # cgroup v1 reports "no limit" as a huge page-aligned number
+
+
+def _read_int(path):
+    with open(path) as f:
+        value = f.read().strip()
+    return None if value == "max" else int(value)
+
+
+def _read_keyed(path):
+    """'key value' lines (cpu.stat, memory.stat) as {key: int}."""
+    result = {}
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2:
+                result[parts[0]] = int(parts[1])
+    return result
+
+
+# ------------------------
+# cgroup Container Stats
+# ------------------------
+class CgroupReader:
+    """
+    Container CPU, memory, I/O and throttling counters read straight from the
+    cgroup v1 or v2 accounting files, instead of docker's stats API (which
+    samples for 1-2 s per call). CPU % is the usage delta between two reads,
+    100% = one core, as `docker stats` reports it.
+
+    Inside a container the host hierarchy has to be mounted, e.g.
+    /sys/fs/cgroup:/host/cgroup:ro with CGROUP_ROOT=/host/cgroup. Network
+    counters come from /proc/<pid>/net/dev of a process in the container, which
+    needs the host's /proc as well (/proc:/host/proc:ro, HOST_PROC=/host/proc).
+    read() returns None when a container's cgroup can't be found or read,
+    so the caller can fall back to the Docker API.
+    """
+    # Docker's cgroupfs and systemd cgroup drivers
+    V2_DIRS = ("system.slice/docker-{id}.scope", "docker/{id}")
+    V1_DIRS = ("docker/{id}", "system.slice/docker-{id}.scope")
+
+    def __init__(self, root=None, proc_root=None):
+        self.root = root or os.getenv("CGROUP_ROOT", "/sys/fs/cgroup")
+        self.proc_root = proc_root or os.getenv("HOST_PROC", "/proc")
+        self.version = 2 if os.path.exists(os.path.join(self.root, "cgroup.controllers")) else 1
+        self.paths = {}             # container id -> cgroup dir (v2) or relative dir (v1)
+        self.previous = {}          # container id -> (monotonic time, cpu usage seconds)
+        self.lock = threading.Lock()
+
+    def _locate(self, container_id):
+        path = self.paths.get(container_id)
+        if path is not None:
+            return path
+        if self.version == 2:
+            candidates = [os.path.join(self.root, d.format(id=container_id)) for d in self.V2_DIRS]
+            path = next((c for c in candidates if os.path.exists(os.path.join(c, "cpu.stat"))), None)
+        else:
+            path = next((d.format(id=container_id) for d in self.V1_DIRS
+                         if os.path.exists(os.path.join(self.root, "cpuacct", d.format(id=container_id)))), None)
+        if path is not None:
+            self.paths[container_id] = path
+        return path
+
+    def _v1(self, controller, path, name):
+        return os.path.join(self.root, controller, path, name)
+
+    def _read_v2(self, path):
+        cpu = _read_keyed(os.path.join(path, "cpu.stat"))
+        memory_stat = _read_keyed(os.path.join(path, "memory.stat"))
+        io = {"read_bytes": 0, "write_bytes": 0, "read_ops": 0, "write_ops": 0}
+        try:
+            with open(os.path.join(path, "io.stat")) as f:
+                for line in f:
+                    fields = dict(kv.split("=", 1) for kv in line.split()[1:] if "=" in kv)
+                    io["read_bytes"] += int(fields.get("rbytes", 0))
+                    io["write_bytes"] += int(fields.get("wbytes", 0))
+                    io["read_ops"] += int(fields.get("rios", 0))
+                    io["write_ops"] += int(fields.get("wios", 0))
+        except FileNotFoundError:
+            pass                        # io controller not enabled for the group
+        try:
+            pids = _read_int(os.path.join(path, "pids.current"))
+        except FileNotFoundError:
+            pids = None
+        return {
+            "cpu_seconds": cpu["usage_usec"] / 1e6,
+            "memory_usage": _read_int(os.path.join(path, "memory.current")),
+            "memory_cache": memory_stat.get("inactive_file", 0),
+            "memory_limit": _read_int(os.path.join(path, "memory.max")),
+            "io": io,
+            "throttling": {"periods": cpu.get("nr_periods", 0), "throttled_periods": cpu.get("nr_throttled", 0),
+                           "throttled_seconds": round(cpu.get("throttled_usec", 0) / 1e6, 3)},
+            "pids": pids,
+        }
+
+    def _read_v1(self, path):
+        cpu = _read_keyed(self._v1("cpu", path, "cpu.stat"))
+        memory_stat = _read_keyed(self._v1("memory", path, "memory.stat"))
+        io = {"read_bytes": 0, "write_bytes": 0, "read_ops": 0, "write_ops": 0}
+        for name, unit in (("blkio.throttle.io_service_bytes", "bytes"), ("blkio.throttle.io_serviced", "ops")):
+            try:
+                with open(self._v1("blkio", path, name)) as f:
+                    for line in f:
+                        parts = line.split()
+                        if len(parts) == 3 and parts[1] in ("Read", "Write"):
+                            io[f"{parts[1].lower()}_{unit}"] += int(parts[2])
+            except FileNotFoundError:
+                pass
+        limit = _read_int(self._v1("memory", path, "memory.limit_in_bytes"))
+        try:
+            pids = _read_int(self._v1("pids", path, "pids.current"))
+        except FileNotFoundError:
+            pids = None
+        return {
+            "cpu_seconds": _read_int(self._v1("cpuacct", path, "cpuacct.usage")) / 1e9,
+            "memory_usage": _read_int(self._v1("memory", path, "memory.usage_in_bytes")),
+            "memory_cache": memory_stat.get("total_inactive_file", 0),
+            "memory_limit": None if limit is None or limit >= UNLIMITED else limit,
+            "io": io,
+            "throttling": {"periods": cpu.get("nr_periods", 0), "throttled_periods": cpu.get("nr_throttled", 0),
+                           "throttled_seconds": round(cpu.get("throttled_time", 0) / 1e9, 3)},
+            "pids": pids,
+        }
+
+    def _sample(self, path):
+        return self._read_v2(path) if self.version == 2 else self._read_v1(path)
+
+    def _network(self, path):
+        """rx/tx byte counters of the container's network namespace (all interfaces but lo), or None."""
+        procs = os.path.join(path, "cgroup.procs") if self.version == 2 else self._v1("cpuacct", path, "cgroup.procs")
+        try:
+            with open(procs) as f:
+                pid = f.readline().strip()
+            if not pid:
+                return None
+            rx = tx = 0
+            with open(os.path.join(self.proc_root, pid, "net", "dev")) as f:
+                for line in f.readlines()[2:]:
+                    interface, counters = line.split(":", 1)
+                    if interface.strip() == "lo":
+                        continue
+                    fields = counters.split()
+                    rx += int(fields[0])
+                    tx += int(fields[8])
+            return {"rx_bytes": rx, "tx_bytes": tx}
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def read(self, container_id):
+        """Stats for a running container (full id), in get_container_stats' shape plus extra counters."""
+        with self.lock:
+            path = self._locate(container_id)
+        if path is None:
+            return None
+        try:
+            now = time.monotonic()
+            raw = self._sample(path)
+            with self.lock:
+                previous = self.previous.get(container_id)
+            if previous is None:
+                # First sighting: take a short second sample so CPU % isn't empty
+                time.sleep(0.1)
+                previous, now, raw = (now, raw["cpu_seconds"]), time.monotonic(), self._sample(path)
+            with self.lock:
+                self.previous[container_id] = (now, raw["cpu_seconds"])
+        except (OSError, ValueError, KeyError) as e:
+            log.warning(f"cgroup stats unavailable for {container_id[:12]}: {e}")
+            with self.lock:
+                self.paths.pop(container_id, None)
+                self.previous.pop(container_id, None)
+            return None
+
+        elapsed = now - previous[0]
+        cpu_percent = (raw["cpu_seconds"] - previous[1]) / elapsed * 100.0 if elapsed > 0 else 0.0
+        # Same as docker stats: page cache that can be reclaimed doesn't count as used
+        usage = max(0, raw["memory_usage"] - raw["memory_cache"])
+        limit = raw["memory_limit"] or psutil.virtual_memory().total
+        return {
+            "cpu_percent": round(max(cpu_percent, 0.0), 2),
+            "memory_mb": round(usage / 1024 / 1024, 2),
+            "memory_percent": round(usage / limit * 100.0, 2),
+            "memory_limit_mb": round(limit / 1024 / 1024, 2),
+            "io": raw["io"],
+            "throttling": raw["throttling"],
+            "pids": raw["pids"],
+            "network": self._network(path),
+            "source": "cgroup",
+        }
+
+    def forget(self, container_id):
+        with self.lock:
+            self.paths.pop(container_id, None)
+            self.previous.pop(container_id, None)
@@ -1,7 +1,13 @@
 import json
+import time
 import docker
 from datetime import datetime
 from utils.db import save_deployment, load_deployments
+from core.stats_sampler import StatsSampler
+from core.stats_history import StatsHistory
+from core.cgroup_stats import CgroupReader
+from core.docker_state import DockerStateCache
+from core.health_probe import wait_healthy
 import platform
 
 from utils.logger import setup_logger
@@ -24,9 +30,25 @@ else:
     docker_client = docker.from_env()
 
 
-def get_container_stats(container_id):
+# Container/image/network state kept current from docker events (started from app.py);
+# list and port lookups read it instead of calling the API per container
+container_state = DockerStateCache(docker_client)
+
+# deploy_mode "swap" (blue/green) or "recreate"; health probe limits in seconds
+deploy_settings = {"deploy_mode": "swap", "health_timeout": 60, "health_stable_seconds": 5}
+
+# Reads the cgroup accounting files directly; docker's stats API is the fallback
+cgroups = CgroupReader()
+
+
+def get_container_stats(container_id, container=None):
     try:
-        container = docker_client.containers.get(container_id)
+        container = container or docker_client.containers.get(container_id)
+        stats = cgroups.read(container.id)
+        if stats is not None:
+            return stats
+        if container.status != "running":
+            return None
         stats = container.stats(stream=False)
 
         cpu_delta = stats["cpu_stats"]["cpu_usage"]["total_usage"] - stats["precpu_stats"]["cpu_usage"]["total_usage"]
@@ -36,18 +58,22 @@ def get_container_stats(container_id):
         memory_usage = stats["memory_stats"].get("usage", 0)
         memory_limit = stats["memory_stats"].get("limit", 1)
         memory_percent = (memory_usage / memory_limit) * 100.0
+        networks = stats.get("networks") or {}
 
         return {
             "cpu_percent": round(cpu_percent, 2),
             "memory_mb": round(memory_usage / 1024 / 1024, 2),
-            "memory_percent": round(memory_percent, 2)
+            "memory_percent": round(memory_percent, 2),
+            "network": {"rx_bytes": sum(n.get("rx_bytes", 0) for n in networks.values()),
+                        "tx_bytes": sum(n.get("tx_bytes", 0) for n in networks.values())} if networks else None,
+            "source": "docker"
         }
     except:
         return None
 
-def get_container_lifecycle(container_id):
+def get_container_lifecycle(container_id, container=None):
     try:
-        container = docker_client.containers.get(container_id)
+        container = container or docker_client.containers.get(container_id)
         info = container.attrs
         created = info["Created"]
         started = info["State"].get("StartedAt")
@@ -67,9 +93,37 @@ def get_container_lifecycle(container_id):
     except:
         return {"status": "unknown", "uptime_seconds": 0}
 
+def collect_container(container_id):
+    """Lifecycle and stats of one container from a single containers.get."""
+    try:
+        container = docker_client.containers.get(container_id)
+    except Exception:
+        return {"lifecycle": {"status": "unknown", "uptime_seconds": 0}, "stats": None}
+    return {"lifecycle": get_container_lifecycle(container_id, container),
+            "stats": get_container_stats(container_id, container)}
+
+
+# Per-container CPU/memory/network history for /stats/history, keyed by container name
+stats_history = StatsHistory()
+
+
+def record_history(samples):
+    """StatsSampler callback: {container_id: (sampled_at, {"lifecycle", "stats"})}."""
+    names = {row[4]: row[0] for row in load_deployments()}
+    for container_id, (sampled_at, data) in samples.items():
+        if data["stats"] is not None:
+            stats_history.record(names.get(container_id, container_id[:12]), sampled_at, data["stats"])
+
+
+# Sampled in the background (started from app.py); get_deployments only reads the cache
+stats_cache = StatsSampler(collect_container, lambda: [row[4] for row in load_deployments()],
+                           on_refresh=record_history)
+
+
 def get_deployments():
     deployments = []
     for name, image, version, ports_json, container_id, timestamp in load_deployments():
+        cached = stats_cache.get(container_id) or {}
         deployments.append({
             "name": name,
             "image": image,
@@ -77,8 +131,9 @@ def get_deployments():
             "ports": json.loads(ports_json),
             "container_id": container_id,
             "timestamp": timestamp,
-            "lifecycle": get_container_lifecycle(container_id),
-            "stats": get_container_stats(container_id)
+            "lifecycle": cached.get("lifecycle", {"status": "unknown", "uptime_seconds": 0}),
+            "stats": cached.get("stats"),
+            "sampled_at": cached.get("sampled_at")
         })
     return deployments
 
@@ -102,31 +157,26 @@ def get_deployments():
 
 def free_port(port_number):
     """Stop and remove any container using the given external port."""
-    for c in docker_client.containers.list(all=True):
-        ports = c.attrs["HostConfig"].get("PortBindings", {})
-        for internal, binding in ports.items():
-            for b in binding:
-                if b.get("HostPort") == str(port_number):
-                    log.warning(f"Port {port_number} is already used by container {c.name}. Removing it...")
-                    try:
-                        c.stop()
-                        c.remove(force=True)
-                        log.info(f"Released port {port_number} from container {c.name}")
-                    except Exception as e:
-                        log.error(f"Failed to remove container {c.name}: {e}")
+    for entry in container_state.containers_on_port(port_number):
+        name = entry["name"]
+        log.warning(f"Port {port_number} is already used by container {name}. Removing it...")
+        try:
+            c = docker_client.containers.get(entry["id"])
+            c.stop()
+            c.remove(force=True)
+            log.info(f"Released port {port_number} from container {name}")
+        except Exception as e:
+            log.error(f"Failed to remove container {name}: {e}")
 
 def ensure_network(network_name="edgecompute-net"):
-    for net in docker_client.networks.list():
-        # if net.name == network_name or net.name.endswith(network_name):
-        #     print("net.name", net.name)#2dl 
-        #     return net.name # 2dl only for testing
-        #     #return net
-        if net.name.endswith(network_name):
-           log.info(f"net.name {net.name}")
-               
-           return net.name # 2dl only for testing
-                    #return net        
-    return docker_client.networks.create(network_name, driver="bridge")
+    # if net.name == network_name or net.name.endswith(network_name): ... (2dl only for testing)
+    name = container_state.network_ending_with(network_name)
+    if name is not None:
+        log.info(f"net.name {name}")
+        return name
+    net = docker_client.networks.create(network_name, driver="bridge")
+    container_state.add_network(net.id, net.name)
+    return net.name
     # try:
     #     return docker_client.networks.get(network_name)
     # except docker.errors.NotFound:
@@ -136,63 +186,84 @@ def ensure_network(network_name="edgecompute-net"):
 # ------------------------
 # Container Action Handlers
 # ------------------------
-def deploy_container(image, container_name,port_mappings,version):
-    log.info(f"Starting deployment: {image} -> {container_name}")
+def _no_progress(message):
+    pass
+
+
+def _format_ports(port_mappings):
+    # formatted_ports = {f"{internal}/tcp": external for internal, external in port_mappings.items()}
+    formatted_ports = {}
+    for internal, external in port_mappings.items():
+        if "/" in str(external):   # e.g. "14550/udp"
+            external_port, proto = str(external).split("/")
+            formatted_ports[f"{internal}/{proto}"] = int(external_port)
+        else:
+            formatted_ports[f"{internal}/tcp"] = int(external)
+    return formatted_ports
+
+
+def _create_on_network(image, name, network, ports=None, alias=None):
+    """Create (not start) a container on the shared network, optionally answering to a DNS alias too."""
+    container = docker_client.containers.create(
+        image,
+        name=name,
+        detach=True,
+        restart_policy={"Name": "always"},
+        ports=ports or {},
+        network=network   # 👈 force into shared network
+    )
+    if alias:
+        net = docker_client.networks.get(network)
+        net.disconnect(container)
+        net.connect(container, aliases=[alias])
+    return container
+
+
+def _remove_quietly(container):
+    try:
+        container.remove(force=True)
+    except Exception as e:
+        log.warning(f"Could not remove container {container.name}: {e}")
+
+
+def deploy_container(image, container_name,port_mappings,version, health=None, mode=None, progress=_no_progress):
+    """
+    mode "swap" (default, see deploy_settings): blue/green, the old container keeps
+    serving until the new one is healthy. mode "recreate": stop old, start new.
+    Returns {"container_id", "mode", "downtime_seconds", ...} or False.
+    """
+    mode = mode or deploy_settings["deploy_mode"]
+    log.info(f"Starting deployment: {image} -> {container_name} [{mode}]")
 
 
     try:
 
         network = ensure_network("edgecompute-net")
 
+        progress(f"pulling {image}")
         docker_client.images.pull(image)
+        formatted_ports = _format_ports(port_mappings)
+        log.info(f"Formatted ports: {formatted_ports}")
         try:
             old = docker_client.containers.get(container_name)
-            log.info(f"Stopping and removing existing container: {container_name}")
-            old.stop()
-            #container.remove()
-            old.remove(force=True)
         except docker.errors.NotFound:
+            old = None
             log.info(f"No existing container named {container_name}")
 
-        # Free all external ports that we are about to bind
-        # for _, external in port_mappings.items():
-        #     free_port(external)
-        
-        # formatted_ports = {f"{internal}/tcp": external for internal, external in port_mappings.items()}
-        # print("formatted_ports", formatted_ports)  
-        formatted_ports = {}
-        for internal, external in port_mappings.items():
-            if "/" in str(external):   # e.g. "14550/udp"
-                external_port, proto = str(external).split("/")
-                formatted_ports[f"{internal}/{proto}"] = int(external_port)
-            else:
-                formatted_ports[f"{internal}/tcp"] = int(external)
-        log.info(f"Formatted ports: {formatted_ports}")
-
-        # Start new container
-        container = docker_client.containers.run(
-            image,
-            name=container_name,
-            detach=True,
-            restart_policy={"Name": "always"},
-            ports=formatted_ports,
-            network=network   # 👈 force into shared network
-        )
-       
-       # 6. Attach it explicitly to shared network
-
-       # Double-check network attachment (avoid duplicate connect)
-        # net = docker_client.networks.get("edgecompute-net")
-        # if container.name not in [c.name for c in net.containers]:
-        #     net.connect(container)
-        #     log.info(f"🔗 Connected {container_name} to {network_name}")
-
-             
+        if mode == "swap" and old is not None:
+            report = _swap(image, container_name, formatted_ports, network, old, health, progress)
+        else:
+            report = _recreate(image, container_name, formatted_ports, network, old, health, progress)
+        if not report:
+            return False
 
         # Save to DB only after successful deployment
-        save_deployment(container_name, image, version, json.dumps(port_mappings), container.id)
-        log.info(f"✅ Deployment successful: {container_name} running on {formatted_ports}")
-
+        save_deployment(container_name, image, version, json.dumps(port_mappings), report["container_id"])
+        stats_cache.wake()
+        log.info(f"✅ Deployment successful: {container_name} running on {formatted_ports} "
+                 f"(downtime {report['downtime_seconds']}s)")
+        progress("deployed")
+        return report
 
         # deployment_state["status"] = "deployed"
         # deployment_state["containers"][container_name] = "running"
@@ -200,25 +271,142 @@ def deploy_container(image, container_name,port_mappings,version):
 
     except Exception as e:
         log.error(f"Deployment failed: {e}")
+        progress(f"Deployment failed: {e}")
+        return False
         # deployment_state["status"] = "error"
         # deployment_state["last_error"] = str(e)
         # deployment_state["containers"][container_name] = "error"
 
-def start_container(name):
+
+def _recreate(image, container_name, formatted_ports, network, old, health, progress):
+    """Stop and remove the old container, then start the new one; down until it is healthy."""
+    down_at = time.monotonic()
+    if old is not None:
+        log.info(f"Stopping and removing existing container: {container_name}")
+        progress(f"removing existing container {container_name}")
+        old.stop()
+        old.remove(force=True)
+
+    # Start new container
+    progress(f"starting {container_name} on {formatted_ports}")
+    container = _create_on_network(image, container_name, network, formatted_ports)
+    container.start()
+    ok, reason = wait_healthy(container, network, health, deploy_settings["health_timeout"],
+                              deploy_settings["health_stable_seconds"])
+    progress(f"probe: {reason}")
+    if not ok:
+        progress(f"Deployment failed: new container not healthy ({reason})")
+        return None
+    return {"container_id": container.id, "mode": "recreate",
+            "downtime_seconds": round(time.monotonic() - down_at, 2) if old is not None else None}
+
+
+def _swap(image, container_name, formatted_ports, network, old, health, progress):
+    """
+    Blue/green: start the new container as <name>-next, answering to <name> on the
+    shared network next to the old one, and probe it. The old container is only
+    retired once the new one is healthy; a failed probe leaves it untouched.
+
+    Host-published ports can't be bound twice, so with ports the final cutover
+    is: stop old -> start a pre-created replacement with the ports -> probe ->
+    remove old, or restart old if the replacement fails. <name>-next keeps
+    serving in-network traffic meanwhile; only the host ports see the measured gap.
+    Any error after the candidate exists rolls back the same way (_roll_back).
+    """
+    next_name, retired_name = f"{container_name}-next", f"{container_name}-old"
+    for stale in (next_name, retired_name):     # leftovers of an interrupted swap
+        try:
+            _remove_quietly(docker_client.containers.get(stale))
+        except docker.errors.NotFound:
+            pass
+
+    candidate = final = down_at = None
+    try:
+        progress(f"starting {next_name} alongside {container_name}")
+        candidate = _create_on_network(image, next_name, network, alias=container_name)
+        candidate.start()
+        probe_started = time.monotonic()
+        ok, reason = wait_healthy(candidate, network, health, deploy_settings["health_timeout"],
+                                  deploy_settings["health_stable_seconds"])
+        progress(f"probe {next_name}: {reason}")
+        if not ok:
+            _remove_quietly(candidate)
+            progress(f"Deployment failed: new container not healthy ({reason}); {container_name} kept running")
+            return None
+        probe_seconds = round(time.monotonic() - probe_started, 2)
+
+        old.rename(retired_name)
+        if not formatted_ports:
+            # Nothing bound on the host: the healthy candidate simply takes over the name
+            candidate.rename(container_name)
+            progress(f"retiring {retired_name}")
+            _remove_quietly(old)
+            return {"container_id": candidate.id, "mode": "swap", "downtime_seconds": 0.0,
+                    "probe_seconds": probe_seconds}
+
+        final = _create_on_network(image, container_name, network, formatted_ports)
+        progress(f"moving ports {formatted_ports} to the new container")
+        down_at = time.monotonic()
+        old.stop()
+        final.start()
+        ok, reason = wait_healthy(final, network, health, deploy_settings["health_timeout"],
+                                  deploy_settings["health_stable_seconds"])
+        if not ok:
+            raise RuntimeError(f"{container_name} not healthy on the host ports ({reason})")
+        downtime = round(time.monotonic() - down_at, 2)
+        progress(f"retiring {retired_name} and {next_name}")
+        _remove_quietly(old)
+        _remove_quietly(candidate)
+        return {"container_id": final.id, "mode": "swap", "downtime_seconds": downtime,
+                "probe_seconds": probe_seconds}
+
+    except Exception as e:
+        progress(f"rolling back: {e}")
+        try:
+            _roll_back(container_name, old, candidate, final)
+        except Exception as rollback_error:
+            log.error(f"Rollback of {container_name} failed: {rollback_error}")
+            progress(f"Deployment failed: {e}; rollback failed: {rollback_error}")
+            return None
+        downtime = f" after {round(time.monotonic() - down_at, 2)}s downtime" if down_at else ""
+        progress(f"Deployment failed: rolled back to the previous container{downtime}")
+        return None
+
+
+def _roll_back(container_name, old, candidate, final):
+    """Undo a partial swap: drop the new containers, give the old one its name back and start it."""
+    for container in (final, candidate):
+        if container is not None:
+            _remove_quietly(container)
+    old.reload()
+    if old.name != container_name:
+        old.rename(container_name)
+    if old.status != "running":
+        old.start()
+
+
+def start_container(name, progress=_no_progress):
     try:
         container = docker_client.containers.get(name)
         if container.status != 'running':
             container.start()
+            stats_cache.wake()
+            progress("started")
         else:
             log.info(f"[START] Container '{name}' already running")
+            progress("already running")
+        return True
     except docker.errors.NotFound:
         log.error(f"[START] Container '{name}' does not exist")
+        progress(f"Container '{name}' does not exist")
         # publish_status("error", "", name, error="Container not found")
     except Exception as e:
         log.error(f"[START] Failed to start container: {e}")
+        progress(f"Failed to start container: {e}")
         # publish_status("error", "", name, error=str(e))    
+    return False
 
-def stop_container(name):
+def stop_container(name, progress=_no_progress):
     # container = docker_client.containers.get(name)
     # container.stop()
     # return {"status": "stopped"}
@@ -226,34 +414,47 @@ def stop_container(name):
         container = docker_client.containers.get(name)
         if container.status == 'running':
             container.stop()
+            stats_cache.wake()
             # deployment_state["containers"][name] = "stopped" //2dl
             log.info(f"[STOP] Container '{name}' stopped")
+            progress("stopped")
             # publish_status("stopped", container.image.tags[0] if container.image.tags else "", name)//2dl
         else:
             log.info(f"[STOP] Container '{name}' is not running")
+            progress("not running")
+        return True
     except docker.errors.NotFound:
         log.error(f"[STOP] Container '{name}' does not exist")
+        progress(f"Container '{name}' does not exist")
         # publish_status("error", "", name, error="Container not found")//2dl
     except Exception as e:
         log.error(f"[STOP] Failed to stop container: {e}")
+        progress(f"Failed to stop container: {e}")
         # publish_status("error", "", name, error=str(e))//2dl
+    return False
 
-def restart_container(name):
+def restart_container(name, progress=_no_progress):
     # container = docker_client.containers.get(name)
     # container.restart()
     # return {"status": "restarted"}
     try:
         container = docker_client.containers.get(name)
         container.restart()
+        stats_cache.wake()
         # deployment_state["containers"][name] = "restarted"//2dl
         log.info(f"[RESTART] Container '{name}' restarted")
+        progress("restarted")
         # publish_status("restarted", container.image.tags[0] if container.image.tags else "", name)//2dl
+        return True
     except docker.errors.NotFound:
         log.error(f"[RESTART] Container '{name}' does not exist")
+        progress(f"Container '{name}' does not exist")
         # publish_status("error", "", name, error="Container not found")//2dl
     except Exception as e:
         log.error(f"[RESTART] Failed to restart container: {e}")
+        progress(f"Failed to restart container: {e}")
         # publish_status("error", "", name, error=str(e))   //2dl 
+    return False
 
 
 from datetime import datetime, timezone
@@ -261,11 +462,9 @@ from datetime import datetime, timezone
 def get_containers(all=True):
     """Return a list of Docker containers with uptime in hours."""
     try:
-        containers = docker_client.containers.list(all=all)
         result = []
-        for c in containers:
-            info = c.attrs
-            started_at = info["State"].get("StartedAt")
+        for c in container_state.list_containers(all=all):
+            started_at = c["started_at"]
 
             uptime_hours = 0
             if started_at and started_at.endswith("Z"):
@@ -279,10 +478,10 @@ def get_containers(all=True):
                     uptime_hours = 0
 
             result.append({
-                # "id": c.id[:12],  # short ID
-                "name": c.name,
-                "status": c.status,
-                "image": c.image.tags[0] if c.image.tags else "<none>",
+                # "id": c["id"][:12],  # short ID
+                "name": c["name"],
+                "status": c["status"],
+                "image": c["image_tags"][0] if c["image_tags"] else "<none>",
                 "uptime_hours": uptime_hours
             })
         return result
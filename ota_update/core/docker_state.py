@@ -0,0 +1,203 @@
+import threading
+import time
+
+import docker
+
+from utils.logger import setup_logger
+log = setup_logger()
+
+CONTAINER_ACTIONS = {"create", "start", "restart", "die", "stop", "kill", "pause", "unpause",
+                     "rename", "update", "health_status", "oom"}
+IMAGE_ACTIONS = {"pull", "tag", "untag", "delete", "import", "load"}
+NETWORK_ACTIONS = {"create", "destroy"}
+
+
+def _container_entry(attrs, image_tags):
+    state = attrs.get("State", {})
+    image_id = attrs.get("Image", "")
+    tags = image_tags.get(image_id)
+    if tags is None:
+        # Image not cached yet: the reference the container was created from
+        reference = attrs.get("Config", {}).get("Image")
+        tags = [reference] if reference else []
+    return {
+        "id": attrs["Id"],
+        "name": attrs.get("Name", "").lstrip("/"),
+        "status": state.get("Status", "unknown"),
+        "started_at": state.get("StartedAt"),
+        "created_at": attrs.get("Created"),
+        "image_id": image_id,
+        "image_tags": tags,
+        "port_bindings": attrs.get("HostConfig", {}).get("PortBindings") or {},
+        "networks": sorted((attrs.get("NetworkSettings", {}).get("Networks") or {}).keys()),
+    }
+
+
+# ------------------------
+# Docker State Cache
+# ------------------------
+class DockerStateCache:
+    """
+    In-memory container, image and network state kept current from the
+    docker events() stream: only the object an event names is re-inspected.
+    A full resync runs at start, every resync_interval seconds and whenever
+    the event stream breaks, so missed events heal themselves.
+
+    Lookups (list, by name, by host port, network by suffix) never call the API.
+    """
+    def __init__(self, client, resync_interval=300):
+        self.client = client
+        self.resync_interval = resync_interval
+        self.containers = {}        # id -> entry (see _container_entry)
+        self.images = {}            # image id -> tags
+        self.networks = {}          # network id -> name
+        self.ready = False
+        self.last_resync = None
+        self.events_seen = 0
+        self.lock = threading.RLock()
+        self.stop_event = threading.Event()
+        self.stream = None
+        self.threads = []
+
+    # --- lifecycle ---
+    def start(self):
+        if self.threads:
+            return
+        self.stop_event.clear()
+        self.threads = [threading.Thread(target=self.event_loop, daemon=True, name="docker-events"),
+                        threading.Thread(target=self.resync_loop, daemon=True, name="docker-resync")]
+        for thread in self.threads:
+            thread.start()
+        log.info(f"🐳 Docker state cache started [resync every {self.resync_interval}s]")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.stream is not None:
+            self.stream.close()
+
+    def ensure_ready(self):
+        """Fill the cache synchronously if nothing has been loaded yet."""
+        if not self.ready:
+            self.resync()
+
+    # --- full resync ---
+    def resync(self):
+        started = time.monotonic()
+        images = {image.id: image.tags for image in self.client.images.list()}
+        containers = {c.id: _container_entry(c.attrs, images) for c in self.client.containers.list(all=True)}
+        networks = {net.id: net.name for net in self.client.networks.list()}
+        with self.lock:
+            self.images, self.containers, self.networks = images, containers, networks
+            self.ready = True
+            self.last_resync = {"at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                                "containers": len(containers), "seconds": round(time.monotonic() - started, 2)}
+
+    def resync_loop(self):
+        while not self.stop_event.wait(self.resync_interval):
+            try:
+                self.resync()
+            except Exception as e:
+                log.error(f"Docker state resync failed: {e}")
+
+    # --- events ---
+    def event_loop(self):
+        backoff = 1
+        while not self.stop_event.is_set():
+            try:
+                since = int(time.time())
+                self.resync()           # nothing is missed between the resync and the stream
+                self.stream = self.client.events(decode=True, since=since)
+                backoff = 1
+                for event in self.stream:
+                    self.events_seen += 1
+                    try:
+                        self.apply(event)
+                    except Exception as e:
+                        log.error(f"Failed to apply docker event {event.get('Type')}/{event.get('Action')}: {e}")
+            except Exception as e:
+                if self.stop_event.is_set():
+                    return
+                log.warning(f"Docker event stream lost ({e}), resyncing in {backoff}s")
+            self.stream = None
+            if self.stop_event.wait(backoff):
+                return
+            backoff = min(backoff * 2, 60)
+
+    def apply(self, event):
+        kind = event.get("Type")
+        action = (event.get("Action") or "").split(":", 1)[0]     # e.g. "health_status: healthy"
+        object_id = event.get("Actor", {}).get("ID") or event.get("id")
+        if not object_id:
+            return
+        if kind == "container":
+            if action == "destroy":
+                with self.lock:
+                    self.containers.pop(object_id, None)
+            elif action in CONTAINER_ACTIONS:
+                self._refresh_container(object_id)
+        elif kind == "image" and action in IMAGE_ACTIONS:
+            self._refresh_image(object_id)
+        elif kind == "network" and action in NETWORK_ACTIONS:
+            with self.lock:
+                if action == "destroy":
+                    self.networks.pop(object_id, None)
+                else:
+                    self.networks[object_id] = event.get("Actor", {}).get("Attributes", {}).get("name", object_id)
+
+    def _refresh_container(self, container_id):
+        try:
+            attrs = self.client.api.inspect_container(container_id)
+        except docker.errors.NotFound:
+            with self.lock:
+                self.containers.pop(container_id, None)
+            return
+        with self.lock:
+            self.containers[attrs["Id"]] = _container_entry(attrs, self.images)
+
+    def _refresh_image(self, image_ref):
+        try:
+            attrs = self.client.api.inspect_image(image_ref)
+        except docker.errors.NotFound:
+            with self.lock:
+                self.images = {i: t for i, t in self.images.items() if i != image_ref and image_ref not in t}
+            return
+        with self.lock:
+            self.images[attrs["Id"]] = attrs.get("RepoTags") or []
+            for entry in self.containers.values():
+                if entry["image_id"] == attrs["Id"]:
+                    entry["image_tags"] = self.images[attrs["Id"]]
+
+    # --- lookups ---
+    def list_containers(self, all=True):
+        self.ensure_ready()
+        with self.lock:
+            return [dict(c) for c in self.containers.values() if all or c["status"] == "running"]
+
+    def container_by_name(self, name):
+        self.ensure_ready()
+        with self.lock:
+            return next((dict(c) for c in self.containers.values() if c["name"] == name), None)
+
+    def containers_on_port(self, port):
+        """Containers (running or not) with a host binding on port."""
+        self.ensure_ready()
+        port = str(port)
+        with self.lock:
+            return [dict(c) for c in self.containers.values()
+                    if any(b.get("HostPort") == port for bindings in c["port_bindings"].values()
+                           for b in bindings or [])]
+
+    def network_ending_with(self, suffix):
+        self.ensure_ready()
+        with self.lock:
+            return next((name for name in self.networks.values() if name.endswith(suffix)), None)
+
+    def add_network(self, network_id, name):
+        with self.lock:
+            self.networks[network_id] = name
+
+    def status(self):
+        with self.lock:
+            return {"ready": self.ready, "containers": len(self.containers), "images": len(self.images),
+                    "networks": len(self.networks), "events_seen": self.events_seen,
+                    "event_stream": self.stream is not None, "last_resync": self.last_resync}
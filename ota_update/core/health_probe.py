@@ -0,0 +1,61 @@
+import time
+import urllib.error
+import urllib.request
+
+from utils.logger import setup_logger
+log = setup_logger()
+
+
+def _http_ok(url, timeout=2):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            return resp.status < 500
+    except urllib.error.HTTPError as e:
+        return e.code < 500         # the app answers, even if the path wants auth/POST
+    except Exception:
+        return False
+
+
+def _container_ip(container, network):
+    networks = container.attrs.get("NetworkSettings", {}).get("Networks") or {}
+    settings = networks.get(network) or next(iter(networks.values()), {})
+    return settings.get("IPAddress")
+
+
+def wait_healthy(container, network=None, health=None, timeout=60, stable_seconds=5):
+    """
+    Wait until a just-started container is healthy; returns (ok, reason).
+
+    - image HEALTHCHECK: wait for docker's "healthy" / "unhealthy"
+    - health {"port": 5002, "path": "/health"}: HTTP GET on the container's
+      address in the shared network until it answers (< 500)
+    - otherwise: the container has to stay up for stable_seconds without restarting
+
+    Exiting or restarting during the wait fails the probe in every mode.
+    """
+    health = health or {}
+    deadline = time.monotonic() + health.get("timeout", timeout)
+    up_since = None
+    while time.monotonic() < deadline:
+        container.reload()
+        state = container.attrs.get("State", {})
+        if state.get("Status") in ("exited", "dead") or container.attrs.get("RestartCount", 0) > 0:
+            return False, f"container {state.get('Status')} (exit code {state.get('ExitCode')})"
+        if state.get("Status") == "running":
+            check = (state.get("Health") or {}).get("Status")
+            if check == "healthy":
+                return True, "healthcheck healthy"
+            if check == "unhealthy":
+                return False, "healthcheck unhealthy"
+            if check is None:
+                if health.get("port"):
+                    ip = _container_ip(container, network)
+                    url = f"http://{ip}:{health['port']}{health.get('path', '/')}"
+                    if ip and _http_ok(url):
+                        return True, f"GET {url} answered"
+                else:
+                    up_since = up_since or time.monotonic()
+                    if time.monotonic() - up_since >= health.get("stable_seconds", stable_seconds):
+                        return True, f"running for {health.get('stable_seconds', stable_seconds)}s"
+        time.sleep(0.5)
+    return False, f"not healthy within {health.get('timeout', timeout)}s"
@@ -0,0 +1,143 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.logger import setup_logger
+log = setup_logger()
+
+
+def _iso(ts):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts)) if ts else None
+
+
+class Job:
+    def __init__(self, kind, name, handler, args):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.name = name
+        self.handler = handler
+        self.args = args
+        self.state = "queued"       # queued -> running -> succeeded | failed
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.steps = []             # (time, message)
+        self.error = None
+        self.result = None
+        self.coalesced = 0          # later identical requests folded into this job
+
+    def progress(self, message):
+        """Handlers report what they are doing; shown on /jobs/<id>."""
+        self.steps.append((time.time(), message))
+
+    def to_dict(self):
+        end = self.finished or time.time()
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "name": self.name,
+            "state": self.state,
+            "created_at": _iso(self.created),
+            "started_at": _iso(self.started),
+            "finished_at": _iso(self.finished),
+            "queue_seconds": round((self.started or end) - self.created, 3),
+            "run_seconds": round(end - self.started, 3) if self.started else None,
+            "progress": [{"at": _iso(at), "elapsed": round(at - (self.started or self.created), 3), "message": m}
+                         for at, m in self.steps],
+            "coalesced": self.coalesced,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+# ------------------------
+# Deployment Job Queue
+# ------------------------
+class JobQueue:
+    """
+    Runs container operations (deploy/start/stop/restart) on a bounded worker
+    pool. Jobs for the same container name run one after another in submit
+    order; different names run in parallel. A deploy submitted while another
+    deploy of the same name is the last job still queued (not yet running) is
+    folded into it, with the newest arguments winning.
+
+    Handlers are called as handler(*args, progress=job.progress) and return a
+    truthy value on success (or a result dict); a falsy value or an exception
+    fails the job.
+    """
+    COALESCE = {"deploy"}
+
+    def __init__(self, max_workers=2, history=200):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.max_workers = max_workers
+        self.history = history
+        self.jobs = OrderedDict()   # id -> Job, oldest first (finished ones trimmed to history)
+        self.queues = {}            # container name -> deque of queued jobs
+        self.lock = threading.Lock()
+
+    def submit(self, kind, name, handler, args=()):
+        with self.lock:
+            queue = self.queues.get(name)
+            # Only fold into the last queued job, so nothing queued after it is reordered
+            if kind in self.COALESCE and queue and queue[-1].kind == kind:
+                pending = queue[-1]
+                pending.args = args
+                pending.coalesced += 1
+                log.info(f"🔁 {kind} '{name}' folded into queued job {pending.id}")
+                return pending
+            job = Job(kind, name, handler, args)
+            self.jobs[job.id] = job
+            self._trim()
+            if queue is not None:
+                queue.append(job)   # a worker is already draining this name
+                return job
+            self.queues[name] = deque([job])
+        self.executor.submit(self._drain, name)
+        return job
+
+    def _drain(self, name):
+        while True:
+            with self.lock:
+                queue = self.queues[name]
+                if not queue:
+                    del self.queues[name]
+                    return
+                job = queue.popleft()
+                job.state, job.started = "running", time.time()
+            log.info(f"▶️ Job {job.id}: {job.kind} '{name}' (queued {job.started - job.created:.1f}s)")
+            try:
+                result = job.handler(*job.args, progress=job.progress)
+                job.state = "succeeded" if result else "failed"
+                if isinstance(result, dict):
+                    job.result = result
+                if not result:
+                    job.error = job.steps[-1][1] if job.steps else "failed"
+            except Exception as e:
+                job.state, job.error = "failed", str(e)
+                log.error(f"Job {job.id} ({job.kind} '{name}') failed: {e}")
+            job.finished = time.time()
+            log.info(f"⏹ Job {job.id}: {job.kind} '{name}' {job.state} in {job.finished - job.started:.1f}s")
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self.jobs) - self.history)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def list(self, name=None):
+        with self.lock:
+            jobs = [j for j in self.jobs.values() if name is None or j.name == name]
+        return [j.to_dict() for j in reversed(jobs)]
+
+    def status(self):
+        with self.lock:
+            states = {}
+            for job in self.jobs.values():
+                states[job.state] = states.get(job.state, 0) + 1
+            return {"workers": self.max_workers, "busy_names": len(self.queues), "jobs": states}
@@ -0,0 +1,107 @@
+import re
+import threading
+from collections import deque
+
+# (bucket seconds, points kept): 1 h at 10 s, 24 h at 1 min, 7 d at 15 min
+TIERS = ((10, 360), (60, 1440), (900, 672))
+FIELDS = ("cpu_percent", "cpu_max", "memory_mb", "rx_bytes_per_s", "tx_bytes_per_s")
+RANGE = re.compile(r"^(\d+(?:\.\d+)?)([smhd]?)$")
+UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_range(value, default=3600):
+    """'90s', '15m', '1h', '7d' or plain seconds."""
+    if not value:
+        return default
+    match = RANGE.match(value.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid range '{value}', expected e.g. 15m, 1h, 24h, 7d")
+    return float(match.group(1)) * UNITS[match.group(2)]
+
+
+class Tier:
+    """Fixed-size ring of averaged points at one resolution; the open bucket accumulates samples."""
+    def __init__(self, seconds, size):
+        self.seconds = seconds
+        self.points = deque(maxlen=size)    # (bucket start, cpu avg, cpu max, memory avg, rx/s, tx/s)
+        self.bucket = None
+        self.sums = None
+
+    def add(self, ts, cpu, memory, rx, tx):
+        bucket = int(ts // self.seconds * self.seconds)
+        if bucket != self.bucket:
+            self.close()
+            self.bucket, self.sums = bucket, [0, 0.0, 0.0, 0.0, 0.0, 0.0]
+        s = self.sums
+        s[0] += 1
+        s[1] += cpu
+        s[2] = max(s[2], cpu)
+        s[3] += memory
+        s[4] += rx
+        s[5] += tx
+
+    def close(self):
+        if self.bucket is not None and self.sums[0]:
+            n = self.sums[0]
+            self.points.append((self.bucket, round(self.sums[1] / n, 2), round(self.sums[2], 2),
+                                round(self.sums[3] / n, 2), round(self.sums[4] / n), round(self.sums[5] / n)))
+
+    def series(self, since):
+        points = [p for p in self.points if p[0] >= since]
+        if self.bucket is not None and self.sums[0] and self.bucket >= since:
+            n = self.sums[0]        # the bucket still filling up, so the chart reaches "now"
+            points.append((self.bucket, round(self.sums[1] / n, 2), round(self.sums[2], 2),
+                           round(self.sums[3] / n, 2), round(self.sums[4] / n), round(self.sums[5] / n)))
+        return points
+
+
+# ------------------------
+# Container Stats History
+# ------------------------
+class StatsHistory:
+    """
+    Per-container CPU, memory and network history in ring buffers at several
+    resolutions (TIERS). Every sample goes into all tiers, so a query is served
+    from the finest tier that still covers the requested range.
+    """
+    def __init__(self, tiers=TIERS):
+        self.tier_specs = tiers
+        self.containers = {}        # name -> [Tier, ...]
+        self.last_net = {}          # name -> (ts, rx bytes, tx bytes)
+        self.lock = threading.Lock()
+
+    def record(self, name, ts, stats):
+        network = stats.get("network") or {}
+        rx_rate = tx_rate = 0.0
+        with self.lock:
+            previous = self.last_net.get(name)
+            if "rx_bytes" in network:
+                self.last_net[name] = (ts, network["rx_bytes"], network["tx_bytes"])
+                # A redeployed container starts its counters again: skip that one rate
+                if previous and ts > previous[0] and network["rx_bytes"] >= previous[1] \
+                        and network["tx_bytes"] >= previous[2]:
+                    rx_rate = (network["rx_bytes"] - previous[1]) / (ts - previous[0])
+                    tx_rate = (network["tx_bytes"] - previous[2]) / (ts - previous[0])
+            tiers = self.containers.get(name)
+            if tiers is None:
+                tiers = self.containers[name] = [Tier(seconds, size) for seconds, size in self.tier_specs]
+            for tier in tiers:
+                tier.add(ts, stats.get("cpu_percent", 0.0), stats.get("memory_mb", 0.0), rx_rate, tx_rate)
+
+    def names(self):
+        with self.lock:
+            return sorted(self.containers)
+
+    def query(self, name, range_seconds, now):
+        """Columnar series for one container (None if unknown): {"t": [...], "cpu_percent": [...], ...}."""
+        with self.lock:
+            tiers = self.containers.get(name)
+            if tiers is None:
+                return None
+            tier = next((t for t in tiers if t.seconds * t.points.maxlen >= range_seconds), tiers[-1])
+            points = tier.series(now - range_seconds)
+        result = {"name": name, "resolution_seconds": tier.seconds, "range_seconds": range_seconds,
+                  "t": [p[0] for p in points]}
+        for i, field in enumerate(FIELDS, start=1):
+            result[field] = [p[i] for p in points]
+        return result
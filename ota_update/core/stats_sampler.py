@@ -0,0 +1,107 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.logger import setup_logger
+log = setup_logger()
+
+
+# ------------------------
+# Background Container Stats Sampler
+# ------------------------
+class StatsSampler:
+    """
+    Refreshes lifecycle and resource stats for every deployed container on a
+    background thread, collecting them in parallel on a bounded thread pool
+    (docker's stats call blocks 1-2 s per container). /status reads the cache.
+
+    collect(container_id) -> {"lifecycle": ..., "stats": ...}
+    list_ids() -> container ids to sample
+    on_refresh({container_id: (sampled_at, data)}) -> called with each cycle's samples
+    """
+    def __init__(self, collect, list_ids, interval=10, ttl=30, max_workers=4, on_refresh=None):
+        self.collect = collect
+        self.list_ids = list_ids
+        self.on_refresh = on_refresh
+        self.interval = interval
+        self.ttl = ttl
+        self.max_workers = max_workers
+
+        self.cache = {}             # container_id -> (sampled_at, {"lifecycle", "stats"})
+        self.last_cycle = None
+        self.lock = threading.Lock()
+        self.wake_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.executor = None
+        self.thread = None
+
+    def configure(self, config):
+        self.interval = config.get("stats_interval", self.interval)
+        self.ttl = config.get("stats_ttl", self.ttl)
+        self.max_workers = config.get("stats_workers", self.max_workers)
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stats")
+        self.thread = threading.Thread(target=self.run_loop, daemon=True)
+        self.thread.start()
+        log.info(f"📊 Stats sampler started [interval={self.interval}s, workers={self.max_workers}]")
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+        if self.executor:
+            self.executor.shutdown(wait=False)
+
+    def wake(self):
+        """Sample again now, e.g. after a deploy/start/stop changed a container."""
+        self.wake_event.set()
+
+    def run_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                log.error(f"Stats refresh failed: {e}")
+            self.wake_event.wait(self.interval)
+            self.wake_event.clear()
+
+    def refresh(self):
+        started = time.monotonic()
+        ids = list(dict.fromkeys(self.list_ids()))
+        results = self.executor.map(self._collect_one, ids)
+        fresh = {container_id: entry for container_id, entry in zip(ids, results) if entry is not None}
+        with self.lock:
+            # Containers no longer deployed drop out of the cache
+            self.cache = {container_id: fresh.get(container_id, self.cache.get(container_id))
+                          for container_id in ids
+                          if container_id in fresh or container_id in self.cache}
+            self.last_cycle = {"containers": len(ids), "seconds": round(time.monotonic() - started, 2)}
+        if self.on_refresh:
+            self.on_refresh(fresh)
+
+    def _collect_one(self, container_id):
+        try:
+            return time.time(), self.collect(container_id)
+        except Exception as e:
+            log.error(f"Stats collection failed for {container_id[:12]}: {e}")
+            return None
+
+    def get(self, container_id):
+        """Cached {"lifecycle", "stats", "sampled_at"} or None; stats older than ttl are reported as None."""
+        with self.lock:
+            entry = self.cache.get(container_id)
+        if entry is None:
+            self.wake()             # not sampled yet (new deployment)
+            return None
+        sampled_at, data = entry
+        stale = time.time() - sampled_at > self.ttl
+        return {"lifecycle": data["lifecycle"], "stats": None if stale else data["stats"],
+                "sampled_at": round(sampled_at, 3)}
+
+    def status(self):
+        with self.lock:
+            return {"interval": self.interval, "ttl": self.ttl, "workers": self.max_workers,
+                    "cached": len(self.cache), "last_cycle": self.last_cycle}
@@ -1,6 +1,7 @@
-import threading
 from flask import Flask, jsonify, request,send_from_directory
-from core.docker_manager import get_deployments, deploy_container, start_container, stop_container, restart_container,get_containers
+from core.docker_manager import get_deployments, deploy_container, start_container, stop_container, restart_container,get_containers, stats_cache, stats_history, container_state
+from core.stats_history import parse_range
+import time
 from core.system_info import get_system_info
 from flask_cors import CORS
 
@@ -8,7 +9,7 @@ from flask_cors import CORS
 # ------------------------
 # Flask Routes
 # ------------------------
-def register_routes(app):
+def register_routes(app, jobs):
     CORS(app)   # 👈 enables CORS for all routes
     @app.get("/health")
     def health():
@@ -18,6 +19,25 @@ def register_routes(app):
     def status():
         return jsonify(get_deployments())
 
+    @app.get("/stats/sampler")
+    def stats_sampler_status():
+        return jsonify({**stats_cache.status(), "docker_state": container_state.status()})
+
+    @app.get("/stats/history")
+    def stats_history_series():
+        # e.g. /stats/history?name=mavlink-service&range=24h -> columnar series for one chart
+        name = request.args.get("name")
+        if not name:
+            return jsonify({"error": "'name' is required", "containers": stats_history.names()}), 400
+        try:
+            range_seconds = parse_range(request.args.get("range"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        series = stats_history.query(name, range_seconds, time.time())
+        if series is None:
+            return jsonify({"error": f"No history for '{name}'", "containers": stats_history.names()}), 404
+        return jsonify(series)
+
     @app.get("/containers")
     def list_containers():
         return jsonify(get_containers())
@@ -28,22 +48,24 @@ def register_routes(app):
         image, name = data.get("image"), data.get("name")
         ports = data.get("ports", {})
         version = data.get("version", "latest")
-        threading.Thread(target=deploy_container, args=(image, name, ports, version)).start()
-        return jsonify({"status": "deployment triggered"})
+        # Optional: "mode" ("swap" / "recreate") and "health" ({"port", "path", "timeout", "stable_seconds"})
+        health, mode = data.get("health"), data.get("mode")
+        job = jobs.submit("deploy", name, deploy_container, (image, name, ports, version, health, mode))
+        return jsonify({"status": "deployment triggered", "job_id": job.id, "coalesced": job.coalesced > 0})
 
     @app.post("/start")
     def start():
         data = request.get_json()
         name = data.get("name")
-        threading.Thread(target=start_container, args=(name,)).start()
-        return jsonify({"status": f"start triggered for '{name}'"})
+        job = jobs.submit("start", name, start_container, (name,))
+        return jsonify({"status": f"start triggered for '{name}'", "job_id": job.id})
 
     @app.post("/stop")
     def stop():
         data = request.get_json()
         name = data.get("name")
-        threading.Thread(target=stop_container, args=(name,)).start()
-        return jsonify({"status": f"stop triggered for '{name}'"})
+        job = jobs.submit("stop", name, stop_container, (name,))
+        return jsonify({"status": f"stop triggered for '{name}'", "job_id": job.id})
 
 
 
@@ -51,8 +73,19 @@ def register_routes(app):
     def restart():
         data = request.get_json()
         name = data.get("name")
-        threading.Thread(target=restart_container, args=(name,)).start()
-        return jsonify({"status": f"restart triggered for '{name}'"})
+        job = jobs.submit("restart", name, restart_container, (name,))
+        return jsonify({"status": f"restart triggered for '{name}'", "job_id": job.id})
+
+    @app.get("/jobs")
+    def list_jobs():
+        return jsonify({**jobs.status(), "recent": jobs.list(request.args.get("name"))})
+
+    @app.get("/jobs/<job_id>")
+    def get_job(job_id):
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": f"Unknown job '{job_id}'"}), 404
+        return jsonify(job)
 
 
 